@@ -1,3 +1,4 @@
+from functools import lru_cache
 from json import loads
 from typing import Any, Dict
 import logging
@@ -7,7 +8,11 @@ import boto3
 logger: logging.Logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
 
-ses_client = boto3.client("ses")
+
+@lru_cache(maxsize=None)
+def get_ses_client() -> Any:
+    """Build the SES client on first use and reuse it while the container is warm."""
+    return boto3.client("ses")
 
 
 def handler(event: Dict[str, Any], _: Any) -> None:
@@ -32,7 +37,7 @@ def handler(event: Dict[str, Any], _: Any) -> None:
     completed = body.get("completedDate")
     url = body.get("signedDocumentURL")
 
-    ses_client.send_email(
+    get_ses_client().send_email(
         Destination={
             "ToAddresses": ["foster-apps@dallaspetsalive.org"],
         },
@@ -45,6 +45,19 @@ resource "aws_cloudwatch_log_group" "foster_agreement_webhook_log_group" {
   retention_in_days = 90
 }
 
+resource "aws_cloudwatch_log_metric_filter" "foster_agreement_webhook_init_duration" {
+  name           = "foster_agreement_webhook_init_duration"
+  log_group_name = aws_cloudwatch_log_group.foster_agreement_webhook_log_group.name
+  pattern        = "[report=\"REPORT\", ..., init=\"Init\", init_label=\"Duration:\", init_duration, init_unit]"
+
+  metric_transformation {
+    name      = "InitDuration"
+    namespace = "DPA/ColdStarts/foster_agreement_webhook"
+    value     = "$init_duration"
+    unit      = "Milliseconds"
+  }
+}
+
 resource "aws_lambda_function_url" "foster_agreement_webhook_url" {
   function_name      = aws_lambda_function.foster_agreement_webhook.function_name
   authorization_type = "NONE"
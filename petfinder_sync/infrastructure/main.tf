@@ -89,6 +89,50 @@ resource "aws_iam_role_policy_attachment" "petfinder_sync_logging_policy_attachm
   policy_arn = aws_iam_policy.petfinder_sync_logging_policy.arn
 }
 
+# what the last sync sent, so unchanged runs can stop early
+resource "aws_s3_bucket" "petfinder_sync_state" {
+  bucket = "dpa-petfinder-sync"
+}
+
+resource "aws_s3_bucket_public_access_block" "petfinder_sync_state" {
+  bucket = aws_s3_bucket.petfinder_sync_state.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+resource "aws_iam_policy" "petfinder_sync_state_policy" {
+  name   = "petfinder_sync_state_policy"
+  policy = jsonencode({
+    "Version" : "2012-10-17",
+    "Statement" : [
+      {
+        Action : [
+          "s3:GetObject",
+          "s3:PutObject"
+        ],
+        Effect : "Allow",
+        Resource : "${aws_s3_bucket.petfinder_sync_state.arn}/*"
+      },
+      {
+        # lets a missing object come back as NoSuchKey rather than AccessDenied
+        Action : [
+          "s3:ListBucket"
+        ],
+        Effect : "Allow",
+        Resource : aws_s3_bucket.petfinder_sync_state.arn
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "petfinder_sync_state_policy_attachment" {
+  role = aws_iam_role.petfinder_sync_iam.id
+  policy_arn = aws_iam_policy.petfinder_sync_state_policy.arn
+}
+
 resource "aws_cloudwatch_event_rule" "petfinder_sync_event_rule" {
   name = "petfinder_sync_event_rule"
   description = "invoke petfinder sync once an hour"
@@ -109,3 +153,75 @@ resource "aws_lambda_permission" "petfinder_sync_cloudwatch_permission" {
   principal = "events.amazonaws.com"
   source_arn = aws_cloudwatch_event_rule.petfinder_sync_event_rule.arn
 }
+
+# ingest shares the petfinder sync package, role and requests layer
+resource "aws_lambda_function" "pets_ingest" {
+  depends_on = [
+    aws_cloudwatch_log_group.pets_ingest_log_group,
+  ]
+
+  filename      = "petfinder_sync.zip"
+  function_name = "pets_ingest"
+  role          = aws_iam_role.petfinder_sync_iam.arn
+  handler       = "ingest.handler"
+
+  source_code_hash = filebase64sha256("petfinder_sync.zip")
+
+  runtime = "python3.9"
+  timeout = 300
+
+  layers = [aws_lambda_layer_version.requests_layer.arn]
+}
+
+resource "aws_cloudwatch_log_group" "pets_ingest_log_group" {
+  name              = "/aws/lambda/pets_ingest"
+  retention_in_days = 90
+}
+
+data "aws_dynamodb_table" "pets_table" {
+  name = "Pets"
+}
+
+resource "aws_iam_policy" "pets_ingest_dynamodb_policy" {
+  name   = "pets_ingest_dynamodb_policy"
+  policy = jsonencode({
+    "Version" : "2012-10-17",
+    "Statement" : [
+      {
+        Action : [
+          "dynamodb:Scan",
+          "dynamodb:BatchWriteItem"
+        ],
+        Effect : "Allow",
+        Resource : data.aws_dynamodb_table.pets_table.arn
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "pets_ingest_dynamodb_policy_attachment" {
+  role = aws_iam_role.petfinder_sync_iam.id
+  policy_arn = aws_iam_policy.pets_ingest_dynamodb_policy.arn
+}
+
+resource "aws_cloudwatch_event_rule" "pets_ingest_event_rule" {
+  name = "pets_ingest_event_rule"
+  description = "ingest shelterluv and airtable pets every 15 minutes"
+  schedule_expression = "rate(15 minutes)"
+
+  # enable once the current Pets writer is turned off
+  is_enabled = false
+}
+
+resource "aws_cloudwatch_event_target" "pets_ingest_event_target" {
+  arn = aws_lambda_function.pets_ingest.arn
+  rule = aws_cloudwatch_event_rule.pets_ingest_event_rule.name
+}
+
+resource "aws_lambda_permission" "pets_ingest_cloudwatch_permission" {
+  statement_id = "AllowExecutionFromCloudWatch"
+  action = "lambda:InvokeFunction"
+  function_name = "pets_ingest"
+  principal = "events.amazonaws.com"
+  source_arn = aws_cloudwatch_event_rule.pets_ingest_event_rule.arn
+}
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from . import petfinder_sync
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+
+PETS_TABLE = "Pets"
+# hash of the pet's attributes, so unchanged pets can be skipped without a write
+CONTENT_HASH_FIELD = "contentHash"
+# the most requests one BatchWriteItem call accepts
+BATCH_WRITE_SIZE = 25
+NEW_DIGS_PHOTOS_URL = "https://dpa-media.s3.us-east-2.amazonaws.com/new-digs-photos/"
+# where the website's adopt button sends people, wordpress copies it onto each post
+SHELTERLUV_ADOPT_URL = "https://www.shelterluv.com/matchme/adopt/"
+# new digs pets are adopted through their owners, by way of one application page
+NEW_DIGS_ADOPT_URL = "https://dallaspetsalive.org/new-digs/"
+
+SIZES = {"S": "Small", "M": "Medium", "L": "Large", "XL": "Extra-Large"}
+
+
+def handler(event: Dict[str, Any], context: Any) -> None:
+    logging.info("ingest received event: {}".format(event))
+    petfinder_sync.run_deadline.start(
+        context, reserve=petfinder_sync.FINISH_RESERVE_SECONDS
+    )
+
+    config = petfinder_sync.get_config()
+    assert "shelterluv" in config.sections()
+    assert "airtable" in config.sections()
+
+    pets: List[Dict[str, Any]] = []
+    # the sources that were read in full, only their missing pets are deleted
+    sources: List[str] = []
+
+    try:
+        shelterluv_pets = petfinder_sync.get_shelterluv_pets(
+            config["shelterluv"]["SHELTERLUV_API_KEY"]
+        )
+        pets += [
+            shelterluv_to_pet(id, fields) for id, fields in shelterluv_pets.items()
+        ]
+        sources.append("shelterluv")
+    except requests.RequestException:
+        logger.exception("could not get shelterluv pets, keeping the stored ones")
+
+    try:
+        airtable_pets = petfinder_sync.get_airtable_pets(config["airtable"])
+        pets += [airtable_to_pet(id, fields) for id, fields in airtable_pets.items()]
+        sources.append("airtable")
+    except requests.RequestException:
+        logger.exception("could not get airtable pets, keeping the stored ones")
+
+    upsert_pets(petfinder_sync.get_client("dynamodb"), pets, sources)
+
+
+def shelterluv_to_pet(id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a shelterluv animal into a Pets item."""
+    videos = fields.get("Videos") or []
+    internal_id = fields.get("Internal-ID")
+
+    return {
+        "id": str(id),
+        "name": fields.get("Name"),
+        "description": fields.get("Description"),
+        "photos": fields.get("Photos") or [],
+        "coverPhoto": fields.get("CoverPhoto"),
+        "age": (
+            petfinder_sync.get_age_from_shelterluv(fields["Age"])
+            if fields.get("Age") is not None
+            else None
+        ),
+        "breed": (fields.get("Breed") or "").replace("\\/", " / ") or None,
+        "color": (fields.get("Color") or "").replace("\\/", " / ") or None,
+        "adoptLink": SHELTERLUV_ADOPT_URL + internal_id if internal_id else None,
+        "internalId": internal_id,
+        "sex": fields.get("Sex"),
+        "size": (
+            SIZES[petfinder_sync.get_size_from_shelterluv(fields["Size"])]
+            if fields.get("Size")
+            else None
+        ),
+        "species": fields.get("Type"),
+        "source": "shelterluv",
+        "status": fields.get("Status"),
+        "video": videos[0].get("YoutubeUrl") if videos else None,
+    }
+
+
+def airtable_to_pet(id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a new digs airtable record into a Pets item."""
+    species = fields.get("Pet Species")
+    if species in ("Dog", "Cat"):
+        breed = fields.get("Breed - " + species)
+        color = fields.get("Color - " + species)
+    else:
+        breed = fields.get("Breed - Other Species")
+        color = fields.get("Color - Other Species")
+
+    # uploaded pictures are renamed, the map points at the name they were stored under
+    filenames = json.loads(fields.get("PictureMap-DoNotModify") or "{}")
+    photos = [
+        NEW_DIGS_PHOTOS_URL
+        + id
+        + "/"
+        + filenames.get(picture["filename"], picture["filename"])
+        for picture in fields.get("Pictures", [])
+    ]
+
+    return {
+        "id": id,
+        "name": fields.get("Pet Name"),
+        "description": fields.get("Public Description"),
+        "photos": photos,
+        "coverPhoto": photos[0] if photos else None,
+        "age": fields.get("Pet Age"),
+        "breed": breed,
+        "color": color,
+        "adoptLink": NEW_DIGS_ADOPT_URL,
+        "sex": fields.get("Sex"),
+        "size": fields.get("Pet Size"),
+        "species": species,
+        "source": "airtable",
+        "status": fields.get("Status"),
+    }
+
+
+def content_hash(pet: Dict[str, Any]) -> str:
+    """Hash a pet's attributes independent of key order."""
+    encoded = json.dumps(pet, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def to_item(pet: Dict[str, Any], hash: str) -> Dict[str, Any]:
+    """Marshal a pet into a dynamodb item, leaving out empty attributes."""
+    item: Dict[str, Any] = {CONTENT_HASH_FIELD: {"S": hash}}
+
+    for name, value in pet.items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, list):
+            item[name] = {"L": [{"S": str(photo)} for photo in value if photo]}
+        else:
+            item[name] = {"S": str(value)}
+
+    return item
+
+
+def source_of(id: str) -> str:
+    """Tell where a stored pet came from when it wasn't stored with its source."""
+    # airtable record ids all start with rec, shelterluv ids are numeric
+    return "airtable" if id.startswith("rec") else "shelterluv"
+
+
+def get_stored_pets(client: Any) -> Dict[str, Dict[str, Optional[str]]]:
+    """Read the id, source and content hash of every pet already in the table."""
+    stored: Dict[str, Dict[str, Optional[str]]] = {}
+    paginator = client.get_paginator("scan")
+
+    for page in paginator.paginate(
+        TableName=PETS_TABLE,
+        ProjectionExpression="#id, #hash, #source",
+        ExpressionAttributeNames={
+            "#id": "id",
+            "#hash": CONTENT_HASH_FIELD,
+            "#source": "source",
+        },
+    ):
+        for item in page["Items"]:
+            id = item["id"]["S"]
+            stored[id] = {
+                "hash": item.get(CONTENT_HASH_FIELD, {}).get("S"),
+                "source": item.get("source", {}).get("S") or source_of(id),
+            }
+
+    return stored
+
+
+def upsert_pets(
+    client: Any, pets: List[Dict[str, Any]], sources: Iterable[str]
+) -> None:
+    """Write the pets that changed and delete the ones no longer available."""
+    if not pets:
+        raise ValueError("no pets to ingest")
+
+    # an empty source is far more likely an outage than every one of its pets being
+    # adopted, so pets are only deleted for sources that returned some
+    complete = set()
+    for source in sources:
+        if any(pet.get("source") == source for pet in pets):
+            complete.add(source)
+        else:
+            logger.error("no {} pets, keeping the stored ones".format(source))
+
+    stored = get_stored_pets(client)
+    fetched = set()
+    puts = []
+
+    for pet in pets:
+        hash = content_hash(pet)
+        fetched.add(pet["id"])
+        # unchanged pets are never written, so they cost no capacity and stream nothing
+        if stored.get(pet["id"], {}).get("hash") != hash:
+            puts.append({"PutRequest": {"Item": to_item(pet, hash)}})
+
+    deletes = [
+        {"DeleteRequest": {"Key": {"id": {"S": id}}}}
+        for id, stored_pet in stored.items()
+        if id not in fetched and stored_pet["source"] in complete
+    ]
+
+    logger.info(
+        "ingesting {} pets: {} changed, {} unchanged, {} removed".format(
+            len(fetched), len(puts), len(fetched) - len(puts), len(deletes)
+        )
+    )
+
+    batch_write(client, puts + deletes)
+
+
+def batch_write(client: Any, writes: Iterable[Dict[str, Any]]) -> None:
+    """Send write requests in batches, retrying whatever dynamodb leaves unprocessed."""
+    writes = list(writes)
+
+    for start in range(0, len(writes), BATCH_WRITE_SIZE):
+        pending = {PETS_TABLE: writes[start : start + BATCH_WRITE_SIZE]}
+        attempt = 0
+
+        while pending:
+            response = client.batch_write_item(RequestItems=pending)
+            pending = response.get("UnprocessedItems") or {}
+            if pending:
+                # throttled, back off before retrying the rest
+                attempt += 1
+                time.sleep(min(0.05 * 2**attempt, 1))
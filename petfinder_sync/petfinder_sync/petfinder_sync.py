@@ -1,21 +1,37 @@
 import configparser
 import datetime
+import functools
+import hashlib
+import json
 import logging
-from typing import Any, Dict, List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
-from . import constants
+from . import constants, deadline
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
 
+# the fingerprint of the pets the last successful sync sent
+STATE_BUCKET = "dpa-petfinder-sync"
+LAST_SYNC_KEY = "last_sync.json"
+# an unchanged roster is still sent once the last sync is older than this,
+# or whenever the event asks for {"force": true}
+FORCE_SYNC_SECONDS = 6 * 60 * 60
+# what a run keeps back once its requests are done, to send the file and record the sync
+FINISH_RESERVE_SECONDS = 10
 
-def handler(event: Dict[str, Any], _: Any) -> None:
+# set by the handlers for each invocation, every request takes its timeout from it
+run_deadline = deadline.Deadline()
+
+
+def handler(event: Dict[str, Any], context: Any) -> None:
     logging.info("sync received event: {}".format(event))
+    run_deadline.start(context, reserve=FINISH_RESERVE_SECONDS)
 
-    config = configparser.ConfigParser()
-    config.read("config.ini")
+    config = get_config()
     assert "shelterluv" in config.sections()
     assert "airtable" in config.sections()
     shelterluv_key: str = config["shelterluv"]["SHELTERLUV_API_KEY"]
@@ -24,12 +40,94 @@ def handler(event: Dict[str, Any], _: Any) -> None:
     shelterluv_pets: Dict[str, Any] = get_shelterluv_pets(shelterluv_key)
     airtable_pets: Dict[str, Any] = get_airtable_pets(airtable_section)
 
+    # skip the transform and upload when nothing changed since the last sync
+    s3 = get_client("s3")
+    fingerprint = get_source_fingerprint(shelterluv_pets, airtable_pets)
+    if not event.get("force") and is_unchanged(load_last_sync(s3), fingerprint):
+        logger.info("no pets changed since the last sync")
+        return
+
     shelterluv_pets_list: List[Dict[str, Any]] = shelterluv_to_csv(shelterluv_pets)
     airtable_pets_list: List[Dict[str, Any]] = airtable_to_csv(airtable_pets)
 
     animals = shelterluv_pets_list + airtable_pets_list
 
     send_csv_file(animals)
+    save_last_sync(s3, fingerprint)
+
+
+def get_source_fingerprint(
+    shelterluv_pets: Dict[str, Any], airtable_pets: Dict[str, Any]
+) -> str:
+    """Hash the pet ids with their update times, or their fields where there are none."""
+    shelterluv = sorted(
+        (str(id), str(animal.get("LastUpdatedUnixTime")))
+        for id, animal in shelterluv_pets.items()
+    )
+    # the airtable base has no last modified field, so the record's fields stand in for one
+    airtable = sorted(
+        (id, json.dumps(fields, sort_keys=True, default=str))
+        for id, fields in airtable_pets.items()
+    )
+    encoded = json.dumps([len(shelterluv), shelterluv, airtable]).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def is_unchanged(last_sync: Optional[Dict[str, Any]], fingerprint: str) -> bool:
+    """Whether the last sync sent these pets recently enough to skip this one."""
+    if last_sync is None:
+        return False
+    if time.time() - last_sync["synced_at"] > FORCE_SYNC_SECONDS:
+        return False
+    return bool(last_sync["fingerprint"] == fingerprint)
+
+
+def load_last_sync(client: Any) -> Optional[Dict[str, Any]]:
+    """Read what the last successful sync sent, None if unknown."""
+    try:
+        response = client.get_object(Bucket=STATE_BUCKET, Key=LAST_SYNC_KEY)
+        return json.loads(response["Body"].read())
+    except Exception:  # pylint: disable=broad-except
+        # without it the sync runs in full, as it always used to
+        logger.warning("no last sync recorded")
+        return None
+
+
+def save_last_sync(client: Any, fingerprint: str) -> None:
+    """Record the fingerprint of the pets this sync sent."""
+    try:
+        client.put_object(
+            Bucket=STATE_BUCKET,
+            Key=LAST_SYNC_KEY,
+            Body=json.dumps({"synced_at": time.time(), "fingerprint": fingerprint}),
+            ContentType="application/json",
+        )
+    except Exception:  # pylint: disable=broad-except
+        # the next sync just runs in full
+        logger.exception("could not record the last sync")
+
+
+@functools.lru_cache(maxsize=None)
+def get_config() -> configparser.ConfigParser:
+    """Parse config.ini once per container, it ships with the code."""
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    return config
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(service_name: str) -> Any:
+    """Build an AWS client on first use and reuse it while the container is warm."""
+    # boto3 is heavier than the rest of the sync put together, so it is imported on
+    # first use rather than when lambda loads the handler
+    import boto3
+
+    return boto3.client(service_name)
+
+
+def to_csv_description(description: str) -> str:
+    """Encode newlines as the html entities Petfinder imports."""
+    return description.replace("\n", "&#10;")
 
 
 def get_shelterluv_pets(shelterluv_key: str) -> Dict[str, Any]:
@@ -40,7 +138,9 @@ def get_shelterluv_pets(shelterluv_key: str) -> Dict[str, Any]:
 
     url = "https://www.shelterluv.com/api/v1/animals?status_type=publishable"
 
-    while response := requests.get(url, headers=headers):
+    while True:
+        response = requests.get(url, headers=headers, timeout=run_deadline.timeout())
+
         # check http response code
         if response.status_code != 200:
             logger.error("invalid response code")
@@ -90,23 +190,32 @@ def get_airtable_pets(airtable_section: Any) -> Dict[str, Any]:
     url = "https://api.airtable.com/v0/" + airtable_section["BASE"] + "/Pets"
     headers = {"Authorization": "Bearer " + airtable_section["AIRTABLE_API_KEY"]}
 
-    response = requests.get(url, headers=headers)
-    if response.status_code != requests.codes.ok:
-        logger.error("Airtable response: ")
-        logger.error(response)
-        logger.error("URL: %s", url)
-        logger.error("Headers: %s", str(headers))
-        raise requests.RequestException(
-            "invalid airtable response {}".format(response.status_code)
+    params: Dict[str, str] = {}
+    airtable_pets = {}
+
+    while True:
+        response = requests.get(
+            url, headers=headers, params=params, timeout=run_deadline.timeout()
         )
+        if response.status_code != requests.codes.ok:
+            logger.error("Airtable response: ")
+            logger.error(response)
+            logger.error("URL: %s", url)
+            logger.error("Headers: %s", str(headers))
+            raise requests.RequestException(
+                "invalid airtable response {}".format(response.status_code)
+            )
 
-    airtable_response = response.json()
+        airtable_response = response.json()
 
-    airtable_pets = {}
+        for pet in airtable_response.get("records", []):
+            if "Published - Available" in pet.get("fields").get("Status", ""):
+                airtable_pets[pet["id"]] = pet["fields"]
 
-    for pet in airtable_response.get("records", []):
-        if "Published - Available" in pet.get("fields").get("Status"):
-            airtable_pets[pet["id"]] = pet["fields"]
+        # airtable pages at 100 records and hands back an offset while there are more
+        if not airtable_response.get("offset"):
+            break
+        params = {"offset": airtable_response["offset"]}
 
     return airtable_pets
 
@@ -138,7 +247,7 @@ def shelterluv_to_csv(shelterluv_pets: Dict[str, Any]) -> List[Dict[str, Any]]:
             "Sex": "M" if fields["Sex"] == "Male" else "F",
             "Size": get_size_from_shelterluv(fields["Size"]),
             "Age": get_age_from_shelterluv(fields["Age"]),
-            "Desc": fields["Description"].replace("\n", "&#10;"),
+            "Desc": to_csv_description(fields["Description"]),
             "Type": get_type_from_shelterluv(fields["Type"]),
             "Status": "A",
             "Shots": "1",
@@ -0,0 +1,225 @@
+from typing import Any
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from petfinder_sync import ingest
+
+# the Pets attributes wordpress_pet_sync reads into its Pet record and writes to
+# each post, anything ingest leaves out is blanked on the website
+WORDPRESS_PET_ATTRIBUTES = [
+    "id",
+    "name",
+    "description",
+    "photos",
+    "coverPhoto",
+    "age",
+    "breed",
+    "color",
+    "adoptLink",
+    "internalId",
+    "sex",
+    "size",
+    "species",
+    "source",
+    "status",
+    "video",
+]
+
+
+def test_shelterluv_to_pet() -> None:
+    pet = ingest.shelterluv_to_pet(
+        "12",
+        {
+            "ID": "12",
+            "Internal-ID": "DPA-A-12",
+            "Name": "Fido",
+            "Description": "A good dog",
+            "Photos": ["https://a/1.jpg", "https://a/2.jpg"],
+            "CoverPhoto": "https://a/1.jpg",
+            "Age": 30,
+            "Breed": "Beagle\\/Mix",
+            "Color": "Black\\/White",
+            "Sex": "Male",
+            "Size": "Medium (26-60)",
+            "Type": "Dog",
+            "Status": "Healthy In Home",
+            "Videos": [{"YoutubeUrl": "https://youtube/1"}],
+        },
+    )
+
+    assert pet == {
+        "id": "12",
+        "name": "Fido",
+        "description": "A good dog",
+        "photos": ["https://a/1.jpg", "https://a/2.jpg"],
+        "coverPhoto": "https://a/1.jpg",
+        "age": "Adult",
+        "breed": "Beagle / Mix",
+        "color": "Black / White",
+        "adoptLink": "https://www.shelterluv.com/matchme/adopt/DPA-A-12",
+        "internalId": "DPA-A-12",
+        "sex": "Male",
+        "size": "Medium",
+        "species": "Dog",
+        "source": "shelterluv",
+        "status": "Healthy In Home",
+        "video": "https://youtube/1",
+    }
+
+
+def test_airtable_to_pet() -> None:
+    pet = ingest.airtable_to_pet(
+        "rec1",
+        {
+            "Pet Name": "Daisy",
+            "Pet Species": "Cat",
+            "Breed - Cat": "Siamese",
+            "Pictures": [{"filename": "a.jpg"}, {"filename": "b.jpg"}],
+            "PictureMap-DoNotModify": '{"a.jpg": "renamed.jpg"}',
+        },
+    )
+
+    assert pet["breed"] == "Siamese"
+    assert pet["photos"] == [
+        ingest.NEW_DIGS_PHOTOS_URL + "rec1/renamed.jpg",
+        ingest.NEW_DIGS_PHOTOS_URL + "rec1/b.jpg",
+    ]
+    assert pet["coverPhoto"] == pet["photos"][0]
+    assert pet["source"] == "airtable"
+    assert pet["adoptLink"] == ingest.NEW_DIGS_ADOPT_URL
+
+
+def test_pets_carry_what_wordpress_reads() -> None:
+    shelterluv = ingest.shelterluv_to_pet("12", {"Internal-ID": "DPA-A-12"})
+    airtable = ingest.airtable_to_pet("rec1", {})
+
+    for pet in (shelterluv, airtable):
+        # every attribute ingest writes is one wordpress reads, under the same name
+        assert set(pet) - {"id"} <= set(WORDPRESS_PET_ATTRIBUTES)
+        assert pet["adoptLink"]
+
+    # and shelterluv pets, which have every field, carry all of them
+    assert set(WORDPRESS_PET_ATTRIBUTES) == set(shelterluv)
+
+
+def test_upsert_pets_writes_only_changes() -> None:
+    client = boto3.client("dynamodb", region_name="us-east-2")
+    unchanged = {"id": "1", "name": "Fido", "source": "shelterluv"}
+    changed = {"id": "2", "name": "Renamed", "photos": ["https://a/1.jpg"]}
+    added = {"id": "3", "name": "Rex", "description": ""}
+
+    with Stubber(client) as stub:
+        stub.add_response(
+            "scan",
+            {
+                "Items": [
+                    {
+                        "id": {"S": "1"},
+                        "contentHash": {"S": ingest.content_hash(unchanged)},
+                    },
+                    {"id": {"S": "2"}, "contentHash": {"S": "stale"}},
+                    {"id": {"S": "4"}},
+                    # airtable wasn't read, so its pets stay
+                    {"id": {"S": "rec9"}, "source": {"S": "airtable"}},
+                ]
+            },
+            {
+                "TableName": "Pets",
+                "ProjectionExpression": "#id, #hash, #source",
+                "ExpressionAttributeNames": {
+                    "#id": "id",
+                    "#hash": "contentHash",
+                    "#source": "source",
+                },
+            },
+        )
+        stub.add_response(
+            "batch_write_item",
+            {"UnprocessedItems": {}},
+            {
+                "RequestItems": {
+                    "Pets": [
+                        {
+                            "PutRequest": {
+                                "Item": {
+                                    "contentHash": {"S": ingest.content_hash(changed)},
+                                    "id": {"S": "2"},
+                                    "name": {"S": "Renamed"},
+                                    "photos": {"L": [{"S": "https://a/1.jpg"}]},
+                                }
+                            }
+                        },
+                        {
+                            "PutRequest": {
+                                "Item": {
+                                    "contentHash": {"S": ingest.content_hash(added)},
+                                    "id": {"S": "3"},
+                                    "name": {"S": "Rex"},
+                                }
+                            }
+                        },
+                        {"DeleteRequest": {"Key": {"id": {"S": "4"}}}},
+                    ]
+                }
+            },
+        )
+
+        ingest.upsert_pets(client, [unchanged, changed, added], ["shelterluv"])
+
+        stub.assert_no_pending_responses()
+
+
+def test_upsert_pets_refuses_empty_feed() -> None:
+    with pytest.raises(ValueError):
+        ingest.upsert_pets(
+            boto3.client("dynamodb", region_name="us-east-2"), [], ["shelterluv"]
+        )
+
+
+def test_upsert_pets_keeps_pets_of_an_empty_source() -> None:
+    client = boto3.client("dynamodb", region_name="us-east-2")
+    pet = {"id": "rec1", "name": "Daisy", "source": "airtable"}
+
+    with Stubber(client) as stub:
+        stub.add_response(
+            "scan",
+            {
+                "Items": [
+                    {
+                        "id": {"S": "rec1"},
+                        "contentHash": {"S": ingest.content_hash(pet)},
+                    },
+                    {"id": {"S": "12"}, "source": {"S": "shelterluv"}},
+                ]
+            },
+        )
+
+        # shelterluv came back empty, so its stored pet is not deleted
+        ingest.upsert_pets(client, [pet], ["shelterluv", "airtable"])
+
+        stub.assert_no_pending_responses()
+
+
+def test_batch_write_retries_unprocessed_items(monkeypatch: Any) -> None:
+    monkeypatch.setattr(ingest.time, "sleep", lambda seconds: None)
+    client = boto3.client("dynamodb", region_name="us-east-2")
+    first = {"DeleteRequest": {"Key": {"id": {"S": "1"}}}}
+    second = {"DeleteRequest": {"Key": {"id": {"S": "2"}}}}
+
+    with Stubber(client) as stub:
+        stub.add_response(
+            "batch_write_item",
+            {"UnprocessedItems": {"Pets": [second]}},
+            {"RequestItems": {"Pets": [first, second]}},
+        )
+        stub.add_response(
+            "batch_write_item",
+            {"UnprocessedItems": {}},
+            {"RequestItems": {"Pets": [second]}},
+        )
+
+        ingest.batch_write(client, [first, second])
+
+        stub.assert_no_pending_responses()
@@ -1,9 +1,15 @@
+import io
+import json
+import time
 from typing import Any, Dict
 
+import boto3
 import pytest
 import requests
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
 
-from petfinder_sync import petfinder_sync
+from petfinder_sync import deadline, petfinder_sync
 
 
 def test_get_shelterluv_pets(requests_mock: Any) -> None:
@@ -84,6 +90,32 @@ def test_get_airtable_pets(requests_mock: Any) -> None:
     }
 
 
+def test_get_shelterluv_pets_raises_on_error(requests_mock: Any) -> None:
+    requests_mock.get(
+        "https://www.shelterluv.com/api/v1/animals?status_type=publishable",
+        status_code=503,
+    )
+
+    with pytest.raises(requests.RequestException):
+        petfinder_sync.get_shelterluv_pets("")
+
+
+def test_get_airtable_pets_follows_offset(requests_mock: Any) -> None:
+    published = {"Status": "Published - Available"}
+    requests_mock.get(
+        "https://api.airtable.com/v0/base/Pets",
+        [
+            {"json": {"records": [{"id": "rec1", "fields": published}], "offset": "o"}},
+            {"json": {"records": [{"id": "rec2", "fields": published}]}},
+        ],
+    )
+
+    pets = petfinder_sync.get_airtable_pets({"BASE": "base", "AIRTABLE_API_KEY": ""})
+
+    assert list(pets) == ["rec1", "rec2"]
+    assert requests_mock.request_history[1].qs == {"offset": ["o"]}
+
+
 @pytest.mark.parametrize(
     "type, color, first_color, second_color",
     [
@@ -423,3 +455,87 @@ def test_shelterluv_to_petfinder_conversion():
         "no_other_note": "",
         "tags": "",
     }
+
+
+def test_source_fingerprint_follows_updates() -> None:
+    shelterluv = {"1": {"ID": "1", "LastUpdatedUnixTime": "100", "Name": "Fido"}}
+    airtable = {"rec1": {"Pet Name": "Rex"}}
+    fingerprint = petfinder_sync.get_source_fingerprint(shelterluv, airtable)
+
+    # only the update time is read from shelterluv
+    shelterluv["1"]["Name"] = "Renamed"
+    assert petfinder_sync.get_source_fingerprint(shelterluv, airtable) == fingerprint
+
+    shelterluv["1"]["LastUpdatedUnixTime"] = "200"
+    assert petfinder_sync.get_source_fingerprint(shelterluv, airtable) != fingerprint
+
+    shelterluv["1"]["LastUpdatedUnixTime"] = "100"
+    airtable["rec1"]["Pet Name"] = "Renamed"
+    assert petfinder_sync.get_source_fingerprint(shelterluv, airtable) != fingerprint
+
+
+def test_is_unchanged() -> None:
+    now = time.time()
+
+    assert petfinder_sync.is_unchanged({"synced_at": now, "fingerprint": "a"}, "a")
+    assert not petfinder_sync.is_unchanged({"synced_at": now, "fingerprint": "a"}, "b")
+    assert not petfinder_sync.is_unchanged(None, "a")
+    # a stale sync is repeated in full
+    stale = now - petfinder_sync.FORCE_SYNC_SECONDS - 1
+    assert not petfinder_sync.is_unchanged(
+        {"synced_at": stale, "fingerprint": "a"}, "a"
+    )
+
+
+def test_last_sync_round_trip() -> None:
+    client = boto3.client("s3", region_name="us-east-2")
+    body = json.dumps({"synced_at": 1.0, "fingerprint": "a"}).encode()
+
+    with Stubber(client) as stub:
+        stub.add_client_error("get_object", "NoSuchKey", http_status_code=404)
+        stub.add_response(
+            "get_object",
+            {"Body": StreamingBody(io.BytesIO(body), len(body))},
+            {"Bucket": "dpa-petfinder-sync", "Key": "last_sync.json"},
+        )
+
+        assert petfinder_sync.load_last_sync(client) is None
+        assert petfinder_sync.load_last_sync(client) == {
+            "synced_at": 1.0,
+            "fingerprint": "a",
+        }
+
+
+class Context:
+    """The part of the lambda context the deadline reads."""
+
+    def __init__(self, remaining_ms: int) -> None:
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+def test_deadline_timeouts() -> None:
+    run = deadline.Deadline()
+    assert run.timeout() == deadline.MAX_CALL_SECONDS
+
+    run.start(Context(20_000), reserve=petfinder_sync.FINISH_RESERVE_SECONDS)
+    assert 9 < run.timeout() <= 10
+
+    run.start(Context(5_000), reserve=petfinder_sync.FINISH_RESERVE_SECONDS)
+    assert run.timeout() == deadline.MIN_CALL_SECONDS
+
+
+def test_requests_take_the_deadline_timeout(
+    requests_mock: Any, monkeypatch: Any
+) -> None:
+    monkeypatch.setattr(petfinder_sync, "run_deadline", deadline.Deadline())
+    petfinder_sync.run_deadline.start(
+        Context(20_000), reserve=petfinder_sync.FINISH_RESERVE_SECONDS
+    )
+    requests_mock.get("https://api.airtable.com/v0/base/Pets", json={"records": []})
+
+    petfinder_sync.get_airtable_pets({"BASE": "base", "AIRTABLE_API_KEY": ""})
+
+    assert 9 < requests_mock.last_request.timeout <= 10
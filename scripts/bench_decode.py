@@ -0,0 +1,90 @@
+"""
+Benchmark decoding raw DynamoDB Pets items into the WordPress sync's records.
+
+Compares the generic cerealbox walk (every attribute converted, then the
+compared ones copied into a Pet) with the decoder compiled from PET_SPEC, at
+a range of table sizes and with a configurable number of attributes the sync
+never reads.
+
+Usage: python scripts/bench_decode.py [--sizes 10000 100000] [--unused N]
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "wordpress_pet_sync"))
+
+from cerealbox.dynamo import from_dynamodb_json  # noqa: E402
+
+from wordpress_pet_sync.records import PET_ATTRIBUTES, Pet  # noqa: E402
+from wordpress_pet_sync.wordpress_pet_sync import decode_pet  # noqa: E402
+
+
+def make_items(count: int, unused: int) -> List[Dict[str, Any]]:
+    items = []
+    for index in range(count):
+        item: Dict[str, Any] = {
+            name: {"S": "{} {}".format(name, index)} for name in PET_ATTRIBUTES
+        }
+        item["photos"] = {
+            "L": [{"S": "https://photos/{}/{}".format(index, n)} for n in range(6)]
+        }
+        item["video"] = {"NULL": True}
+        for n in range(unused):
+            item["unused{}".format(n)] = {
+                "M": {"notes": {"S": "x" * 40}, "count": {"N": str(n)}}
+            }
+        items.append(item)
+    return items
+
+
+def cerealbox_decode(item: Dict[str, Any]) -> Pet:
+    decoded = from_dynamodb_json(item)
+    return Pet(
+        **{
+            name: decoded[name]
+            for name in PET_ATTRIBUTES
+            if decoded.get(name) is not None
+        }
+    )
+
+
+def bench(
+    decode: Callable[[Dict[str, Any]], Pet], items: List[Dict[str, Any]]
+) -> float:
+    started = time.perf_counter()
+    for item in items:
+        decode(item)
+    return time.perf_counter() - started
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument(
+        "--unused", type=int, default=10, help="unread attributes per item"
+    )
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        items = make_items(size, args.unused)
+        if any(cerealbox_decode(item) != decode_pet(item) for item in items[:100]):
+            print("decoders disagree")
+            return 1
+
+        generic = bench(cerealbox_decode, items)
+        specialized = bench(decode_pet, items)
+        print(
+            f"{size} items, {args.unused} unused attributes: cerealbox {generic:.2f}s, "
+            f"spec decoder {specialized:.3f}s ({generic / specialized:.0f}x)"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
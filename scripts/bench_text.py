@@ -0,0 +1,141 @@
+"""
+Benchmark description normalization against the replace chains it replaced.
+
+Each destination's profile runs over a set of long, html heavy descriptions.
+The WordPress profiles are memoized, so they are timed uncached and warm (the
+lookup a warm Lambda makes for an unchanged pet). The CSV encoders are a
+replace or two, cheaper than hashing the description for a cache lookup, so
+they are timed as they are. The old str.replace chains are kept here as the
+baseline, and every profile is checked against them before timing.
+
+Usage: python scripts/bench_text.py [--pets N] [--repeat N]
+"""
+
+import argparse
+import html
+import os
+import random
+import re
+import sys
+import timeit
+from typing import Callable, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for package in ("wordpress_pet_sync", "sync_to_rescue_groups", "petfinder_sync"):
+    sys.path.insert(0, os.path.join(ROOT, package))
+
+from petfinder_sync import petfinder_sync  # noqa: E402
+from sync_to_rescue_groups import sync_to_rescue_groups  # noqa: E402
+from wordpress_pet_sync import text  # noqa: E402
+
+SENTENCES = [
+    "Meet Biscuit, a sweet 3 year old hound mix who loves long walks.",
+    "She’s house trained &amp; crate trained, and knows “sit” and “down”.",
+    "Biscuit does well with other dogs – cats are unknown.",
+    "<p>Ask about our foster to adopt program!</p>\n<p>",
+    "Line one\\nLine two\\r\\n<br />",
+    "Adoption fee includes spay/neuter, vaccines &#8217;n microchip.\r\n",
+]
+
+
+def legacy_convert_wordpress_content(content: str) -> str:
+    content = html.unescape(content)
+    content = content.replace("”", '"')
+    content = content.replace("“", '"')
+    content = content.replace("’", "'")
+    content = content.replace("</p>\n<p>", "\\n\\n")
+    content = content.replace("<p>", "")
+    content = content.replace("</p>", "")
+    content = content.replace("– ", "- ")
+    return content
+
+
+def legacy_strip_description(description: str) -> str:
+    description = description.replace("\\n", "")
+    description = description.replace("\\r", "")
+    description = description.replace("<br", "")
+    description = re.sub(r"\W+", "", description)
+    return description
+
+
+def legacy_wordpress_compare(content: str) -> str:
+    return legacy_strip_description(legacy_convert_wordpress_content(content))
+
+
+def legacy_rescuegroups_csv(description: str) -> str:
+    description = description.replace("\r", "&#10;")
+    description = description.replace("\n", "&#10;")
+    return description
+
+
+def legacy_petfinder_csv(description: str) -> str:
+    return description.replace("\n", "&#10;")
+
+
+def descriptions(count: int) -> List[str]:
+    rng = random.Random(0)
+    return [
+        " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(20, 60)))
+        for _ in range(count)
+    ]
+
+
+def bench(function: Callable[[str], str], pets: List[str], repeat: int) -> float:
+    """Best time in microseconds per description."""
+    runs = timeit.repeat(
+        lambda: [function(pet) for pet in pets], number=1, repeat=repeat
+    )
+    return min(runs) / len(pets) * 1_000_000
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pets", type=int, default=500, help="descriptions per run")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="runs to take the best of"
+    )
+    args = parser.parse_args(argv)
+
+    pets = descriptions(args.pets)
+    profiles = [
+        ("wordpress_content", legacy_convert_wordpress_content, text.WORDPRESS_CONTENT),
+        ("wordpress_compare", legacy_wordpress_compare, text.WORDPRESS_COMPARE),
+        (
+            "rescuegroups_csv",
+            legacy_rescuegroups_csv,
+            sync_to_rescue_groups.to_csv_description,
+        ),
+        ("petfinder_csv", legacy_petfinder_csv, petfinder_sync.to_csv_description),
+    ]
+
+    failed = False
+    for name, legacy, profile in profiles:
+        mismatches = sum(legacy(pet) != profile(pet) for pet in pets)
+        if mismatches:
+            print(f"{name}: {mismatches} descriptions differ from the legacy chain")
+            failed = True
+            continue
+
+        legacy_us = bench(legacy, pets, args.repeat)
+        # __wrapped__ is the uncached function behind an lru_cache
+        uncached = getattr(getattr(profile, "normalize", profile), "__wrapped__", None)
+        if uncached is None:
+            profile_us = bench(profile, pets, args.repeat)
+            print(
+                f"{name}: legacy {legacy_us:.1f} us, "
+                f"now {profile_us:.1f} us ({legacy_us / profile_us:.1f}x)"
+            )
+            continue
+
+        uncached_us = bench(uncached, pets, args.repeat)
+        warm_us = bench(profile, pets, args.repeat)
+        print(
+            f"{name}: legacy {legacy_us:.1f} us, uncached {uncached_us:.1f} us "
+            f"({legacy_us / uncached_us:.1f}x), warm cache {warm_us:.2f} us"
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""
+Check that every Lambda's copy of a shared module matches shared/.
+
+Each Lambda is zipped from its own directory with no build step, so modules
+they share are copied next to each handler rather than imported from one
+place. Edit the file in shared/, copy it over with --fix, and this check fails
+whenever a copy has drifted.
+
+Usage: python scripts/check_shared.py [--fix]
+"""
+
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# shared module to the package directories that carry a copy of it
+COPIES: Dict[str, List[str]] = {
+    "deadline.py": [
+        "wordpress_pet_sync/wordpress_pet_sync",
+        "sync_to_rescue_groups/sync_to_rescue_groups",
+        "petfinder_sync/petfinder_sync",
+    ],
+    "secret_cache.py": [
+        "wordpress_pet_sync/wordpress_pet_sync",
+        "sync_to_rescue_groups/sync_to_rescue_groups",
+    ],
+}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--fix", action="store_true", help="overwrite drifted copies from shared/"
+    )
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name, directories in COPIES.items():
+        source = os.path.join(ROOT, "shared", name)
+        for directory in directories:
+            copy = os.path.join(ROOT, directory, name)
+            if os.path.exists(copy) and filecmp.cmp(source, copy, shallow=False):
+                continue
+            if args.fix:
+                shutil.copyfile(source, copy)
+                print(f"copied shared/{name} to {directory}")
+            else:
+                print(f"{directory}/{name} differs from shared/{name}")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,118 @@
+"""
+Report import-time costs for each Lambda entry point.
+
+Every handler module is imported in a fresh interpreter with
+``python -X importtime`` and no AWS region or credentials, so a module that
+builds clients or does other AWS work at import fails here instead of
+slowing down cold starts. The biggest costs are grouped by top-level package
+and each handler's total is checked against its budget.
+
+Usage: python scripts/import_costs.py [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class EntryPoint(NamedTuple):
+    name: str
+    cwd: str
+    module: str
+    budget_ms: int
+
+
+ENTRY_POINTS = [
+    EntryPoint(
+        "wordpress_pet_sync",
+        "wordpress_pet_sync",
+        "wordpress_pet_sync.wordpress_pet_sync",
+        400,
+    ),
+    EntryPoint(
+        "sync_to_rescue_groups",
+        "sync_to_rescue_groups/sync_to_rescue_groups",
+        "sync_to_rescue_groups",
+        350,
+    ),
+    EntryPoint(
+        "petfinder_sync", "petfinder_sync", "petfinder_sync.petfinder_sync", 150
+    ),
+    EntryPoint(
+        "foster_agreement_webhook",
+        "jotform_alerts/foster_agreement_webhook",
+        "webhook",
+        300,
+    ),
+]
+
+
+def measure(entry_point: EntryPoint) -> Tuple[int, Dict[str, int]]:
+    """Import the handler module and return its total and per-package costs."""
+    env = {
+        key: value for key, value in os.environ.items() if not key.startswith("AWS_")
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry_point.module}"],
+        cwd=os.path.join(ROOT, entry_point.cwd),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        # importtime output is mixed in with the traceback, show the error only
+        error = [
+            line for line in result.stderr.splitlines() if "import time:" not in line
+        ]
+        raise RuntimeError("\n".join(error))
+
+    total_us = 0
+    packages: Dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us)
+        if name == entry_point.module:
+            total_us = int(cumulative_us)
+
+    return total_us // 1000, {name: us // 1000 for name, us in packages.items()}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=8, help="packages to list")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for entry_point in ENTRY_POINTS:
+        try:
+            total_ms, packages = measure(entry_point)
+        except RuntimeError as e:
+            print(f"{entry_point.name}: import failed\n{e}\n")
+            failed = True
+            continue
+
+        over = total_ms > entry_point.budget_ms
+        failed = failed or over
+        print(
+            f"{entry_point.name}: {total_ms} ms "
+            f"(budget {entry_point.budget_ms} ms){' OVER BUDGET' if over else ''}"
+        )
+        biggest = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        for name, ms in biggest[: args.top]:
+            print(f"  {ms:>6} ms  {name}")
+        print()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,65 @@
+"""
+Secrets Manager values cached between warm invocations and fetched in batches.
+
+Shared by the sync Lambdas. Each one is zipped from its own directory, so this
+file is copied next to every handler that uses it. shared/ holds the source and
+scripts/check_shared.py fails when a copy drifts from it.
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+logger = logging.getLogger()
+
+# how long a cached secret is used before it is fetched again
+TTL_SECONDS = 15 * 60
+
+
+class SecretCache:
+    """Secret strings by name, each kept until its ttl runs out or it is dropped."""
+
+    def __init__(
+        self,
+        get_client: Callable[[str], Any],
+        ttl_seconds: float = TTL_SECONDS,
+    ):
+        self.get_client = get_client
+        self.ttl_seconds = ttl_seconds
+        # name to (when it expires on the monotonic clock, secret string)
+        self.values: Dict[str, Tuple[float, str]] = {}
+
+    def prefetch(self, names: Iterable[str]) -> None:
+        """Load every missing or expired secret with one batched call."""
+        now = time.monotonic()
+        missing = [name for name in names if self.expired(name, now)]
+        if not missing:
+            return
+
+        logger.debug("fetching secrets {}".format(missing))
+        client = self.get_client("secretsmanager")
+        response = client.batch_get_secret_value(SecretIdList=missing)
+
+        for secret in response.get("SecretValues", []):
+            expires = now + self.ttl_seconds
+            self.values[secret["Name"]] = (expires, secret["SecretString"])
+
+        for error in response.get("Errors", []):
+            secret_id, message = error.get("SecretId"), error.get("Message")
+            logger.error("could not fetch secret {}: {}".format(secret_id, message))
+
+    def expired(self, name: str, now: float) -> bool:
+        return name not in self.values or self.values[name][0] <= now
+
+    def get(self, name: str) -> str:
+        """The secret string, fetched first if it isn't cached."""
+        self.prefetch([name])
+
+        if name not in self.values:
+            raise ValueError("Secret {} not found".format(name))
+
+        return self.values[name][1]
+
+    def invalidate(self, name: str) -> None:
+        """Drop a cached secret so the next lookup goes back to Secrets Manager."""
+        self.values.pop(name, None)
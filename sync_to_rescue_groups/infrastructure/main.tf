@@ -34,6 +34,24 @@ resource "aws_s3_bucket" "sync_to_rescue_groups_bucket" {
   bucket = "dpa-rescue-groups-sync"
 }
 
+resource "aws_s3_bucket_lifecycle_configuration" "sync_to_rescue_groups_bucket_lifecycle" {
+  bucket = aws_s3_bucket.sync_to_rescue_groups_bucket.id
+
+  rule {
+    id = "sync_to_rescue_groups_checkpoints_rule"
+
+    filter {
+      prefix = "checkpoints/"
+    }
+
+    expiration {
+      days = 1
+    }
+
+    status = "Enabled"
+  }
+}
+
 resource "aws_s3_object" "sync_to_rescue_groups_object" {
   bucket = aws_s3_bucket.sync_to_rescue_groups_bucket.id
 
@@ -122,15 +140,29 @@ resource "aws_cloudwatch_log_group" "sync_to_rescue_groups_log_group" {
   retention_in_days = 90
 }
 
+resource "aws_cloudwatch_log_metric_filter" "sync_to_rescue_groups_init_duration" {
+  name           = "sync_to_rescue_groups_init_duration"
+  log_group_name = aws_cloudwatch_log_group.sync_to_rescue_groups_log_group.name
+  pattern        = "[report=\"REPORT\", ..., init=\"Init\", init_label=\"Duration:\", init_duration, init_unit]"
+
+  metric_transformation {
+    name      = "InitDuration"
+    namespace = "DPA/ColdStarts/sync_to_rescue_groups"
+    value     = "$init_duration"
+    unit      = "Milliseconds"
+  }
+}
+
 resource "aws_cloudwatch_event_rule" "sync_to_rescue_groups_event_rule" {
   name = "sync_to_rescue_groups_event_rule"
-  description = "invoke rescuegroups sync once an hour"
+  description = "invoke the full rescuegroups sync once an hour"
   schedule_expression = "rate(1 hour)"
 }
 
 resource "aws_cloudwatch_event_target" "sync_to_rescue_groups_event_target" {
   arn = aws_lambda_function.sync_to_rescue_groups.arn
   rule = aws_cloudwatch_event_rule.sync_to_rescue_groups_event_rule.name
+  input = jsonencode({ tier = "full" })
 }
 
 resource "aws_lambda_permission" "sync_to_rescue_groups_cloudwatch_permission" {
@@ -141,6 +173,27 @@ resource "aws_lambda_permission" "sync_to_rescue_groups_cloudwatch_permission" {
   source_arn = aws_cloudwatch_event_rule.sync_to_rescue_groups_event_rule.arn
 }
 
+# uploads only the rosters that gained or lost pets, so new pets are listed within minutes
+resource "aws_cloudwatch_event_rule" "sync_to_rescue_groups_fast_event_rule" {
+  name = "sync_to_rescue_groups_fast_event_rule"
+  description = "upload changed rescuegroups rosters every ten minutes"
+  schedule_expression = "rate(10 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "sync_to_rescue_groups_fast_event_target" {
+  arn = aws_lambda_function.sync_to_rescue_groups.arn
+  rule = aws_cloudwatch_event_rule.sync_to_rescue_groups_fast_event_rule.name
+  input = jsonencode({ tier = "fast" })
+}
+
+resource "aws_lambda_permission" "sync_to_rescue_groups_fast_cloudwatch_permission" {
+  statement_id = "AllowFastExecutionFromCloudWatch"
+  action = "lambda:InvokeFunction"
+  function_name = "sync_to_rescue_groups"
+  principal = "events.amazonaws.com"
+  source_arn = aws_cloudwatch_event_rule.sync_to_rescue_groups_fast_event_rule.arn
+}
+
 data "aws_secretsmanager_secret" "shelterluv_api_key" {
   name = "shelterluv_api_key"
 }
@@ -196,6 +249,12 @@ resource "aws_iam_policy" "rg_sync_policy" {
           data.aws_secretsmanager_secret.shelterluv_api_key.arn,
           data.aws_secretsmanager_secret.newdigs_shelterluv_api_key.arn
         ]
+      }, {
+        Action    = [
+          "secretsmanager:BatchGetSecretValue",
+        ]
+        Effect    = "Allow"
+        Resource  = "*"
       }, {
         Action    = [
           "logs:CreateLogStream",
@@ -209,6 +268,22 @@ resource "aws_iam_policy" "rg_sync_policy" {
         ]
         Effect    = "Allow"
         Resource  = "${aws_s3_bucket.sync_to_rescue_groups_bucket.arn}/*"
+      }, {
+        Action    = [
+          "s3:GetObject",
+          "s3:DeleteObject",
+        ]
+        Effect    = "Allow"
+        Resource  = [
+          "${aws_s3_bucket.sync_to_rescue_groups_bucket.arn}/checkpoints/*",
+          "${aws_s3_bucket.sync_to_rescue_groups_bucket.arn}/uploads/*",
+        ]
+      }, {
+        Action    = [
+          "s3:ListBucket",
+        ]
+        Effect    = "Allow"
+        Resource  = aws_s3_bucket.sync_to_rescue_groups_bucket.arn
       }, {
         Action    = ["sns:Publish*"]
         Effect    = "Allow"
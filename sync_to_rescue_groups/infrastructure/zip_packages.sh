@@ -1,10 +1,21 @@
 uv export --frozen --no-dev --no-editable -o requirements.txt
+rm -rf packages python_layer
+# the lambda filesystem is read only, so ship bytecode instead of compiling
+# the layer on every cold start
 uv pip install \
    --no-installer-metadata \
-   --no-compile-bytecode \
+   --compile-bytecode \
    --python-platform x86_64-manylinux2014 \
    --python 3.9 \
    --prefix packages \
    -r requirements.txt
 mkdir -p python_layer/python
 cp -r packages/lib python_layer/python/
+
+# boto3 ships with the lambda runtime, and tests, type stubs and package
+# metadata are never imported, so keep them out of the layer
+site_packages=python_layer/python/lib/python3.9/site-packages
+rm -rf "$site_packages"/boto3* "$site_packages"/botocore* "$site_packages"/s3transfer* "$site_packages"/jmespath*
+find "$site_packages" -type d \( -name tests -o -name test \) -prune -exec rm -rf {} +
+find "$site_packages" \( -name "*.pyi" -o -name "py.typed" \) -delete
+find "$site_packages" -path "*.dist-info/*" ! -name METADATA ! -name top_level.txt -delete
@@ -0,0 +1,57 @@
+"""
+When a Lambda run has to stop starting work, from the time the invocation has left.
+
+Shared by the sync Lambdas. Each one is zipped from its own directory, so this
+file is copied next to every handler that uses it. shared/ holds the source and
+scripts/check_shared.py fails when a copy drifts from it.
+"""
+
+import math
+import time
+from typing import Any, Optional
+
+# the longest any one http call may take, and the least it is given once time is short
+MAX_CALL_SECONDS = 30
+MIN_CALL_SECONDS = 1
+
+
+class Deadline:
+    """Checked between chunks of work, http calls take their timeouts from it."""
+
+    def __init__(self, seconds: float = math.inf):
+        self.ends = time.monotonic() + seconds
+
+    @classmethod
+    def from_context(
+        cls,
+        context: Any,
+        budget: Optional[float] = None,
+        reserve: float = 0.0,
+    ) -> "Deadline":
+        return cls().start(context, budget, reserve)
+
+    def start(
+        self,
+        context: Any,
+        budget: Optional[float] = None,
+        reserve: float = 0.0,
+    ) -> "Deadline":
+        """Count down from the budget or the time lambda has left, less reserve."""
+        seconds = budget if budget is not None else math.inf
+        # local runs and tests have no lambda context
+        get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+        if get_remaining_time is not None:
+            seconds = min(seconds, get_remaining_time() / 1000 - reserve)
+        self.ends = time.monotonic() + seconds
+        return self
+
+    def remaining(self) -> float:
+        return self.ends - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, reserve: float = 0.0) -> float:
+        """A timeout for one http call that still leaves reserve seconds over."""
+        seconds = max(self.remaining() - reserve, MIN_CALL_SECONDS)
+        return min(MAX_CALL_SECONDS, seconds)
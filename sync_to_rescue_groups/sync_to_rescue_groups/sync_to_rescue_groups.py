@@ -7,22 +7,57 @@ Airtable New Digs and Shelterluv to RescueGroups.org sync.
 import configparser
 import csv
 import ftplib
+import functools
+import hashlib
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
 from urllib.parse import urlparse
 
 import boto3
 import requests
 
+try:
+    from . import deadline, secret_cache
+except ImportError:
+    # lambda loads this file as a top-level module, next to its shared copies
+    import deadline
+    import secret_cache
+
 logger: logging.Logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-config = configparser.ConfigParser()
-config.read("config.ini")
-
-secrets_client = boto3.client("secretsmanager")
-s3_client = boto3.client("s3")
+# secrets are cached in module scope so warm invocations skip secrets manager
+SECRET_TTL_SECONDS = 15 * 60
+SHELTERLUV_SECRETS = ("shelterluv_api_key", "newdigs_shelterluv_api_key")
+
+# the same cache the other sync lambdas use, see shared/secret_cache.py
+secrets_cache = secret_cache.SecretCache(
+    lambda service_name: get_client(service_name), SECRET_TTL_SECONDS
+)
+
+# finished stages are recorded per run, so a retried run skips the uploads already done.
+# "s3" in production, "local" keeps them under /tmp for tests and local runs
+CHECKPOINT_STORE = "s3"
+CHECKPOINT_BUCKET = "dpa-rescue-groups-sync"
+CHECKPOINT_DIRECTORY = "/tmp/checkpoints"
+# async retries give up within six hours, anything older is from a run that is over
+CHECKPOINT_TTL_SECONDS = 6 * 60 * 60
+
+# scheduled runs say which tier they are in their event input. a fast run only
+# uploads a roster when pets were added or removed since the last upload, a full
+# run when anything about its pets changed
+FAST_TIER = "fast"
+# a fast run starts no new upload after this, the next one picks the rest up
+FAST_TIER_BUDGET_SECONDS = 60
+# a full run skips a roster whose source is unchanged since its last upload,
+# unless that upload is older than this or the event asks for {"force": true}
+FORCE_UPLOAD_SECONDS = 6 * 60 * 60
+
+# the time kept back for the FTP upload, photo mirroring stops once less is left
+UPLOAD_RESERVE_SECONDS = 30
 
 CSV_HEADERS = [
     "externalID",
@@ -61,57 +96,335 @@ CSV_HEADERS = [
 ]
 
 
-def handler(event: Dict[str, Any], _: Any) -> None:
+# set by the handler for each invocation, every request takes its timeout from it
+run_deadline = deadline.Deadline()
+
+# photos the current stage left on their Shelterluv url, the handler clears it per stage
+deferred_photos: List[str] = []
+
+
+@functools.lru_cache(maxsize=None)
+def get_config() -> configparser.ConfigParser:
+    """Parse config.ini on first use rather than at import."""
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    return config
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(service_name: str) -> Any:
+    """Build an AWS client on first use and reuse it while the container is warm."""
+    return boto3.client(service_name)
+
+
+def to_csv_description(description: str) -> str:
+    """Encode line breaks as the html entities RescueGroups imports."""
+    return description.replace("\r", "&#10;").replace("\n", "&#10;")
+
+
+def handler(event: Dict[str, Any], context: Any) -> None:
     """Entry point for AWS lambda handler."""
     logger.debug(event)
 
+    # lambda's async retries keep the request id and eventbridge retries keep the event id
+    run_id: Optional[str] = getattr(context, "aws_request_id", None) or event.get("id")
+    finished: List[str] = load_checkpoint(run_id)
+    run_deadline.start(context)
+    fast: bool = event.get("tier") == FAST_TIER
+    force: bool = bool(event.get("force"))
+    started: float = time.monotonic()
+
     try:
-        # get the pets from Airtable
-        airtable_pets: List[Dict[str, Any]] = get_airtable_pets()
-        logger.info(f"Got {len(airtable_pets)} pets from Airtable")
-        newdigs_shelterluv_pets: List[Dict[str, Any]] = get_shelterluv_pets(
-            apikey="newdigs_shelterluv_api_key"
-        )
-        logger.info(f"Got {len(newdigs_shelterluv_pets)} pets from New Digs Shelterluv")
+        # one batched secrets manager call on a cold start, none when warm
+        prefetch_secrets(SHELTERLUV_SECRETS)
 
-        # get the current photos in S3
-        shelterluv_photos: List[str] = get_shelterluv_photos()
+        # the current photos in S3, listed once a roster needs uploading
+        shelterluv_photos: Optional[List[str]] = None
 
-        # create CSV file of available pets
-        csv_file: str = create_new_digs_csv_file(
-            airtable_pets, newdigs_shelterluv_pets, shelterluv_photos
-        )
-
-        # upload CSV file to rescuegroups.org
-        upload_to_rescue_groups(csv_file)
+        if "new_digs" in finished:
+            logger.info("New Digs pets were uploaded by an earlier attempt")
+        else:
+            # get the pets from Airtable
+            airtable_pets: List[Dict[str, Any]] = get_airtable_pets()
+            logger.info(f"Got {len(airtable_pets)} pets from Airtable")
+            newdigs_shelterluv_pets: List[Dict[str, Any]] = get_shelterluv_pets(
+                apikey="newdigs_shelterluv_api_key"
+            )
+            logger.info(
+                f"Got {len(newdigs_shelterluv_pets)} pets from New Digs Shelterluv"
+            )
+            new_digs_roster: List[str] = get_new_digs_roster(
+                airtable_pets, newdigs_shelterluv_pets
+            )
+            new_digs_fingerprint: str = get_new_digs_fingerprint(
+                airtable_pets, newdigs_shelterluv_pets
+            )
 
-        # get the pets from Shelterluv
-        shelterluv_pets: Dict[str, Any] = get_shelterluv_pets()
-        logger.info(f"Got {len(shelterluv_pets)} pets from Shelterluv")
+            if should_upload(
+                "new_digs", new_digs_roster, new_digs_fingerprint, fast, force
+            ):
+                shelterluv_photos = get_shelterluv_photos()
+                deferred_photos.clear()
 
-        # create CSV of Shelterluv pets
-        csv_file_sl: str = create_sl_csv_file(shelterluv_pets, shelterluv_photos)
+                # create CSV file of available pets
+                csv_file: str = create_new_digs_csv_file(
+                    airtable_pets, newdigs_shelterluv_pets, shelterluv_photos
+                )
 
-        # upload the file to s3 for debugging
-        # s3_client.upload_file(
-        #     str(config["local"]["FILEPATH"]) + csv_file_sl,
-        #     "dpa-rescue-groups-sync",
-        #     "shelterluv_pets.csv",
-        # )
+                # upload CSV file to rescuegroups.org
+                if upload_to_rescue_groups(csv_file):
+                    finished.append("new_digs")
+                    save_checkpoint(run_id, finished)
+                    save_last_upload(
+                        "new_digs",
+                        new_digs_roster,
+                        new_digs_fingerprint,
+                        pending_photos=bool(deferred_photos),
+                    )
+
+        if "shelterluv" in finished:
+            logger.info("Shelterluv pets were uploaded by an earlier attempt")
+        elif fast and time.monotonic() - started > FAST_TIER_BUDGET_SECONDS:
+            logger.info("Out of time, leaving Shelterluv pets to the next run")
+        else:
+            # get the pets from Shelterluv
+            shelterluv_pets: List[Dict[str, Any]] = get_shelterluv_pets()
+            logger.info(f"Got {len(shelterluv_pets)} pets from Shelterluv")
+            shelterluv_roster: List[str] = get_shelterluv_roster(shelterluv_pets)
+            shelterluv_fingerprint: str = get_shelterluv_fingerprint(shelterluv_pets)
+
+            if should_upload(
+                "shelterluv", shelterluv_roster, shelterluv_fingerprint, fast, force
+            ):
+                if shelterluv_photos is None:
+                    shelterluv_photos = get_shelterluv_photos()
+                deferred_photos.clear()
+
+                # create CSV of Shelterluv pets
+                csv_file_sl: str = create_sl_csv_file(
+                    shelterluv_pets, shelterluv_photos
+                )
 
-        # upload to rescuegroups.org
-        upload_to_rescue_groups(csv_file_sl)
+                # upload the file to s3 for debugging
+                # get_client("s3").upload_file(
+                #     str(get_config()["local"]["FILEPATH"]) + csv_file_sl,
+                #     "dpa-rescue-groups-sync",
+                #     "shelterluv_pets.csv",
+                # )
+
+                # upload to rescuegroups.org
+                if upload_to_rescue_groups(csv_file_sl):
+                    finished.append("shelterluv")
+                    save_checkpoint(run_id, finished)
+                    save_last_upload(
+                        "shelterluv",
+                        shelterluv_roster,
+                        shelterluv_fingerprint,
+                        pending_photos=bool(deferred_photos),
+                    )
     except Exception as e:
         logger.exception("Exception occurred.")
         raise Exception from e
 
+    clear_checkpoint(run_id)
     logger.debug("Done")
 
 
+def read_state(key: str) -> Optional[Dict[str, Any]]:
+    """Read a json document kept between runs, None if there isn't one."""
+    if CHECKPOINT_STORE == "local":
+        try:
+            with open(os.path.join(CHECKPOINT_DIRECTORY, key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    try:
+        response = get_client("s3").get_object(Bucket=CHECKPOINT_BUCKET, Key=key)
+    except get_client("s3").exceptions.NoSuchKey:
+        return None
+    return json.loads(response["Body"].read())
+
+
+def write_state(key: str, data: Dict[str, Any]) -> None:
+    """Keep a json document for later runs."""
+    body = json.dumps(data)
+    if CHECKPOINT_STORE == "local":
+        path = os.path.join(CHECKPOINT_DIRECTORY, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+    else:
+        get_client("s3").put_object(
+            Bucket=CHECKPOINT_BUCKET,
+            Key=key,
+            Body=body.encode(),
+            ContentType="application/json",
+        )
+
+
+def delete_state(key: str) -> None:
+    """Remove a json document kept between runs."""
+    if CHECKPOINT_STORE == "local":
+        os.remove(os.path.join(CHECKPOINT_DIRECTORY, key))
+    else:
+        get_client("s3").delete_object(Bucket=CHECKPOINT_BUCKET, Key=key)
+
+
+def checkpoint_key(run_id: str) -> str:
+    """Where a run's checkpoint is kept, in S3 or under the local directory."""
+    return f"checkpoints/{run_id}.json"
+
+
+def load_checkpoint(run_id: Optional[str]) -> List[str]:
+    """Get the stages an earlier attempt of this run finished."""
+    if run_id is None:
+        return []
+
+    try:
+        checkpoint = read_state(checkpoint_key(run_id))
+    except Exception:  # pylint: disable=broad-except
+        # a checkpoint we can't read means starting from the beginning
+        logger.exception("Could not load checkpoint for run %s", run_id)
+        return []
+
+    if checkpoint is None:
+        return []
+
+    if time.time() - checkpoint.get("saved_at", 0) > CHECKPOINT_TTL_SECONDS:
+        return []
+
+    logger.info("Resuming run %s after %s", run_id, checkpoint["finished"])
+    return list(checkpoint["finished"])
+
+
+def save_checkpoint(run_id: Optional[str], finished: List[str]) -> None:
+    """Record the stages this run has finished."""
+    if run_id is None:
+        return
+
+    try:
+        write_state(
+            checkpoint_key(run_id), {"saved_at": time.time(), "finished": finished}
+        )
+    except Exception:  # pylint: disable=broad-except
+        # losing a checkpoint only costs a retry the stages it would have skipped
+        logger.exception("Could not save checkpoint for run %s", run_id)
+
+
+def clear_checkpoint(run_id: Optional[str]) -> None:
+    """Remove a finished run's checkpoint."""
+    if run_id is None:
+        return
+
+    try:
+        delete_state(checkpoint_key(run_id))
+    except Exception:  # pylint: disable=broad-except
+        logger.debug("No checkpoint to clear for run %s", run_id)
+
+
+def get_new_digs_roster(
+    airtable_pets: List[Dict[str, Any]], newdigs_shelterluv_pets: List[Dict[str, Any]]
+) -> List[str]:
+    """The ids of the New Digs pets the CSV would list."""
+    ids = [
+        pet["id"]
+        for pet in airtable_pets
+        if "Published - Available" in pet["fields"].get("Status", "")
+    ]
+    ids += [str(pet["ID"]) for pet in newdigs_shelterluv_pets]
+    return sorted(ids)
+
+
+def get_shelterluv_roster(shelterluv_pets: List[Dict[str, Any]]) -> List[str]:
+    """The ids of the Shelterluv pets the CSV would list."""
+    return sorted(str(pet["ID"]) for pet in shelterluv_pets)
+
+
+def get_shelterluv_fingerprint(shelterluv_pets: List[Dict[str, Any]]) -> str:
+    """Hash the count, ids and update times of Shelterluv pets."""
+    stamps = sorted(
+        (str(pet["ID"]), str(pet.get("LastUpdatedUnixTime"))) for pet in shelterluv_pets
+    )
+    return fingerprint([len(stamps), stamps])
+
+
+def get_new_digs_fingerprint(
+    airtable_pets: List[Dict[str, Any]], newdigs_shelterluv_pets: List[Dict[str, Any]]
+) -> str:
+    """Hash the Airtable records and New Digs Shelterluv pets."""
+    # the base has no last modified field, so the record's fields stand in for one
+    records = sorted((pet["id"], fingerprint(pet["fields"])) for pet in airtable_pets)
+    return fingerprint([records, get_shelterluv_fingerprint(newdigs_shelterluv_pets)])
+
+
+def fingerprint(value: Any) -> str:
+    """Hash a json value independent of key order."""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def load_last_upload(stage: str) -> Optional[Dict[str, Any]]:
+    """Get what the stage last uploaded, None if unknown."""
+    try:
+        return read_state(f"uploads/{stage}.json")
+    except Exception:  # pylint: disable=broad-except
+        # without the last upload this run uploads, as it always used to
+        logger.exception("Could not load last %s upload", stage)
+        return None
+
+
+def save_last_upload(
+    stage: str, ids: List[str], source_fingerprint: str, pending_photos: bool = False
+) -> None:
+    """Record the pet ids and source fingerprint the stage uploaded."""
+    try:
+        write_state(
+            f"uploads/{stage}.json",
+            {
+                "saved_at": time.time(),
+                "ids": ids,
+                "fingerprint": source_fingerprint,
+                "pending_photos": pending_photos,
+            },
+        )
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Could not save last %s upload", stage)
+
+
+def should_upload(
+    stage: str, ids: List[str], source_fingerprint: str, fast: bool, force: bool
+) -> bool:
+    """Decide whether the stage's roster changed enough to upload again."""
+    last = None if force else load_last_upload(stage)
+    if last is None:
+        return True
+
+    if last.get("pending_photos"):
+        # the last upload still points some pets at Shelterluv photos, copy them now
+        logger.info("Last %s upload left photos to copy", stage)
+        return True
+
+    if fast:
+        # fast runs only list new pets and drop removed ones, edits wait for a full run
+        if ids == last["ids"]:
+            logger.info("No %s pets were added or removed", stage)
+            return False
+        return True
+
+    if time.time() - last["saved_at"] > FORCE_UPLOAD_SECONDS:
+        logger.info("Last %s upload is stale, uploading everything", stage)
+        return True
+    if source_fingerprint == last.get("fingerprint"):
+        logger.info("No %s pets changed since the last upload", stage)
+        return False
+    return True
+
+
 def get_airtable_pets() -> Any:
     """Get the new digs pets from Airtable."""
-    url = "https://api.airtable.com/v0/" + config["airtable"]["BASE"] + "/Pets"
-    headers = {"Authorization": "Bearer " + config["airtable"]["API_KEY"]}
+    url = "https://api.airtable.com/v0/" + get_config()["airtable"]["BASE"] + "/Pets"
+    headers = {"Authorization": "Bearer " + get_config()["airtable"]["API_KEY"]}
 
     quit = False
     pets = []
@@ -125,7 +438,9 @@ def get_airtable_pets() -> Any:
                 "offset": offset,
             }
 
-        response = requests.get(url, headers=headers, params=params)
+        response = requests.get(
+            url, headers=headers, params=params, timeout=run_deadline.timeout()
+        )
         if response.status_code != requests.codes.ok:
             logger.error("Airtable response: ")
             logger.error(response)
@@ -155,7 +470,7 @@ def create_new_digs_csv_file(
     """Create a CSV file of new digs pets."""
     # pylint: disable=too-many-statements
     filename: str = "newdigs.csv"
-    file: str = str(config["local"]["FILEPATH"]) + filename
+    file: str = str(get_config()["local"]["FILEPATH"]) + filename
     with open(file, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
 
@@ -249,9 +564,7 @@ def create_new_digs_csv_file(
             pet_row[indexes["utd"]] = pet["fields"].get("Up-to-date on Shots etc")
 
             description: str = pet["fields"].get("Public Description", "")
-            description = description.replace("\r", "&#10;")
-            description = description.replace("\n", "&#10;")
-            pet_row[indexes["dsc"]] = description
+            pet_row[indexes["dsc"]] = to_csv_description(description)
 
             pictures: List[str] = []
             picture_map = pet["fields"].get("PictureMap-DoNotModify", "{}")
@@ -334,30 +647,41 @@ def fix_unknowns(
     return pet_row
 
 
-def upload_to_rescue_groups(csv_file: str) -> None:
-    """Upload the new digs pets to rescuegroups.org."""
+def upload_to_rescue_groups(csv_file: str) -> bool:
+    """Upload the new digs pets to rescuegroups.org, returning whether it worked."""
     logger.info("Uploading to RG")
-    file_upload: str = str(config["local"]["FILEPATH"]) + csv_file
+    file_upload: str = str(get_config()["local"]["FILEPATH"]) + csv_file
     try:
         with ftplib.FTP(
             "ftp.rescuegroups.org",
-            config["rescuegroups"]["FTP_USERNAME"],
-            config["rescuegroups"]["FTP_PASSWORD"],
+            get_config()["rescuegroups"]["FTP_USERNAME"],
+            get_config()["rescuegroups"]["FTP_PASSWORD"],
             timeout=30,
         ) as ftp, open(file_upload, "rb") as file:
             ftp.cwd("import")
             ftp.storbinary(f"STOR {csv_file}", file)
     except Exception:
         logger.warning("Failed to upload to RG")
+        return False
 
+    return True
 
-def get_shelterluv_pets(apikey="shelterluv_api_key") -> List[Dict[str, Any]]:
-    response = secrets_client.get_secret_value(SecretId=apikey)
-    shelterluv_api_key = response["SecretString"]
 
-    headers = {"x-api-key": shelterluv_api_key}
+def prefetch_secrets(names: Iterable[str]) -> None:
+    """Load any missing or expired secrets in a single batched call."""
+    secrets_cache.prefetch(names)
+
+
+def get_secret(name: str) -> str:
+    """Get a secret from the cache, fetching it if needed."""
+    return secrets_cache.get(name)
+
+
+def get_shelterluv_pets(apikey="shelterluv_api_key") -> List[Dict[str, Any]]:
+    headers = {"x-api-key": get_secret(apikey)}
     offset = 0
     animals = []
+    refreshed = False
 
     while 1:
         url = (
@@ -365,7 +689,15 @@ def get_shelterluv_pets(apikey="shelterluv_api_key") -> List[Dict[str, Any]]:
             + "animals?status_type=publishable&offset="
             + str(offset)
         )
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, timeout=run_deadline.timeout())
+
+        if response.status_code in (401, 403) and not refreshed:
+            # the key may have been rotated since we cached it
+            logger.warning("Shelterluv rejected API key, refreshing")
+            secrets_cache.invalidate(apikey)
+            headers = {"x-api-key": get_secret(apikey)}
+            refreshed = True
+            continue
 
         # check http response code
         if response.status_code != 200:
@@ -406,7 +738,7 @@ def get_shelterluv_pets(apikey="shelterluv_api_key") -> List[Dict[str, Any]]:
 def get_shelterluv_photos() -> List[str]:
     """Get the current photos in S3."""
     bucket = "dpa-shelterluv-photos"
-    paginator = s3_client.get_paginator("list_objects_v2")
+    paginator = get_client("s3").get_paginator("list_objects_v2")
     pages = paginator.paginate(Bucket=bucket)
 
     photos: List[str] = []
@@ -422,7 +754,7 @@ def create_sl_csv_file(pets: List[Dict[str, Any]], shelterluv_photos: List[str])
     """Create a CSV file of shelterluv pets."""
     # pylint: disable=too-many-statements
     filename: str = "pets.csv"
-    file: str = str(config["local"]["FILEPATH"]) + filename
+    file: str = str(get_config()["local"]["FILEPATH"]) + filename
     with open(file, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
 
@@ -503,9 +835,7 @@ def parse_sl_pet(
 
     # deal with fields that are more annoying
     description: str = pet.get("Description", "")
-    description = description.replace("\r", "&#10;")
-    description = description.replace("\n", "&#10;")
-    pet_row[indexes["dsc"]] = description
+    pet_row[indexes["dsc"]] = to_csv_description(description)
 
     breed = pet.get("Breed", "")
     if breed is None:
@@ -614,10 +944,27 @@ def deal_with_sl_photos(
         path = parts.path
 
         if path[1:] not in s3_photos:
+            # the upload comes first, a photo without time to copy keeps its
+            # Shelterluv url and the next run copies it once it finds it missing
+            if run_deadline.remaining() < UPLOAD_RESERVE_SECONDS:
+                logger.info("Out of time, leaving photo for the next run: %s", path)
+                deferred_photos.append(path)
+                photo_list.append(photo)
+                continue
+
             logger.debug("Uploading photo to S3: %s", path)
-            sl_response = requests.get(photo)
+            try:
+                sl_response = requests.get(
+                    photo, timeout=run_deadline.timeout(UPLOAD_RESERVE_SECONDS)
+                )
+            except requests.RequestException:
+                logger.warning("Could not get photo from Shelterluv: %s", photo)
+                deferred_photos.append(path)
+                photo_list.append(photo)
+                continue
+
             if sl_response.status_code == 200:
-                s3_client.put_object(
+                get_client("s3").put_object(
                     Bucket="dpa-shelterluv-photos",
                     Key=path[1:],
                     Body=sl_response.content,
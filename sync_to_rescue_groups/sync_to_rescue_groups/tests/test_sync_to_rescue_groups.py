@@ -5,10 +5,14 @@ import csv
 
 import pytest
 
+from sync_to_rescue_groups import sync_to_rescue_groups
 from sync_to_rescue_groups.sync_to_rescue_groups import (
     CSV_HEADERS,
-    create_csv_file,
+    clear_checkpoint,
+    create_new_digs_csv_file,
     get_airtable_pets,
+    load_checkpoint,
+    save_checkpoint,
     upload_to_rescue_groups,
 )
 
@@ -139,7 +143,7 @@ def test_get_pets_bad_data(requests_mock):
 
 def test_csv_file():
     """Test creating a csv file with animals."""
-    filename = create_csv_file(animals)
+    filename = create_new_digs_csv_file(animals, [], [])
     assert filename == "newdigs.csv"
 
     with open(config["local"]["FILEPATH"] + filename, "r", encoding="utf-8") as f:
@@ -248,7 +252,7 @@ def test_csv_file_empty():
             },
         },
     ]
-    filename = create_csv_file(empty_animals)
+    filename = create_new_digs_csv_file(empty_animals, [], [])
     assert filename == "newdigs.csv"
 
     with open(config["local"]["FILEPATH"] + filename, "r", encoding="utf-8") as f:
@@ -317,3 +321,170 @@ def test_ftp_upload(mocker):
         config["rescuegroups"]["FTP_PASSWORD"],
     )
     assert ftp_mock.__enter__().storbinary.called
+
+
+def test_local_checkpoint(monkeypatch, tmp_path):
+    """Finished stages survive until the run clears them."""
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_STORE", "local")
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_DIRECTORY", str(tmp_path))
+
+    assert load_checkpoint("run") == []
+
+    save_checkpoint("run", ["new_digs"])
+    assert load_checkpoint("run") == ["new_digs"]
+    assert load_checkpoint("other run") == []
+
+    clear_checkpoint("run")
+    assert load_checkpoint("run") == []
+
+
+def test_expired_checkpoint_is_ignored(monkeypatch, tmp_path):
+    """A checkpoint from a run that is long over doesn't skip anything."""
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_STORE", "local")
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_DIRECTORY", str(tmp_path))
+
+    save_checkpoint("run", ["new_digs"])
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_TTL_SECONDS", -1)
+
+    assert load_checkpoint("run") == []
+
+
+def test_fast_tier_uploads_only_changed_rosters(monkeypatch, tmp_path):
+    """A fast run skips the rosters that lost and gained no pets since their upload."""
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_STORE", "local")
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(sync_to_rescue_groups, "prefetch_secrets", lambda names: None)
+    monkeypatch.setattr(sync_to_rescue_groups, "get_shelterluv_photos", lambda: [])
+    monkeypatch.setattr(sync_to_rescue_groups, "get_airtable_pets", lambda: [])
+    shelterluv = {
+        "shelterluv_api_key": [{"ID": "1"}],
+        "newdigs_shelterluv_api_key": [{"ID": "2"}],
+    }
+    monkeypatch.setattr(
+        sync_to_rescue_groups,
+        "get_shelterluv_pets",
+        lambda apikey="shelterluv_api_key": shelterluv[apikey],
+    )
+    monkeypatch.setattr(
+        sync_to_rescue_groups,
+        "create_new_digs_csv_file",
+        lambda airtable_pets, pets, photos: "newdigs.csv",
+    )
+    monkeypatch.setattr(
+        sync_to_rescue_groups, "create_sl_csv_file", lambda pets, photos: "pets.csv"
+    )
+    uploaded = []
+    monkeypatch.setattr(
+        sync_to_rescue_groups,
+        "upload_to_rescue_groups",
+        lambda csv_file: uploaded.append(csv_file) or True,
+    )
+
+    # nothing uploaded yet, so the fast run uploads both
+    sync_to_rescue_groups.handler({"tier": "fast"}, None)
+    assert uploaded == ["newdigs.csv", "pets.csv"]
+
+    uploaded.clear()
+    shelterluv["shelterluv_api_key"] = [{"ID": "1"}, {"ID": "3"}]
+    sync_to_rescue_groups.handler({"tier": "fast"}, None)
+    assert uploaded == ["pets.csv"]
+
+    # a full run uploads what changed since the last upload
+    uploaded.clear()
+    shelterluv["newdigs_shelterluv_api_key"] = [
+        {"ID": "2", "LastUpdatedUnixTime": "1700000000"}
+    ]
+    sync_to_rescue_groups.handler({"tier": "full"}, None)
+    assert uploaded == ["newdigs.csv"]
+
+    uploaded.clear()
+    sync_to_rescue_groups.handler({"tier": "full", "force": True}, None)
+    assert uploaded == ["newdigs.csv", "pets.csv"]
+
+
+def test_stale_upload_is_repeated(monkeypatch, tmp_path):
+    """A full run uploads an unchanged roster once its last upload is old."""
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_STORE", "local")
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_DIRECTORY", str(tmp_path))
+    pets = [{"ID": "1", "LastUpdatedUnixTime": "1700000000"}]
+    fingerprint = sync_to_rescue_groups.get_shelterluv_fingerprint(pets)
+    sync_to_rescue_groups.save_last_upload("shelterluv", ["1"], fingerprint)
+
+    assert not sync_to_rescue_groups.should_upload(
+        "shelterluv", ["1"], fingerprint, fast=False, force=False
+    )
+    assert sync_to_rescue_groups.should_upload(
+        "shelterluv", ["1"], "changed", fast=False, force=False
+    )
+
+    monkeypatch.setattr(sync_to_rescue_groups, "FORCE_UPLOAD_SECONDS", -1)
+    assert sync_to_rescue_groups.should_upload(
+        "shelterluv", ["1"], fingerprint, fast=False, force=False
+    )
+
+
+class Context:
+    """The part of the lambda context the deadline reads."""
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_deadline_timeouts():
+    """Requests get at most the time the run has left."""
+    deadline = sync_to_rescue_groups.deadline.Deadline()
+    assert deadline.timeout() == sync_to_rescue_groups.deadline.MAX_CALL_SECONDS
+
+    deadline.start(Context(12_000))
+    assert 11 < deadline.timeout() <= 12
+    assert (
+        deadline.timeout(reserve=30) == sync_to_rescue_groups.deadline.MIN_CALL_SECONDS
+    )
+
+
+def test_photos_wait_when_time_is_short(monkeypatch):
+    """Photos not yet in S3 keep their Shelterluv url once the upload needs the time."""
+    monkeypatch.setattr(
+        sync_to_rescue_groups, "run_deadline", sync_to_rescue_groups.deadline.Deadline()
+    )
+    sync_to_rescue_groups.run_deadline.start(Context(10_000))
+    monkeypatch.setattr(sync_to_rescue_groups, "deferred_photos", [])
+    monkeypatch.setattr(
+        sync_to_rescue_groups.requests,
+        "get",
+        lambda *args, **kwargs: pytest.fail("fetched a photo without time to copy it"),
+    )
+
+    photos = sync_to_rescue_groups.deal_with_sl_photos(
+        ["https://shelterluv.com/a.jpg", "https://shelterluv.com/b.jpg"], ["b.jpg"]
+    )
+
+    assert photos == [
+        "https://shelterluv.com/a.jpg",
+        "https://dpa-shelterluv-photos.s3.us-east-2.amazonaws.com/b.jpg",
+    ]
+    assert sync_to_rescue_groups.deferred_photos == ["/a.jpg"]
+
+
+def test_deferred_photos_repeat_the_upload(monkeypatch, tmp_path):
+    """A roster uploaded with photos left on Shelterluv uploads again next run."""
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_STORE", "local")
+    monkeypatch.setattr(sync_to_rescue_groups, "CHECKPOINT_DIRECTORY", str(tmp_path))
+    sync_to_rescue_groups.save_last_upload(
+        "shelterluv", ["1"], "fingerprint", pending_photos=True
+    )
+
+    assert sync_to_rescue_groups.should_upload(
+        "shelterluv", ["1"], "fingerprint", fast=False, force=False
+    )
+    assert sync_to_rescue_groups.should_upload(
+        "shelterluv", ["1"], "fingerprint", fast=True, force=False
+    )
+
+    sync_to_rescue_groups.save_last_upload("shelterluv", ["1"], "fingerprint")
+    assert not sync_to_rescue_groups.should_upload(
+        "shelterluv", ["1"], "fingerprint", fast=True, force=False
+    )
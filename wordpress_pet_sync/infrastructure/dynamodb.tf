@@ -8,3 +8,19 @@ resource "aws_dynamodb_table" "featured-photos" {
     type = "S"
   }
 }
+
+resource "aws_dynamodb_table" "wordpress-creates" {
+  name           = "WordpressCreates"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
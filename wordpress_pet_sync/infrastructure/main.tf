@@ -22,8 +22,9 @@ provider "aws" {
 data "archive_file" "lambda_wordpress_pet_sync" {
   type = "zip"
 
-  source_dir  = "${path.module}/../wordpress_pet_sync/"
+  source_dir  = "${path.module}/../"
   output_path = "${path.module}/wordpress_pet_sync.zip"
+  excludes    = ["infrastructure", "pyproject.toml", "uv.lock", "wordpress_pet_sync/tests"]
 }
 
 resource "aws_iam_role" "wordpress_pet_sync_iam" {
@@ -52,7 +53,7 @@ resource "aws_lambda_function" "wordpress_pet_sync" {
   filename      = "wordpress_pet_sync.zip"
   function_name = "wordpress_pet_sync"
   role          = aws_iam_role.wordpress_pet_sync_iam.arn
-  handler       = "wordpress_pet_sync.handler"
+  handler       = "wordpress_pet_sync.wordpress_pet_sync.handler"
   timeout       = 600
 
   source_code_hash = filebase64sha256(data.archive_file.lambda_wordpress_pet_sync.output_path)
@@ -75,6 +76,19 @@ resource "aws_cloudwatch_log_group" "wordpress_pet_sync_log_group" {
   retention_in_days = 90
 }
 
+resource "aws_cloudwatch_log_metric_filter" "wordpress_pet_sync_init_duration" {
+  name           = "wordpress_pet_sync_init_duration"
+  log_group_name = aws_cloudwatch_log_group.wordpress_pet_sync_log_group.name
+  pattern        = "[report=\"REPORT\", ..., init=\"Init\", init_label=\"Duration:\", init_duration, init_unit]"
+
+  metric_transformation {
+    name      = "InitDuration"
+    namespace = "DPA/ColdStarts/wordpress_pet_sync"
+    value     = "$init_duration"
+    unit      = "Milliseconds"
+  }
+}
+
 resource "aws_iam_policy" "wordpress_pet_sync_logging_policy" {
   name   = "wordpress_pet_sync_logging_policy"
   policy = jsonencode({
@@ -99,13 +113,14 @@ resource "aws_iam_role_policy_attachment" "wordpress_pet_sync_logging_policy_att
 
 resource "aws_cloudwatch_event_rule" "wordpress_pet_sync_event_rule" {
   name = "wordpress_pet_sync_event_rule"
-  description = "invoke wordpress pet sync once an hour"
+  description = "invoke the full wordpress pet sync once an hour"
   schedule_expression = "rate(1 hour)"
 }
 
 resource "aws_cloudwatch_event_target" "wordpress_pet_sync_event_target" {
   arn = aws_lambda_function.wordpress_pet_sync.arn
   rule = aws_cloudwatch_event_rule.wordpress_pet_sync_event_rule.name
+  input = jsonencode({ tier = "full" })
 }
 
 resource "aws_lambda_permission" "wordpress_pet_sync_cloudwatch_permission" {
@@ -116,6 +131,27 @@ resource "aws_lambda_permission" "wordpress_pet_sync_cloudwatch_permission" {
   source_arn = aws_cloudwatch_event_rule.wordpress_pet_sync_event_rule.arn
 }
 
+# new and removed pets only, so they are listed within minutes rather than at the next full sync
+resource "aws_cloudwatch_event_rule" "wordpress_pet_sync_fast_event_rule" {
+  name = "wordpress_pet_sync_fast_event_rule"
+  description = "add and remove wordpress pets every five minutes"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "wordpress_pet_sync_fast_event_target" {
+  arn = aws_lambda_function.wordpress_pet_sync.arn
+  rule = aws_cloudwatch_event_rule.wordpress_pet_sync_fast_event_rule.name
+  input = jsonencode({ tier = "fast" })
+}
+
+resource "aws_lambda_permission" "wordpress_pet_sync_fast_cloudwatch_permission" {
+  statement_id = "AllowFastExecutionFromCloudWatch"
+  action = "lambda:InvokeFunction"
+  function_name = "wordpress_pet_sync"
+  principal = "events.amazonaws.com"
+  source_arn = aws_cloudwatch_event_rule.wordpress_pet_sync_fast_event_rule.arn
+}
+
 data "aws_secretsmanager_secret" "wordpress_credentials" {
   name = "wordpress_credentials"
 }
@@ -166,6 +202,25 @@ resource "aws_iam_role_policy_attachment" "secrets_lambda_policy_slack" {
   policy_arn = aws_iam_policy.wordpress_sync_get_slack_alerts_webhook.arn
 }
 
+resource "aws_iam_policy" "wordpress_sync_batch_get_secrets" {
+  name = "wordpress_sync_batch_get_secrets"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action = [
+        "secretsmanager:BatchGetSecretValue",
+      ]
+      Effect = "Allow"
+      Resource = "*"
+    }]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "secrets_lambda_policy_batch" {
+  role       = aws_iam_role.wordpress_pet_sync_iam.name
+  policy_arn = aws_iam_policy.wordpress_sync_batch_get_secrets.arn
+}
+
 data "aws_dynamodb_table" "pets-table" {
   name = "Pets"
 }
@@ -178,9 +233,12 @@ resource "aws_iam_policy" "wordpress_dynamodb_pets_get_list" {
       Action = [
         "dynamodb:Query",
         "dynamodb:GetItem",
+        "dynamodb:BatchGetItem",
         "dynamodb:Scan",
         "dynamodb:BatchWriteItem",
         "dynamodb:PutItem",
+        "dynamodb:UpdateItem",
+        "dynamodb:DeleteItem",
       ]
       Effect = "Allow"
       Resource = [
@@ -188,6 +246,7 @@ resource "aws_iam_policy" "wordpress_dynamodb_pets_get_list" {
         "${data.aws_dynamodb_table.pets-table.arn}/index/*",
         aws_dynamodb_table.featured-photos.arn,
         "${aws_dynamodb_table.featured-photos.arn}/index/*",
+        aws_dynamodb_table.wordpress-creates.arn,
       ]
     }]
   })
@@ -197,3 +256,117 @@ resource "aws_iam_role_policy_attachment" "dynamodb_lambda_policy" {
   role       = aws_iam_role.wordpress_pet_sync_iam.name
   policy_arn = aws_iam_policy.wordpress_dynamodb_pets_get_list.arn
 }
+
+# the Pets stream (NEW_AND_OLD_IMAGES or KEYS_ONLY) is enabled where the table is managed
+resource "aws_iam_policy" "wordpress_dynamodb_pets_stream" {
+  name = "wordpress_dynamodb_pets_stream"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action = [
+        "dynamodb:DescribeStream",
+        "dynamodb:GetRecords",
+        "dynamodb:GetShardIterator",
+        "dynamodb:ListStreams",
+      ]
+      Effect = "Allow"
+      Resource = [
+        data.aws_dynamodb_table.pets-table.stream_arn,
+      ]
+    }]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "dynamodb_stream_lambda_policy" {
+  role       = aws_iam_role.wordpress_pet_sync_iam.name
+  policy_arn = aws_iam_policy.wordpress_dynamodb_pets_stream.arn
+}
+
+resource "aws_lambda_event_source_mapping" "wordpress_pet_sync_pets_stream" {
+  event_source_arn  = data.aws_dynamodb_table.pets-table.stream_arn
+  function_name     = aws_lambda_function.wordpress_pet_sync.arn
+  starting_position = "LATEST"
+
+  # collect a few seconds of changes into one run
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 5
+
+  # the hourly full sync picks up anything a failed batch missed
+  maximum_retry_attempts         = 2
+  bisect_batch_on_function_error = true
+}
+
+resource "aws_iam_policy" "wordpress_sync_state" {
+  name = "wordpress_sync_state"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+        ]
+        Effect = "Allow"
+        Resource = [
+          "${aws_s3_bucket.wordpress-pet-sync-state.arn}/*",
+        ]
+      },
+      {
+        # a run clears its checkpoint once it finishes
+        Action = [
+          "s3:DeleteObject",
+        ]
+        Effect = "Allow"
+        Resource = [
+          "${aws_s3_bucket.wordpress-pet-sync-state.arn}/checkpoints/*",
+        ]
+      },
+      {
+        Action = [
+          "s3:PutObject",
+        ]
+        Effect = "Allow"
+        Resource = [
+          "${aws_s3_bucket.pet-feed.arn}/feed/*",
+        ]
+      },
+      {
+        # lets a missing index come back as NoSuchKey rather than AccessDenied
+        Action = [
+          "s3:ListBucket",
+        ]
+        Effect = "Allow"
+        Resource = [
+          aws_s3_bucket.wordpress-pet-sync-state.arn,
+        ]
+      },
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "state_lambda_policy" {
+  role       = aws_iam_role.wordpress_pet_sync_iam.name
+  policy_arn = aws_iam_policy.wordpress_sync_state.arn
+}
+
+# sharded backfills: the coordinator invokes this same function once per shard
+resource "aws_iam_policy" "wordpress_sync_invoke_shards" {
+  name = "wordpress_sync_invoke_shards"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action = [
+        "lambda:InvokeFunction",
+      ]
+      Effect = "Allow"
+      Resource = [
+        aws_lambda_function.wordpress_pet_sync.arn,
+      ]
+    }]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "invoke_shards_lambda_policy" {
+  role       = aws_iam_role.wordpress_pet_sync_iam.name
+  policy_arn = aws_iam_policy.wordpress_sync_invoke_shards.arn
+}
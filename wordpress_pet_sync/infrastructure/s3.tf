@@ -0,0 +1,70 @@
+resource "aws_s3_bucket" "wordpress-pet-sync-state" {
+  bucket = "dpa-wordpress-pet-sync"
+}
+
+resource "aws_s3_bucket_public_access_block" "wordpress-pet-sync-state" {
+  bucket = aws_s3_bucket.wordpress-pet-sync-state.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+# checkpoints of runs that never finished, retries stop well before this
+resource "aws_s3_bucket_lifecycle_configuration" "wordpress-pet-sync-state" {
+  bucket = aws_s3_bucket.wordpress-pet-sync-state.id
+
+  rule {
+    id = "expire_checkpoints"
+
+    filter {
+      prefix = "checkpoints/"
+    }
+
+    expiration {
+      days = 1
+    }
+
+    status = "Enabled"
+  }
+}
+
+# the adoptable pets feed, public so pages, widgets and the cdn can read it directly
+resource "aws_s3_bucket" "pet-feed" {
+  bucket = "dpa-pet-feed"
+}
+
+resource "aws_s3_bucket_public_access_block" "pet-feed" {
+  bucket = aws_s3_bucket.pet-feed.id
+
+  block_public_acls       = true
+  block_public_policy     = false
+  ignore_public_acls      = true
+  restrict_public_buckets = false
+}
+
+resource "aws_s3_bucket_policy" "pet-feed" {
+  bucket     = aws_s3_bucket.pet-feed.id
+  depends_on = [aws_s3_bucket_public_access_block.pet-feed]
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action    = "s3:GetObject"
+      Effect    = "Allow"
+      Principal = "*"
+      Resource  = "${aws_s3_bucket.pet-feed.arn}/feed/*"
+    }]
+  })
+}
+
+resource "aws_s3_bucket_cors_configuration" "pet-feed" {
+  bucket = aws_s3_bucket.pet-feed.id
+
+  cors_rule {
+    allowed_methods = ["GET", "HEAD"]
+    allowed_origins = ["*"]
+    max_age_seconds = 3600
+  }
+}
@@ -0,0 +1,62 @@
+import json
+import threading
+from typing import Any, Dict, Iterable
+
+import boto3
+from botocore.config import Config
+
+from . import secret_cache
+
+# clients and secrets live in module scope so warm lambda invocations reuse them,
+# but nothing is built until a handler first asks for it
+SECRET_TTL_SECONDS = 15 * 60
+# shard workers can run for the full lambda timeout, and a retried invoke would run one twice.
+# the coordinator stops waiting at its own deadline, which comes before this
+CLIENT_CONFIGS = {"lambda": Config(read_timeout=600, retries={"total_max_attempts": 1})}
+
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_resources: Dict[str, Any] = {}
+_tables: Dict[str, Any] = {}
+
+
+def client(service_name: str) -> Any:
+    # the default boto3 session is not thread safe, so build clients under a lock
+    with _lock:
+        if service_name not in _clients:
+            _clients[service_name] = boto3.client(service_name, config=CLIENT_CONFIGS.get(service_name))
+        return _clients[service_name]
+
+
+# the same cache the other sync lambdas use, see shared/secret_cache.py
+_secret_cache = secret_cache.SecretCache(client, SECRET_TTL_SECONDS)
+_secrets = _secret_cache.values
+
+
+def resource(service_name: str) -> Any:
+    with _lock:
+        if service_name not in _resources:
+            _resources[service_name] = boto3.resource(service_name)
+        return _resources[service_name]
+
+
+def table(table_name: str) -> Any:
+    if table_name not in _tables:
+        _tables[table_name] = resource("dynamodb").Table(table_name)
+    return _tables[table_name]
+
+
+def prefetch_secrets(names: Iterable[str]) -> None:
+    _secret_cache.prefetch(names)
+
+
+def get_secret(name: str) -> str:
+    return _secret_cache.get(name)
+
+
+def get_secret_json(name: str) -> Dict[str, Any]:
+    return json.loads(get_secret(name))
+
+
+def invalidate_secret(name: str) -> None:
+    _secret_cache.invalidate(name)
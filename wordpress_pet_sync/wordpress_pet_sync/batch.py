@@ -0,0 +1,42 @@
+import logging
+from typing import Any, Dict, Iterator, List, Optional, TypeVar
+
+from .writes import WriteRequest
+
+logger = logging.getLogger()
+
+T = TypeVar("T")
+
+# wordpress core's limit, used when the server doesn't advertise its own
+DEFAULT_BATCH_SIZE = 25
+
+
+def max_batch_size(options: Dict[str, Any]) -> int:
+    # OPTIONS /batch/v1 describes the endpoint, including how many requests it accepts
+    try:
+        return int(options["endpoints"][0]["args"]["requests"]["maxItems"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        logger.warning("wordpress did not report a batch size, using {}".format(DEFAULT_BATCH_SIZE))
+        return DEFAULT_BATCH_SIZE
+
+
+def chunked(items: List[T], size: int) -> Iterator[List[T]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def payload(requests: List[WriteRequest]) -> Dict[str, Any]:
+    # normal validation lets every request succeed or fail on its own
+    return {
+        "validation": "normal",
+        "requests": [
+            {"method": request.method, "path": request.path, **({"body": request.body} if request.body else {})}
+            for request in requests
+        ],
+    }
+
+
+def unpack(response: Dict[str, Any], count: int) -> List[Optional[Dict[str, Any]]]:
+    # one {"status", "body"} item per request in the batch, None for any the server didn't answer
+    items = [item if isinstance(item, dict) else None for item in (response.get("responses") or [])[:count]]
+    return items + [None] * (count - len(items))
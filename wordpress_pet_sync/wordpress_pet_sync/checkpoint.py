@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Protocol, Set
+
+from . import aws
+from .diff import Create, Delete, Duplicate, Plan, Update
+from .records import IndexEntry, Pet, WordpressPost
+from .writes import WriteOutcome
+
+logger = logging.getLogger()
+
+# bump when the stored format changes so old checkpoints are ignored rather than misread
+CHECKPOINT_VERSION = 2
+# async retries give up within six hours, anything older is from a run that is over
+CHECKPOINT_TTL_SECONDS = 6 * 60 * 60
+
+
+def run_id(event: Dict[str, Any], context: Any) -> Optional[str]:
+    # lambda's async retries keep the request id and eventbridge retries keep the event id
+    return getattr(context, "aws_request_id", None) or event.get("id")
+
+
+class CheckpointStore(Protocol):
+    """Where checkpoints are kept between attempts of a run, keyed by run id."""
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]: ...
+
+    def save(self, run_id: str, data: Dict[str, Any]) -> None: ...
+
+    def delete(self, run_id: str) -> None: ...
+
+
+class S3CheckpointStore:
+    def __init__(self, bucket: str, prefix: str = "checkpoints/"):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        client = aws.client("s3")
+        try:
+            response = client.get_object(Bucket=self.bucket, Key=self.prefix + run_id)
+        except client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def save(self, run_id: str, data: Dict[str, Any]) -> None:
+        aws.client("s3").put_object(
+            Bucket=self.bucket,
+            Key=self.prefix + run_id,
+            Body=json.dumps(data, separators=(",", ":"), default=str).encode(),
+            ContentType="application/json",
+        )
+
+    def delete(self, run_id: str) -> None:
+        aws.client("s3").delete_object(Bucket=self.bucket, Key=self.prefix + run_id)
+
+
+class LocalCheckpointStore:
+    # a directory of json files, for tests and local runs
+
+    def __init__(self, directory: str = "/tmp/checkpoints"):
+        self.directory = directory
+
+    def path(self, run_id: str) -> str:
+        return os.path.join(self.directory, run_id + ".json")
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path(run_id)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, run_id: str, data: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # write then rename, so a run killed mid-save leaves the previous checkpoint
+        with open(self.path(run_id) + ".tmp", "w") as file:
+            json.dump(data, file, default=str)
+        os.replace(self.path(run_id) + ".tmp", self.path(run_id))
+
+    def delete(self, run_id: str) -> None:
+        try:
+            os.remove(self.path(run_id))
+        except FileNotFoundError:
+            pass
+
+
+class Checkpoint:
+    """
+    A run's plan and the writes finished so far, saved under the run id after
+    planning and after every chunk of writes. A retried run loads it, skips
+    loading and planning, and only does the writes that are left.
+    """
+
+    def __init__(self, store: CheckpointStore, run_id: str):
+        self.store = store
+        self.run_id = run_id
+        self.started_at = time.time()
+        self.plan: Optional[Plan] = None
+        self.claimed: List[str] = []
+        # creates whose requests went out, saved before each chunk is sent
+        self.sent: List[str] = []
+        self.media: Dict[str, int] = {}
+        # (stage, outcome) for every write that has finished
+        self.outcomes: List[Any] = []
+
+    def load(self) -> bool:
+        try:
+            data = self.store.load(self.run_id)
+        except Exception:
+            logger.exception("could not load checkpoint {}".format(self.run_id))
+            return False
+
+        if not data or data.get("version") != CHECKPOINT_VERSION:
+            return False
+        if time.time() - data["started_at"] > CHECKPOINT_TTL_SECONDS:
+            logger.info("checkpoint {} has expired, starting over".format(self.run_id))
+            return False
+
+        self.started_at = data["started_at"]
+        self.plan = decode_plan(data["plan"])
+        self.claimed = data["claimed"]
+        self.sent = data["sent"]
+        self.media = data["media"]
+        self.outcomes = [(stage, decode_outcome(outcome)) for stage, outcome in data["outcomes"]]
+
+        logger.info("resuming run {} after {} writes".format(self.run_id, len(self.outcomes)))
+        return True
+
+    def save(self) -> None:
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "started_at": self.started_at,
+            "plan": encode_plan(self.plan),
+            "claimed": self.claimed,
+            "sent": self.sent,
+            "media": self.media,
+            "outcomes": [(stage, asdict(outcome)) for stage, outcome in self.outcomes],
+        }
+        try:
+            self.store.save(self.run_id, data)
+        except Exception:
+            # losing a checkpoint only costs a retry the work it would have skipped
+            logger.exception("could not save checkpoint {}".format(self.run_id))
+
+    def clear(self) -> None:
+        try:
+            self.store.delete(self.run_id)
+        except Exception:
+            logger.exception("could not clear checkpoint {}".format(self.run_id))
+
+    def finished(self, stage: str) -> Set[Any]:
+        # the keys of the stage's items that were written, failures are tried again
+        keys: Set[Any] = set()
+        for outcome_stage, outcome in self.outcomes:
+            if outcome_stage == stage and outcome.ok:
+                keys.add(outcome.removed_post_id if outcome.removed_post_id is not None else outcome.pet_id)
+        return keys
+
+    def failed_creates(self) -> Set[str]:
+        # creates that definitely didn't happen, their claims were released
+        return {str(outcome.pet_id) for stage, outcome in self.outcomes if stage == "create" and not outcome.ok}
+
+    def remaining(self) -> Plan:
+        # the saved plan without the writes that already went through. a create that was sent
+        # but has no outcome may have made its post, so it isn't sent again and its claim is left
+        # to run out, by which time the post shows up in the listing if it exists
+        deleted = self.finished("delete")
+        created = {str(pet_id) for pet_id in self.finished("create")}
+        updated = self.finished("update")
+        unsettled = set(self.sent) - self.failed_creates()
+        return Plan(
+            creates=[
+                create
+                for create in self.plan.creates
+                if str(create.pet.id) not in created and str(create.pet.id) not in unsettled
+            ],
+            updates=[update for update in self.plan.updates if update.pet.id not in updated],
+            deletes=[delete for delete in self.plan.deletes if delete.post.id not in deleted],
+            duplicates=[duplicate for duplicate in self.plan.duplicates if duplicate.post.id not in deleted],
+        )
+
+
+def encode_plan(plan: Optional[Plan]) -> Optional[Dict[str, Any]]:
+    return asdict(plan) if plan is not None else None
+
+
+def decode_plan(data: Dict[str, Any]) -> Plan:
+    return Plan(
+        creates=[Create(Pet(**create["pet"])) for create in data["creates"]],
+        updates=[
+            Update(
+                Pet(**update["pet"]),
+                WordpressPost(**update["post"]),
+                update["patch"],
+                update["featured_photo"],
+                update["record_featured_photo"],
+            )
+            for update in data["updates"]
+        ],
+        deletes=[Delete(WordpressPost(**delete["post"])) for delete in data["deletes"]],
+        duplicates=[Duplicate(WordpressPost(**duplicate["post"])) for duplicate in data["duplicates"]],
+    )
+
+
+def decode_outcome(data: Dict[str, Any]) -> WriteOutcome:
+    entry = data.get("entry")
+    return WriteOutcome(**{**data, "entry": IndexEntry(**entry) if entry else None})
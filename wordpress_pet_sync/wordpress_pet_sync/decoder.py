@@ -0,0 +1,44 @@
+import keyword
+from typing import Any, Callable, Dict
+
+from cerealbox.dynamo import from_dynamodb_json
+
+# how each declared type is read out of its attribute value. anything stored
+# with a different type than declared (a NULL, a number id) takes the generic path
+_READERS = {
+    # a string
+    "S": 'value["S"] if "S" in value else _generic(value)',
+    # a list of strings, stored as a list or a string set
+    "[S]": '[element["S"] for element in value["L"]] if "L" in value else '
+    'list(value["SS"]) if "SS" in value else _generic(value)',
+}
+
+
+def _generic(value: Dict[str, Any]) -> Any:
+    return from_dynamodb_json({"value": value})["value"]
+
+
+def compile_decoder(spec: Dict[str, str], factory: Callable[..., Any]) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Build a decoder that turns a raw dynamodb item straight into factory(**attributes).
+
+    Only the attributes in spec are read, each with the reader for its declared
+    type, so undeclared attributes cost nothing. Missing and NULL attributes are
+    left out so the factory's defaults apply.
+    """
+    lines = ["def decode(item):", "    get = item.get", "    attributes = {}"]
+    for name, type in spec.items():
+        if type not in _READERS:
+            raise ValueError("unsupported type {} for {}".format(type, name))
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError("unsupported attribute name {}".format(name))
+        lines += [
+            "    value = get({!r})".format(name),
+            "    if value is not None and not value.get('NULL'):",
+            "        attributes[{!r}] = {}".format(name, _READERS[type]),
+        ]
+    lines.append("    return factory(**attributes)")
+
+    namespace: Dict[str, Any] = {"_generic": _generic, "factory": factory}
+    exec("\n".join(lines), namespace)
+    return namespace["decode"]
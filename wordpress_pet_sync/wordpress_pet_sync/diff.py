@@ -0,0 +1,183 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from . import text
+from .records import FINGERPRINT_FIELD, Pet, WordpressPost
+
+logger = logging.getLogger()
+
+# wordpress only has acf fields for this many photos
+MAX_PHOTOS = 20
+
+
+@dataclass
+class Create:
+    pet: Pet
+
+
+@dataclass
+class Update:
+    pet: Pet
+    post: WordpressPost
+    patch: Dict[str, Any] = field(default_factory=dict)
+    # cover photo to upload as the post's featured media
+    featured_photo: Optional[str] = None
+    # whether the upload should be recorded in the FeaturedPhotos table
+    record_featured_photo: bool = False
+
+    def has_changes(self) -> bool:
+        return bool(self.patch) or bool(self.featured_photo)
+
+
+@dataclass
+class Delete:
+    post: WordpressPost
+
+
+@dataclass
+class Duplicate:
+    post: WordpressPost
+
+
+@dataclass
+class Plan:
+    creates: List[Create] = field(default_factory=list)
+    updates: List[Update] = field(default_factory=list)
+    deletes: List[Delete] = field(default_factory=list)
+    duplicates: List[Duplicate] = field(default_factory=list)
+
+
+def plan_changes(
+    dynamodb_pets: List[Pet],
+    wordpress_pets: List[WordpressPost],
+    featured_photos: Callable[[List[Any]], Dict[Any, str]],
+) -> Plan:
+    # index both sides by pet id once so planning is linear in the catalog size
+    plan = Plan()
+
+    posts: Dict[Any, WordpressPost] = {}
+    for post in wordpress_pets:
+        id = post.pet_id
+        if id in posts:
+            plan.duplicates.append(Duplicate(post))
+            continue
+        posts[id] = post
+
+    pets: Dict[Any, Pet] = {pet.id: pet for pet in dynamodb_pets}
+
+    for id, post in posts.items():
+        if id not in pets:
+            plan.deletes.append(Delete(post))
+
+    matched = []
+    for id, pet in pets.items():
+        post = posts.get(id)
+        if post is None:
+            plan.creates.append(Create(pet))
+            continue
+        matched.append((pet, post, pet.fingerprint()))
+
+    # look up the current featured photo in one batch, and only for the pets that need it
+    lookup = [pet.id for pet, post, fingerprint in matched if needs_featured_photo(pet, post, fingerprint)]
+    current_featured_photos = featured_photos(lookup) if lookup else {}
+
+    for pet, post, fingerprint in matched:
+        update = plan_update(pet, post, current_featured_photos.get(pet.id), fingerprint)
+        if update.has_changes():
+            plan.updates.append(update)
+
+    logger.info(
+        "planned {} creates, {} updates, {} deletes, {} duplicates".format(
+            len(plan.creates), len(plan.updates), len(plan.deletes), len(plan.duplicates)
+        )
+    )
+
+    return plan
+
+
+def plan_update(
+    pet: Pet, post: WordpressPost, current_featured_photo: Optional[str], fingerprint: Optional[str] = None
+) -> Update:
+    update = Update(pet, post)
+
+    # only compare field by field when the pet changed since the post was last written
+    fingerprint = fingerprint or pet.fingerprint()
+    if post.acf.get(FINGERPRINT_FIELD) != fingerprint:
+        plan_fields(update)
+        update.patch.setdefault("acf", {})[FINGERPRINT_FIELD] = fingerprint
+
+    if needs_featured_photo(pet, post, fingerprint):
+        plan_featured_photo(update, current_featured_photo)
+
+    return update
+
+
+def needs_featured_photo(pet: Pet, post: WordpressPost, fingerprint: str) -> bool:
+    # the fingerprint covers the cover photo and is only written once the post features
+    # it, so an unchanged pet with featured media needs no featured photo lookup
+    return bool(pet.coverPhoto) and (post.acf.get(FINGERPRINT_FIELD) != fingerprint or not post.featured_media)
+
+
+def plan_fields(update: Update) -> None:
+    pet = update.pet
+    post = update.post
+    patch = update.patch
+    acf = post.acf
+
+    wordpress_title = text.WORDPRESS_CONTENT(post.title)
+
+    if wordpress_title != pet.name.strip():
+        logger.debug("renaming from {}".format(wordpress_title))
+        patch["title"] = pet.name.strip()
+
+    if pet.description and text.WORDPRESS_COMPARE(post.content) != text.WORDPRESS_COMPARE(pet.description):
+        logger.debug("updating description from {}".format(post.content))
+        patch["content"] = pet.description.strip()
+
+    photos = pet.photos[:MAX_PHOTOS]
+    for index, photo in enumerate(photos):
+        if acf.get(f"photos_{index}") != photo:
+            logger.debug("updating photo {}".format(photo))
+            patch.setdefault("acf", {})[f"photos_{index}"] = photo
+
+    # clear out photos the pet no longer has
+    index = len(photos)
+    while acf.get(f"photos_{index}"):
+        logger.debug("removing photo {}".format(acf.get(f"photos_{index}")))
+        patch.setdefault("acf", {})[f"photos_{index}"] = ""
+        index += 1
+
+    for attribute in acf:
+        if "photo" in attribute or attribute in [
+            "description",
+            "coverPhoto",
+            FINGERPRINT_FIELD,
+        ]:
+            continue
+
+        wordpress_attribute = acf.get(attribute)
+        dynamodb_attribute = getattr(pet, attribute, None)
+
+        if not wordpress_attribute and not dynamodb_attribute:
+            continue
+
+        if wordpress_attribute != dynamodb_attribute:
+            logger.debug(
+                "updating attribute {} for {}".format(
+                    attribute,
+                    post.title,
+                )
+            )
+            patch.setdefault("acf", {})[attribute] = dynamodb_attribute
+
+
+def plan_featured_photo(update: Update, current_featured_photo: Optional[str]) -> None:
+    cover_photo = update.pet.coverPhoto
+    if cover_photo and current_featured_photo != cover_photo:
+        logger.debug("updating featured photo for id {}".format(update.pet.id))
+        update.featured_photo = cover_photo
+        update.record_featured_photo = True
+    elif cover_photo and not update.post.featured_media:
+        logger.debug("updating featured photo {}".format(cover_photo))
+        update.featured_photo = cover_photo
@@ -0,0 +1,25 @@
+import logging
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger()
+
+# the most keys one BatchGetItem call accepts
+BATCH_GET_SIZE = 100
+
+
+def batch_get(client: Any, table_name: str, ids: Iterable[str], **kwargs) -> List[Dict[str, Any]]:
+    # fetch items by id, following UnprocessedKeys until dynamodb has returned them all
+    keys = [{"id": {"S": id}} for id in dict.fromkeys(ids)]
+    items = []
+
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {table_name: {"Keys": keys[start : start + BATCH_GET_SIZE], **kwargs}}
+
+        while request:
+            response = client.batch_get_item(RequestItems=request)
+            items.extend(response.get("Responses", {}).get(table_name, []))
+            request = response.get("UnprocessedKeys") or {}
+
+    logger.debug("got {} of {} items from {}".format(len(items), len(keys), table_name))
+
+    return items
@@ -0,0 +1,40 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+from . import aws, decoder, dynamodb, scan
+
+logger = logging.getLogger()
+
+FEATURED_PHOTOS_TABLE = "FeaturedPhotos"
+
+decode_featured_photo = decoder.compile_decoder({"id": "S", "photo": "S"}, dict)
+
+
+class FeaturedPhotos:
+    """
+    The photo each pet's post was last featured with, read from the FeaturedPhotos
+    table only for the pets a run asks about and cached for the rest of the run.
+    """
+
+    # None marks a pet we asked about that has no featured photo recorded
+    photos: Dict[str, Optional[str]]
+
+    def __init__(self):
+        self.photos = {}
+
+    def lookup(self, ids: Iterable[str]) -> Dict[str, str]:
+        ids = list(dict.fromkeys(ids))
+        missing = [id for id in ids if id not in self.photos]
+
+        if missing:
+            self.photos.update(dict.fromkeys(missing))
+            items = dynamodb.batch_get(
+                aws.client("dynamodb"), FEATURED_PHOTOS_TABLE, missing, **scan.projection(["id", "photo"])
+            )
+            for item in items:
+                photo = decode_featured_photo(item)
+                self.photos[photo["id"]] = photo.get("photo")
+
+            logger.info("looked up featured photos for {} pets".format(len(missing)))
+
+        return {id: self.photos[id] for id in ids if self.photos[id]}
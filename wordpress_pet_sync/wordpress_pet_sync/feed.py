@@ -0,0 +1,94 @@
+import gzip
+import json
+import logging
+import re
+from typing import Any, Dict, List
+
+from .records import Pet
+
+logger = logging.getLogger()
+
+# bump when the feed format changes, older versions stay in place for existing readers
+FEED_VERSION = 1
+# what listings and widgets show, internal bookkeeping stays out of the feed
+FEED_FIELDS = [
+    "id",
+    "name",
+    "description",
+    "photos",
+    "coverPhoto",
+    "age",
+    "breed",
+    "color",
+    "adoptLink",
+    "sex",
+    "size",
+    "species",
+    "video",
+]
+CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=600"
+
+
+def prefix() -> str:
+    return "feed/v{}/".format(FEED_VERSION)
+
+
+def shard_name(species: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", species.lower()).strip("-") or "other"
+
+
+def entry(pet: Pet) -> Dict[str, Any]:
+    # empty fields are left out to keep the feed compact
+    entry = {}
+    for name in FEED_FIELDS:
+        value = getattr(pet, name)
+        if value:
+            entry[name] = value
+    return entry
+
+
+def build(pets: List[Pet]) -> Dict[str, Dict[str, Any]]:
+    """
+    The feed documents keyed by their path under the feed prefix: every pet in
+    pets.json, plus a shard per species that the index points at.
+    """
+    entries = sorted((entry(pet) for pet in pets), key=lambda entry: entry["id"])
+
+    shards: Dict[str, List[Dict[str, Any]]] = {}
+    for pet_entry in entries:
+        shards.setdefault(shard_name(pet_entry.get("species", "")), []).append(pet_entry)
+
+    documents = {
+        "species/{}.json".format(name): {"version": FEED_VERSION, "count": len(shard), "pets": shard}
+        for name, shard in sorted(shards.items())
+    }
+    documents["pets.json"] = {
+        "version": FEED_VERSION,
+        "count": len(entries),
+        "species": {name: "species/{}.json".format(name) for name in sorted(shards)},
+        "pets": entries,
+    }
+
+    return documents
+
+
+def encode(document: Dict[str, Any]) -> bytes:
+    # a fixed mtime keeps the bytes, and so the ETag, stable while the pets don't change
+    return gzip.compress(json.dumps(document, separators=(",", ":"), sort_keys=True).encode(), mtime=0)
+
+
+def publish(client: Any, bucket: str, pets: List[Pet]) -> None:
+    documents = build(pets)
+
+    # shards first, so the index never points at a shard that isn't there yet
+    for path in sorted(documents, key=lambda path: path == "pets.json"):
+        client.put_object(
+            Bucket=bucket,
+            Key=prefix() + path,
+            Body=encode(documents[path]),
+            ContentType="application/json",
+            ContentEncoding="gzip",
+            CacheControl=CACHE_CONTROL,
+        )
+
+    logger.info("published feed of {} pets in {} species".format(len(pets), len(documents) - 1))
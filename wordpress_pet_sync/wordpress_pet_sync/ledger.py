@@ -0,0 +1,57 @@
+import logging
+from typing import Any, Optional
+
+import botocore
+
+logger = logging.getLogger()
+
+LEDGER_TABLE = "WordpressCreates"
+# how long a claim keeps other runs from creating the same pet. anything older
+# than this has shown up in every run's wordpress listing if it was created
+LEASE_SECONDS = 15 * 60
+# dynamodb ttl clears settled claims after this
+EXPIRE_SECONDS = 24 * 60 * 60
+
+
+def claim(client: Any, pet_id: str, now: float) -> bool:
+    # take the pet's claim unless a recent run already holds it
+    try:
+        client.put_item(
+            TableName=LEDGER_TABLE,
+            Item={
+                "id": {"S": pet_id},
+                "status": {"S": "pending"},
+                "claimed_at": {"N": str(int(now))},
+                "expires_at": {"N": str(int(now + EXPIRE_SECONDS))},
+            },
+            ConditionExpression="attribute_not_exists(id) OR claimed_at < :stale",
+            ExpressionAttributeValues={":stale": {"N": str(int(now - LEASE_SECONDS))}},
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return False
+    return True
+
+
+def status(client: Any, pet_id: str) -> Optional[str]:
+    # "pending" or "created" while a claim is held, None once it is released or expired
+    response = client.get_item(TableName=LEDGER_TABLE, Key={"id": {"S": pet_id}}, ConsistentRead=True)
+    item = response.get("Item")
+    return item["status"]["S"] if item else None
+
+
+def complete(client: Any, pet_id: str, post_id: Optional[int]) -> None:
+    # keep the claim so overlapping runs still skip the pet until the lease runs out
+    client.update_item(
+        TableName=LEDGER_TABLE,
+        Key={"id": {"S": pet_id}},
+        UpdateExpression="SET #status = :created, post_id = :post_id",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={":created": {"S": "created"}, ":post_id": {"N": str(post_id or 0)}},
+    )
+
+
+def release(client: Any, pet_id: str) -> None:
+    # the create definitely failed, let the next run try again straight away
+    client.delete_item(TableName=LEDGER_TABLE, Key={"id": {"S": pet_id}})
@@ -0,0 +1,81 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Union
+
+import requests
+
+logger = logging.getLogger()
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamedBody:
+    # a known-length file-like body, so requests sends a Content-Length and streams it
+    # in blocks instead of reading the whole photo into memory first
+
+    def __init__(self, raw: Any, length: int):
+        self.raw = raw
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, size: int = -1) -> bytes:
+        return self.raw.read(size)
+
+
+def stream_body(response: requests.Response) -> Union[StreamedBody, Iterator[bytes]]:
+    length = response.headers.get("Content-Length")
+
+    if length and not response.headers.get("Content-Encoding"):
+        return StreamedBody(response.raw, int(length))
+
+    # without a usable length fall back to a chunked upload
+    return response.iter_content(CHUNK_SIZE)
+
+
+class MediaPipeline:
+    # uploads featured photos on a small pool so they overlap each other and the
+    # post writes, each photo url is only uploaded once per run
+
+    def __init__(self, upload: Callable[[str], int], max_workers: int):
+        self.upload = upload
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.uploads: Dict[str, Future] = {}
+
+    def prefetch(self, photo_urls: Iterable[str]) -> None:
+        for photo_url in photo_urls:
+            if photo_url and photo_url not in self.uploads:
+                self.uploads[photo_url] = self.executor.submit(self.run, photo_url)
+
+    def get(self, photo_url: str) -> int:
+        # wait for the upload of a photo, starting it now if it wasn't prefetched
+        if not photo_url:
+            return -1
+        self.prefetch([photo_url])
+        return self.uploads[photo_url].result()
+
+    def uploaded(self) -> Dict[str, int]:
+        # photos that made it into wordpress, so a retried run can reuse them
+        return {
+            photo_url: upload.result()
+            for photo_url, upload in self.uploads.items()
+            if upload.done() and not upload.cancelled() and upload.result() != -1
+        }
+
+    def seed(self, uploaded: Dict[str, int]) -> None:
+        for photo_url, media_id in uploaded.items():
+            upload: Future = Future()
+            upload.set_result(media_id)
+            self.uploads.setdefault(photo_url, upload)
+
+    def run(self, photo_url: str) -> int:
+        try:
+            return self.upload(photo_url)
+        except Exception:
+            logger.exception("could not upload cover photo {}".format(photo_url))
+            return -1
+
+    def close(self) -> None:
+        # photos nothing waited for are dropped rather than holding the run past its deadline
+        self.executor.shutdown(wait=True, cancel_futures=True)
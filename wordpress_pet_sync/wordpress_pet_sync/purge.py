@@ -0,0 +1,71 @@
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from .batch import chunked
+from .writes import WriteOutcome
+
+logger = logging.getLogger()
+
+# what a purge request accepts by default, cloudflare's limit for purging by url
+DEFAULT_PURGE_BATCH_SIZE = 30
+# the pet fields the site has a listing page for each value of
+LISTED_FIELDS = ("species", "age", "sex", "size")
+
+
+class PurgeBackend:
+    """
+    Drops pages from the site's page cache so they are rendered again on their
+    next visit. Subclasses talk to a particular cache, this one only logs.
+    """
+
+    def purge(self, urls: List[str]) -> None:
+        logger.info("no page cache configured, not purging {} urls".format(len(urls)))
+
+
+class HttpPurgeBackend(PurgeBackend):
+    """
+    Posts the urls to a purge endpoint as {"files": [...]}, in batches of at most
+    batch_size, the shape cloudflare and most cache plugins' purge apis accept.
+    """
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, batch_size: int = DEFAULT_PURGE_BATCH_SIZE):
+        self.url = url
+        self.headers = headers or {}
+        self.batch_size = batch_size
+
+    def purge(self, urls: List[str]) -> None:
+        for chunk in chunked(urls, self.batch_size):
+            response = requests.post(self.url, headers=self.headers, json={"files": chunk}, timeout=10)
+            if response.status_code != 200:
+                # the pages fall out of the cache when they expire, so carry on with the rest
+                logger.error("could not purge {} urls: {}".format(len(chunk), response.text))
+
+        logger.info("purged {} urls".format(len(urls)))
+
+
+def slug(value: str) -> str:
+    # how wordpress slugs a term name, "Extra-Large" is listed under extra-large
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+def listing_urls(archive_url: str, field_urls: Dict[str, str], *pets: Dict[str, Any]) -> List[str]:
+    # the archive lists every pet, the other listings only the pets with one value of a field.
+    # a pet is given as its acf fields, so an update passes the post's fields and the new ones
+    urls = [archive_url]
+    for pet in pets:
+        for name in LISTED_FIELDS:
+            value = pet.get(name)
+            if name in field_urls and isinstance(value, str) and slug(value):
+                urls.append(field_urls[name].format(slug(value)))
+    return list(dict.fromkeys(urls))
+
+
+def affected_urls(outcomes: Iterable[WriteOutcome]) -> List[str]:
+    # each changed post's own page, then the listings that showed it before or after
+    changed = [outcome for outcome in outcomes if outcome.ok]
+    urls = [outcome.link for outcome in changed if outcome.link]
+    urls.extend(url for outcome in changed for url in outcome.listings)
+    return list(dict.fromkeys(urls))
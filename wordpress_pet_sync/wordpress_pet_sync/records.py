@@ -0,0 +1,97 @@
+import hashlib
+import json
+from dataclasses import astuple, dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+# acf field holding the fingerprint of the pet the post was last written from
+FINGERPRINT_FIELD = "syncFingerprint"
+
+
+@dataclass(slots=True)
+class WordpressPost:
+    # only the parts of a pet post the sync reads
+    id: int
+    title: str
+    content: str
+    featured_media: int = 0
+    slug: str = ""
+    link: str = ""
+    acf: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def pet_id(self) -> Any:
+        return self.acf.get("id")
+
+    @classmethod
+    def from_json(cls, post: Dict[str, Any]) -> "WordpressPost":
+        # edit context returns the raw post fields, view context only the rendered html
+        title = post.get("title") or {}
+        content = post.get("content") or {}
+        return cls(
+            id=post["id"],
+            title=title.get("raw", title.get("rendered", "")),
+            content=content.get("raw", content.get("rendered", "")),
+            featured_media=post.get("featured_media") or 0,
+            slug=post.get("slug", ""),
+            link=post.get("link", ""),
+            # acf comes back as an empty list when a post has no fields set
+            acf=post.get("acf") or {},
+        )
+
+
+@dataclass(slots=True)
+class Pet:
+    # the Pets attributes the sync compares, named as they are in dynamodb and the post's acf
+    id: Any
+    name: str
+    description: Optional[str] = None
+    photos: List[str] = field(default_factory=list)
+    coverPhoto: Optional[str] = None
+    age: Optional[str] = None
+    breed: Optional[str] = None
+    color: Optional[str] = None
+    adoptLink: Optional[str] = None
+    internalId: Optional[str] = None
+    sex: Optional[str] = None
+    size: Optional[str] = None
+    species: Optional[str] = None
+    source: Optional[str] = None
+    status: Optional[str] = None
+    video: Optional[str] = None
+
+    def fingerprint(self) -> str:
+        # a canonical hash of everything the sync writes, stored on the post to skip unchanged pets
+        canonical = json.dumps(astuple(self), separators=(",", ":"), default=str)
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+PET_ATTRIBUTES = tuple(attribute.name for attribute in fields(Pet))
+
+# how the sync reads each Pets attribute, every other attribute is string typed
+PET_SPEC = {name: "[S]" if name == "photos" else "S" for name in PET_ATTRIBUTES}
+
+
+@dataclass(slots=True)
+class IndexEntry:
+    # what the shadow index remembers about a post between runs
+    post_id: int
+    pet_id: Any
+    title: str = ""
+    featured_media: int = 0
+    fingerprint: Optional[str] = None
+    link: str = ""
+
+    @classmethod
+    def from_post(cls, post: WordpressPost) -> "IndexEntry":
+        return cls(post.id, post.pet_id, post.title, post.featured_media, post.acf.get(FINGERPRINT_FIELD), post.link)
+
+    def stub(self) -> WordpressPost:
+        # enough of the post to plan deletes, duplicates and unchanged pets without fetching it
+        return WordpressPost(
+            id=self.post_id,
+            title=self.title,
+            content="",
+            featured_media=self.featured_media,
+            link=self.link,
+            acf={"id": self.pet_id, FINGERPRINT_FIELD: self.fingerprint},
+        )
@@ -0,0 +1,61 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator
+
+logger = logging.getLogger()
+
+_DONE = object()
+
+
+def projection(attributes: Iterable[str]) -> Dict[str, Any]:
+    # alias every attribute so reserved words like name, size and status need no special casing
+    names = {"#a{}".format(index): attribute for index, attribute in enumerate(attributes)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def parallel_scan(client: Any, table_name: str, total_segments: int, **kwargs) -> Iterator[Dict[str, Any]]:
+    # each segment pages through its own slice of the table on a worker,
+    # items are handed back as soon as any segment returns a page
+    pages: "queue.Queue[Any]" = queue.Queue()
+    stop = threading.Event()
+
+    def scan_segment(segment: int) -> None:
+        params = {"TableName": table_name, **kwargs}
+        if total_segments > 1:
+            params.update(Segment=segment, TotalSegments=total_segments)
+
+        try:
+            while not stop.is_set():
+                response = client.scan(**params)
+                pages.put(response.get("Items", []))
+
+                if not (last_key := response.get("LastEvaluatedKey")):
+                    break
+                params["ExclusiveStartKey"] = last_key
+        except Exception as error:
+            pages.put(error)
+        finally:
+            pages.put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+
+        remaining = total_segments
+        try:
+            while remaining:
+                page = pages.get()
+                if page is _DONE:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            # let the other segments wind down if we stop early
+            stop.set()
@@ -0,0 +1,124 @@
+import json
+import logging
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from .records import IndexEntry, WordpressPost
+from .writes import WriteOutcome
+
+logger = logging.getLogger()
+
+# bump when the stored format changes so old indexes are rebuilt rather than misread
+INDEX_VERSION = 2
+# relist every post this often to catch posts deleted or edited outside the sync
+REBUILD_SECONDS = 24 * 60 * 60
+# modified_after carries its utc offset and wordpress converts it to the site's time,
+# so the margin only has to cover clock skew between lambda and the server
+MODIFIED_MARGIN = timedelta(minutes=5)
+
+
+class ShadowIndex:
+    """
+    What the sync knows about every wordpress pet post, persisted between runs.
+
+    Each run lists only the posts modified since the last one and fetches just
+    the posts whose pet changed, everything else is planned from the index.
+    """
+
+    def __init__(
+        self,
+        entries: Optional[Dict[int, IndexEntry]] = None,
+        synced_at: Optional[float] = None,
+        rebuilt_at: Optional[float] = None,
+        intake_at: Optional[float] = None,
+    ):
+        self.entries = entries or {}
+        self.synced_at = synced_at
+        self.rebuilt_at = rebuilt_at
+        # when a fast run last tracked posts, it lists from here rather than the last full sync
+        self.intake_at = intake_at
+
+    def needs_rebuild(self, now: float) -> bool:
+        return self.synced_at is None or self.rebuilt_at is None or now - self.rebuilt_at > REBUILD_SECONDS
+
+    def modified_after(self, since: Optional[float] = None) -> str:
+        after = datetime.fromtimestamp(since or self.synced_at, timezone.utc) - MODIFIED_MARGIN
+        return after.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def intake_after(self) -> str:
+        return self.modified_after(max(self.synced_at, self.intake_at or 0))
+
+    def rebuild(self, posts: List[WordpressPost], started: float) -> None:
+        self.entries = {post.id: IndexEntry.from_post(post) for post in posts}
+        self.synced_at = started
+        self.rebuilt_at = started
+
+    def merge(self, posts: List[WordpressPost], started: float) -> None:
+        self.track(posts)
+        self.synced_at = started
+
+    def track(self, posts: List[WordpressPost]) -> bool:
+        # record the posts without moving synced_at, so the next full sync still diffs them.
+        # whether any of them was new to the index or had changed
+        changed = False
+        for post in posts:
+            entry = IndexEntry.from_post(post)
+            if self.entries.get(post.id) != entry:
+                self.entries[post.id] = entry
+                changed = True
+        return changed
+
+    def remove(self, post_id: int) -> None:
+        self.entries.pop(post_id, None)
+
+    def apply(self, outcome: WriteOutcome) -> None:
+        # keep the index in step with our own writes
+        if not outcome.ok:
+            return
+        if outcome.removed_post_id is not None:
+            self.remove(outcome.removed_post_id)
+        # a create whose response didn't carry the new id is picked up by the next listing
+        if outcome.entry is not None and outcome.entry.post_id:
+            self.entries[outcome.entry.post_id] = outcome.entry
+
+    def posts(self, fetched: Dict[int, WordpressPost]) -> List[WordpressPost]:
+        # oldest post first, so the diff keeps the original when a pet has duplicates
+        return [fetched.get(post_id) or self.entries[post_id].stub() for post_id in sorted(self.entries)]
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": INDEX_VERSION,
+            "synced_at": self.synced_at,
+            "rebuilt_at": self.rebuilt_at,
+            "intake_at": self.intake_at,
+            "entries": [asdict(entry) for entry in self.entries.values()],
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "ShadowIndex":
+        if data.get("version") != INDEX_VERSION:
+            logger.info("shadow index version {} is out of date, rebuilding".format(data.get("version")))
+            return cls()
+        entries = {entry["post_id"]: IndexEntry(**entry) for entry in data.get("entries", [])}
+        return cls(entries, data.get("synced_at"), data.get("rebuilt_at"), data.get("intake_at"))
+
+
+def load(client: Any, bucket: str, key: str) -> ShadowIndex:
+    try:
+        response = client.get_object(Bucket=bucket, Key=key)
+    except client.exceptions.NoSuchKey:
+        logger.info("no shadow index yet, rebuilding")
+        return ShadowIndex()
+
+    return ShadowIndex.from_json(json.loads(response["Body"].read()))
+
+
+def save(client: Any, bucket: str, key: str, index: ShadowIndex) -> None:
+    client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(index.to_json(), separators=(",", ":"), default=str).encode(),
+        ContentType="application/json",
+    )
+    logger.info("saved shadow index with {} posts".format(len(index.entries)))
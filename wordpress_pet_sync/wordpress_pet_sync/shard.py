@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from . import aws
+from .deadline import Deadline
+from .records import WordpressPost
+
+logger = logging.getLogger()
+
+
+def is_coordinator_event(event: Dict[str, Any]) -> bool:
+    return "shards" in event and "shard" not in event
+
+
+def is_shard_event(event: Dict[str, Any]) -> bool:
+    return "shard" in event
+
+
+def shard_of(pet_id: Any, shards: int) -> int:
+    # a stable hash, python's own is salted per process
+    digest = hashlib.blake2b(str(pet_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def partition(pet_ids: Iterable[Any], posts: Iterable[WordpressPost], shards: int) -> List[Dict[str, Any]]:
+    # a pet and all of its posts land in the same shard, so each worker can plan
+    # creates, deletes and duplicates on its own
+    events = [{"shard": shard, "shards": shards, "pet_ids": [], "post_ids": []} for shard in range(shards)]
+
+    for pet_id in pet_ids:
+        events[shard_of(pet_id, shards)]["pet_ids"].append(pet_id)
+    for post in posts:
+        events[shard_of(post.pet_id, shards)]["post_ids"].append(post.id)
+
+    return events
+
+
+class LocalExecutor:
+    # runs each shard through a handler in this process, for tests and local backfills
+
+    def __init__(self, handler: Callable[[Dict[str, Any], Any], Optional[Dict[str, Any]]], max_workers: int = 4):
+        self.handler = handler
+        self.max_workers = max_workers
+
+    def run(self, events: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        if not events:
+            return []
+
+        def run(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            try:
+                return self.handler(event, None)
+            except Exception:
+                logger.exception("shard {} failed".format(event["shard"]))
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(events))) as executor:
+            return list(executor.map(run, events))
+
+
+class LambdaExecutor:
+    # invokes one worker lambda per shard and waits for them until the coordinator's deadline
+
+    def __init__(self, function_name: str, deadline: Optional[Deadline] = None):
+        self.function_name = function_name
+        self.deadline = deadline
+
+    def run(self, events: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        if not events:
+            return []
+
+        executor = ThreadPoolExecutor(max_workers=len(events))
+        futures = [executor.submit(self.invoke, event) for event in events]
+        done, _ = wait(futures, timeout=self.wait_seconds())
+        # a worker still running carries on by itself, the coordinator only stops waiting
+        # so it has time left to report the shards that did finish
+        executor.shutdown(wait=False)
+
+        results = []
+        for event, future in zip(events, futures):
+            if future in done:
+                results.append(future.result())
+            else:
+                logger.error("shard {} did not finish before the coordinator's deadline".format(event["shard"]))
+                results.append(None)
+        return results
+
+    def wait_seconds(self) -> Optional[float]:
+        if self.deadline is None or math.isinf(self.deadline.remaining()):
+            return None
+        return max(self.deadline.remaining(), 0)
+
+    def invoke(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            response = aws.client("lambda").invoke(
+                FunctionName=self.function_name,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(event).encode(),
+            )
+            payload = response["Payload"].read()
+        except (BotoCoreError, ClientError):
+            # throttled, timed out or refused, the other shards' results still count
+            logger.exception("could not invoke shard {}".format(event["shard"]))
+            return None
+
+        if response.get("FunctionError"):
+            logger.error("shard {} failed: {}".format(event["shard"], payload))
+            return None
+
+        return json.loads(payload)
+
+
+def merge(results: List[Optional[Dict[str, Any]]]) -> Dict[str, List[str]]:
+    merged: Dict[str, List[Any]] = {"added": [], "deleted": [], "entries": []}
+
+    for result in results:
+        if result is None:
+            continue
+        merged["added"].extend(result.get("added", []))
+        merged["deleted"].extend(result.get("deleted", []))
+        merged["entries"].extend(result.get("entries", []))
+
+    failed = sum(result is None for result in results)
+    if failed:
+        logger.error("{} of {} shards failed, the next sync picks up their pets".format(failed, len(results)))
+
+    return merged
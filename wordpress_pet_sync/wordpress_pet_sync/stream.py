@@ -0,0 +1,16 @@
+from typing import Any, Dict, List
+
+# events the Pets table stream sends through the lambda event source mapping
+STREAM_EVENT_SOURCE = "aws:dynamodb"
+
+
+def is_stream_event(event: Dict[str, Any]) -> bool:
+    records = event.get("Records") or []
+    return bool(records) and all(record.get("eventSource") == STREAM_EVENT_SOURCE for record in records)
+
+
+def changed_ids(records: List[Dict[str, Any]]) -> List[str]:
+    # the keys are enough, the current item is read back from the table so that
+    # out of order or repeated records for a pet all converge on its latest state
+    ids = (record["dynamodb"]["Keys"]["id"]["S"] for record in records)
+    return list(dict.fromkeys(ids))
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+
+from botocore.stub import Stubber
+
+from wordpress_pet_sync import aws
+
+
+def test_prefetch_secrets_batches_and_caches():
+    aws._secrets.clear()
+
+    with Stubber(aws.client("secretsmanager")) as stub:
+        stub.add_response(
+            "batch_get_secret_value",
+            {
+                "SecretValues": [
+                    {"Name": "wordpress_credentials", "SecretString": '{"username": "abc"}'},
+                    {"Name": "slack_alerts_webhook", "SecretString": '{"url": "https://slack"}'},
+                ],
+            },
+            {"SecretIdList": ["wordpress_credentials", "slack_alerts_webhook"]},
+        )
+
+        aws.prefetch_secrets(["wordpress_credentials", "slack_alerts_webhook"])
+
+        # warm lookups make no further calls
+        assert aws.get_secret_json("wordpress_credentials") == {"username": "abc"}
+        assert aws.get_secret_json("slack_alerts_webhook") == {"url": "https://slack"}
+        aws.prefetch_secrets(["wordpress_credentials", "slack_alerts_webhook"])
+
+        stub.assert_no_pending_responses()
+
+
+def test_get_secret_refetches_when_expired_or_invalidated():
+    aws._secrets.clear()
+    aws._secrets["wordpress_credentials"] = (0, "old")
+    aws._secrets["slack_alerts_webhook"] = (float("inf"), "old")
+
+    with Stubber(aws.client("secretsmanager")) as stub:
+        stub.add_response(
+            "batch_get_secret_value",
+            {"SecretValues": [{"Name": "wordpress_credentials", "SecretString": "new"}]},
+            {"SecretIdList": ["wordpress_credentials"]},
+        )
+        stub.add_response(
+            "batch_get_secret_value",
+            {"SecretValues": [{"Name": "slack_alerts_webhook", "SecretString": "new"}]},
+            {"SecretIdList": ["slack_alerts_webhook"]},
+        )
+
+        assert aws.get_secret("wordpress_credentials") == "new"
+        assert aws.get_secret("slack_alerts_webhook") == "old"
+
+        aws.invalidate_secret("slack_alerts_webhook")
+        assert aws.get_secret("slack_alerts_webhook") == "new"
+
+        stub.assert_no_pending_responses()
+
+
+def test_handler_import_makes_no_aws_calls():
+    # without a region boto3 raises as soon as a client is built
+    env = {key: value for key, value in os.environ.items() if not key.startswith("AWS_")}
+    result = subprocess.run(
+        [sys.executable, "-c", "import wordpress_pet_sync.wordpress_pet_sync"],
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,34 @@
+from wordpress_pet_sync import batch
+from wordpress_pet_sync.writes import WriteRequest
+
+
+def test_max_batch_size():
+    options = {"endpoints": [{"methods": ["POST"], "args": {"requests": {"type": "array", "maxItems": 50}}}]}
+
+    assert batch.max_batch_size(options) == 50
+    assert batch.max_batch_size({}) == batch.DEFAULT_BATCH_SIZE
+
+
+def test_chunked():
+    assert list(batch.chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+
+def test_payload():
+    requests = [
+        WriteRequest("DELETE", "/wp/v2/pet/1?force=true"),
+        WriteRequest("POST", "/wp/v2/pet", {"title": "Fido"}, expected_status=201),
+    ]
+
+    assert batch.payload(requests) == {
+        "validation": "normal",
+        "requests": [
+            {"method": "DELETE", "path": "/wp/v2/pet/1?force=true"},
+            {"method": "POST", "path": "/wp/v2/pet", "body": {"title": "Fido"}},
+        ],
+    }
+
+
+def test_unpack_pads_missing_responses():
+    response = {"responses": [{"status": 201, "body": {"id": 1}}]}
+
+    assert batch.unpack(response, 2) == [{"status": 201, "body": {"id": 1}}, None]
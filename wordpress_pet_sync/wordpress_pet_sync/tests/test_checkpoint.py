@@ -0,0 +1,73 @@
+from wordpress_pet_sync import checkpoint, diff
+from wordpress_pet_sync.records import IndexEntry, Pet, WordpressPost
+from wordpress_pet_sync.writes import WriteOutcome
+
+
+def make_plan():
+    post = WordpressPost(id=1, title="Rex", content="", acf={"id": "B", "breed": "Hound"})
+    return diff.Plan(
+        creates=[diff.Create(Pet(id="A", name="Fido", description="", photos=["p0"]))],
+        updates=[diff.Update(Pet(id="B", name="Rex", description=""), post, {"title": "Rex"}, "cover", True)],
+        deletes=[diff.Delete(WordpressPost(id=2, title="Gone", content="", acf={"id": "Z"}))],
+        duplicates=[diff.Duplicate(WordpressPost(id=3, title="Rex", content="", acf={"id": "B"}))],
+    )
+
+
+def test_checkpoint_round_trip(tmp_path):
+    store = checkpoint.LocalCheckpointStore(str(tmp_path))
+    saved = checkpoint.Checkpoint(store, "run")
+    saved.plan = make_plan()
+    saved.claimed = ["A"]
+    saved.sent = ["A"]
+    saved.media = {"cover": 9}
+    saved.outcomes = [("create", WriteOutcome("A", "Fido", ok=True, entry=IndexEntry(4, "A", "Fido")))]
+    saved.save()
+
+    loaded = checkpoint.Checkpoint(store, "run")
+    assert loaded.load()
+    assert loaded.plan == saved.plan
+    assert loaded.claimed == ["A"]
+    assert loaded.sent == ["A"]
+    assert loaded.media == {"cover": 9}
+    assert loaded.outcomes == saved.outcomes
+
+    loaded.clear()
+    assert not checkpoint.Checkpoint(store, "run").load()
+
+
+def test_remaining_skips_finished_writes(tmp_path):
+    saved = checkpoint.Checkpoint(checkpoint.LocalCheckpointStore(str(tmp_path)), "run")
+    saved.plan = make_plan()
+    saved.outcomes = [
+        ("create", WriteOutcome("A", "Fido", ok=True)),
+        ("delete", WriteOutcome("B", "Rex", ok=True, removed_post_id=3)),
+        # failed writes are tried again
+        ("delete", WriteOutcome("Z", "Gone", ok=False, removed_post_id=2)),
+    ]
+
+    remaining = saved.remaining()
+
+    assert remaining.creates == []
+    assert [update.pet.id for update in remaining.updates] == ["B"]
+    assert [delete.post.id for delete in remaining.deletes] == [2]
+    assert remaining.duplicates == []
+
+
+def test_expired_checkpoint_is_ignored(tmp_path, monkeypatch):
+    store = checkpoint.LocalCheckpointStore(str(tmp_path))
+    saved = checkpoint.Checkpoint(store, "run")
+    saved.plan = make_plan()
+    saved.save()
+
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_TTL_SECONDS", -1)
+    assert not checkpoint.Checkpoint(store, "run").load()
+
+
+def test_remaining_leaves_creates_that_were_in_flight(tmp_path):
+    saved = checkpoint.Checkpoint(checkpoint.LocalCheckpointStore(str(tmp_path)), "run")
+    saved.plan = diff.Plan(creates=[diff.Create(Pet(id=pet_id, name="", description="")) for pet_id in "ABC"])
+    saved.sent = ["A", "B"]
+    # B's create was refused, so it is tried again
+    saved.outcomes = [("create", WriteOutcome("B", "", ok=False))]
+
+    assert [create.pet.id for create in saved.remaining().creates] == ["B", "C"]
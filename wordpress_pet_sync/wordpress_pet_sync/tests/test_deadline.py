@@ -0,0 +1,42 @@
+from wordpress_pet_sync import deadline
+
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_from_context_keeps_time_to_finish(monkeypatch):
+    monkeypatch.setattr(deadline.time, "monotonic", lambda: 100.0)
+
+    assert deadline.Deadline.from_context(Context(600_000), reserve=30).remaining() == 570
+    # the tier's budget applies when it is shorter than what lambda has left
+    assert deadline.Deadline.from_context(Context(600_000), budget=120).remaining() == 120
+    assert deadline.Deadline.from_context(None).remaining() == float("inf")
+
+
+def test_timeout_follows_the_time_left(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(deadline.time, "monotonic", lambda: now[0])
+    run = deadline.Deadline(60)
+
+    assert run.timeout() == deadline.MAX_CALL_SECONDS
+    assert not run.expired()
+
+    now[0] = 150.0
+    assert run.timeout() == 10
+
+    now[0] = 170.0
+    assert run.expired()
+    assert run.timeout() == deadline.MIN_CALL_SECONDS
+
+
+def test_timeout_leaves_the_reserve(monkeypatch):
+    monkeypatch.setattr(deadline.time, "monotonic", lambda: 100.0)
+    run = deadline.Deadline().start(Context(20_000))
+
+    assert 9 < run.timeout(reserve=10) <= 10
+    assert run.timeout(reserve=30) == deadline.MIN_CALL_SECONDS
@@ -0,0 +1,33 @@
+from decimal import Decimal
+
+import pytest
+
+from wordpress_pet_sync import decoder
+from wordpress_pet_sync.records import PET_SPEC, Pet
+
+
+def test_decoder_reads_declared_attributes():
+    decode = decoder.compile_decoder(PET_SPEC, Pet)
+
+    pet = decode(
+        {
+            "id": {"S": "A"},
+            "name": {"S": "Fido"},
+            "photos": {"L": [{"S": "p0"}, {"S": "p1"}]},
+            "breed": {"NULL": True},
+            "notes": {"S": "never read"},
+        }
+    )
+
+    assert pet == Pet(id="A", name="Fido", photos=["p0", "p1"])
+
+
+def test_decoder_falls_back_for_unexpected_types():
+    decode = decoder.compile_decoder({"id": "S", "photos": "[S]"}, dict)
+
+    assert decode({"id": {"N": "7"}, "photos": {"SS": ["p0"]}}) == {"id": Decimal("7"), "photos": ["p0"]}
+
+
+def test_decoder_rejects_unknown_types():
+    with pytest.raises(ValueError):
+        decoder.compile_decoder({"id": "M"}, dict)
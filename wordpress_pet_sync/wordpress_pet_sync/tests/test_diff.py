@@ -0,0 +1,127 @@
+from wordpress_pet_sync import diff
+from wordpress_pet_sync.records import Pet, WordpressPost
+
+
+def make_pet(id, **fields):
+    return Pet(
+        **{
+            "id": id,
+            "name": "Pet {}".format(id),
+            "description": "A good pet",
+            **fields,
+        }
+    )
+
+
+def make_post(post_id, id, **acf):
+    return WordpressPost.from_json(
+        {
+            "id": post_id,
+            "title": {"rendered": "Pet {}".format(id)},
+            "content": {"rendered": "<p>A good pet</p>\n"},
+            "featured_media": 1,
+            "acf": {"id": id, **acf},
+        }
+    )
+
+
+def test_plan_changes():
+    dynamodb_pets = [make_pet("A"), make_pet("B"), make_pet("C", name="Renamed")]
+    fingerprints = {pet.id: pet.fingerprint() for pet in dynamodb_pets}
+    wordpress_pets = [
+        make_post(1, "A", syncFingerprint=fingerprints["A"]),
+        make_post(2, "C", syncFingerprint="stale"),
+        make_post(3, "Z"),
+        make_post(4, "A"),
+    ]
+
+    plan = diff.plan_changes(dynamodb_pets, wordpress_pets, lambda ids: {})
+
+    assert [create.pet.id for create in plan.creates] == ["B"]
+    assert [delete.post.id for delete in plan.deletes] == [3]
+    assert [duplicate.post.id for duplicate in plan.duplicates] == [4]
+    assert len(plan.updates) == 1
+    assert plan.updates[0].post.id == 2
+    assert plan.updates[0].patch == {"title": "Renamed", "acf": {"syncFingerprint": fingerprints["C"]}}
+
+
+def test_plan_update_patches_only_changed_fields():
+    pet = make_pet("A", photos=["p0", "p1"], coverPhoto="cover", breed="Beagle", color=None)
+    post = make_post(
+        1,
+        "A",
+        photos_0="p0",
+        photos_1="old",
+        photos_2="gone",
+        photos_3="gone",
+        breed="Hound",
+        color="",
+    )
+
+    update = diff.plan_update(pet, post, "cover")
+
+    assert update.patch == {
+        "acf": {
+            "photos_1": "p1",
+            "photos_2": "",
+            "photos_3": "",
+            "breed": "Beagle",
+            "syncFingerprint": pet.fingerprint(),
+        },
+    }
+    assert update.featured_photo is None
+
+
+def test_plan_update_featured_photo():
+    pet = make_pet("A", coverPhoto="new")
+
+    update = diff.plan_update(pet, make_post(1, "A"), "old")
+    assert update.featured_photo == "new"
+    assert update.record_featured_photo
+
+    post = make_post(1, "A", syncFingerprint=pet.fingerprint())
+    post.featured_media = 0
+    update = diff.plan_update(pet, post, "new")
+    assert update.featured_photo == "new"
+    assert not update.record_featured_photo
+
+    # a post written from this exact pet already features its cover photo
+    update = diff.plan_update(pet, make_post(1, "A", syncFingerprint=pet.fingerprint()), "old")
+    assert not update.has_changes()
+
+
+def test_plan_changes_looks_up_featured_photos_once_for_changed_pets():
+    dynamodb_pets = [
+        make_pet("A", coverPhoto="a"),
+        make_pet("B", coverPhoto="b"),
+        make_pet("C", coverPhoto="c"),
+        make_pet("D"),
+    ]
+    wordpress_pets = [
+        make_post(1, "A", syncFingerprint=dynamodb_pets[0].fingerprint()),
+        make_post(2, "B", syncFingerprint="stale"),
+        make_post(3, "C", syncFingerprint="stale"),
+        make_post(4, "D", syncFingerprint="stale"),
+    ]
+    lookups = []
+
+    def featured_photos(ids):
+        lookups.append(ids)
+        return {"B": "b", "C": "old"}
+
+    plan = diff.plan_changes(dynamodb_pets, wordpress_pets, featured_photos)
+
+    assert lookups == [["B", "C"]]
+    assert {update.pet.id: update.featured_photo for update in plan.updates} == {"B": None, "C": "c", "D": None}
+
+
+def test_plan_update_skips_comparison_when_fingerprint_matches():
+    pet = make_pet("A", breed="Beagle")
+    # the post differs, but it was written from this exact pet
+    post = make_post(1, "A", breed="Hound", syncFingerprint=pet.fingerprint())
+
+    assert not diff.plan_update(pet, post, None).has_changes()
+
+    # without a fingerprint the fields are compared and the fingerprint is backfilled
+    update = diff.plan_update(pet, make_post(1, "A"), None)
+    assert update.patch == {"acf": {"syncFingerprint": pet.fingerprint()}}
@@ -0,0 +1,27 @@
+from botocore.stub import Stubber
+
+from wordpress_pet_sync import aws, dynamodb
+
+
+def test_batch_get_follows_unprocessed_keys():
+    client = aws.client("dynamodb")
+
+    with Stubber(client) as stub:
+        stub.add_response(
+            "batch_get_item",
+            {
+                "Responses": {"Pets": [{"id": {"S": "A"}}]},
+                "UnprocessedKeys": {"Pets": {"Keys": [{"id": {"S": "B"}}]}},
+            },
+            {"RequestItems": {"Pets": {"Keys": [{"id": {"S": "A"}}, {"id": {"S": "B"}}]}}},
+        )
+        stub.add_response(
+            "batch_get_item",
+            {"Responses": {"Pets": [{"id": {"S": "B"}}]}},
+            {"RequestItems": {"Pets": {"Keys": [{"id": {"S": "B"}}]}}},
+        )
+
+        items = dynamodb.batch_get(client, "Pets", ["A", "B", "A"])
+
+        assert items == [{"id": {"S": "A"}}, {"id": {"S": "B"}}]
+        stub.assert_no_pending_responses()
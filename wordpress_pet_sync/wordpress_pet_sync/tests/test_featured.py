@@ -0,0 +1,27 @@
+from botocore.stub import Stubber
+
+from wordpress_pet_sync import aws, featured, scan
+
+
+def test_lookup_batches_and_caches():
+    photos = featured.FeaturedPhotos()
+
+    with Stubber(aws.client("dynamodb")) as stub:
+        stub.add_response(
+            "batch_get_item",
+            {"Responses": {"FeaturedPhotos": [{"id": {"S": "A"}, "photo": {"S": "https://a/cover.jpg"}}]}},
+            {
+                "RequestItems": {
+                    "FeaturedPhotos": {
+                        "Keys": [{"id": {"S": "A"}}, {"id": {"S": "B"}}],
+                        **scan.projection(["id", "photo"]),
+                    }
+                }
+            },
+        )
+
+        assert photos.lookup(["A", "B"]) == {"A": "https://a/cover.jpg"}
+        # pets already looked up, with or without a photo, make no further calls
+        assert photos.lookup(["B", "A"]) == {"A": "https://a/cover.jpg"}
+
+        stub.assert_no_pending_responses()
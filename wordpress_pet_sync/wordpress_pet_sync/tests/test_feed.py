@@ -0,0 +1,61 @@
+import gzip
+import json
+
+from botocore.stub import ANY, Stubber
+
+from wordpress_pet_sync import aws, feed
+from wordpress_pet_sync.records import Pet
+
+
+def test_build_shards_by_species():
+    pets = [
+        Pet(id="2", name="Tom", description="", species="Cat", internalId="X"),
+        Pet(id="1", name="Rex", description="A good dog", species="Dog", photos=["https://a/1.jpg"]),
+        Pet(id="3", name="Bun", description="", species="Small Mammal"),
+    ]
+
+    documents = feed.build(pets)
+
+    index = documents["pets.json"]
+    assert index["count"] == 3
+    assert [pet["id"] for pet in index["pets"]] == ["1", "2", "3"]
+    # empty and internal fields are left out
+    assert index["pets"][1] == {"id": "2", "name": "Tom", "species": "Cat"}
+    assert index["species"] == {
+        "cat": "species/cat.json",
+        "dog": "species/dog.json",
+        "small-mammal": "species/small-mammal.json",
+    }
+    assert documents["species/dog.json"]["pets"] == [
+        {"id": "1", "name": "Rex", "description": "A good dog", "photos": ["https://a/1.jpg"], "species": "Dog"}
+    ]
+
+
+def test_encode_is_stable():
+    document = feed.build([Pet(id="1", name="Rex", description="", species="Dog")])["pets.json"]
+
+    assert feed.encode(document) == feed.encode(document)
+    assert json.loads(gzip.decompress(feed.encode(document))) == document
+
+
+def test_publish_writes_shards_before_index():
+    pets = [Pet(id="1", name="Rex", description="", species="Dog")]
+
+    with Stubber(aws.client("s3")) as stub:
+        for key in ["feed/v1/species/dog.json", "feed/v1/pets.json"]:
+            stub.add_response(
+                "put_object",
+                {},
+                {
+                    "Bucket": "feed-bucket",
+                    "Key": key,
+                    "Body": ANY,
+                    "ContentType": "application/json",
+                    "ContentEncoding": "gzip",
+                    "CacheControl": feed.CACHE_CONTROL,
+                },
+            )
+
+        feed.publish(aws.client("s3"), "feed-bucket", pets)
+
+        stub.assert_no_pending_responses()
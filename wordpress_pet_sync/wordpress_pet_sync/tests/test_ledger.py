@@ -0,0 +1,45 @@
+import pytest
+from botocore.stub import Stubber
+
+from wordpress_pet_sync import aws, ledger
+
+
+def test_claim():
+    client = aws.client("dynamodb")
+    expected = {
+        "TableName": "WordpressCreates",
+        "Item": {
+            "id": {"S": "A"},
+            "status": {"S": "pending"},
+            "claimed_at": {"N": "1000"},
+            "expires_at": {"N": str(1000 + ledger.EXPIRE_SECONDS)},
+        },
+        "ConditionExpression": "attribute_not_exists(id) OR claimed_at < :stale",
+        "ExpressionAttributeValues": {":stale": {"N": str(1000 - ledger.LEASE_SECONDS)}},
+    }
+
+    with Stubber(client) as stub:
+        stub.add_response("put_item", {}, expected)
+        stub.add_client_error("put_item", "ConditionalCheckFailedException", expected_params=expected)
+        stub.add_client_error("put_item", "ProvisionedThroughputExceededException", expected_params=expected)
+
+        assert ledger.claim(client, "A", 1000)
+        assert not ledger.claim(client, "A", 1000)
+        with pytest.raises(Exception):
+            ledger.claim(client, "A", 1000)
+
+        stub.assert_no_pending_responses()
+
+
+def test_status():
+    client = aws.client("dynamodb")
+    expected = {"TableName": "WordpressCreates", "Key": {"id": {"S": "A"}}, "ConsistentRead": True}
+
+    with Stubber(client) as stub:
+        stub.add_response("get_item", {"Item": {"id": {"S": "A"}, "status": {"S": "created"}}}, expected)
+        stub.add_response("get_item", {}, expected)
+
+        assert ledger.status(client, "A") == "created"
+        assert ledger.status(client, "A") is None
+
+        stub.assert_no_pending_responses()
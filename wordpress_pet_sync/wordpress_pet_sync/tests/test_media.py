@@ -0,0 +1,52 @@
+import io
+import threading
+
+import requests
+import requests_mock
+
+from wordpress_pet_sync import media
+
+
+def test_media_pipeline_uploads_each_photo_once():
+    lock = threading.Lock()
+    uploaded = []
+
+    def upload(photo_url):
+        with lock:
+            uploaded.append(photo_url)
+        return len(photo_url)
+
+    pipeline = media.MediaPipeline(upload, max_workers=2)
+    pipeline.prefetch(["https://a", "https://bb", None, "https://a"])
+
+    assert pipeline.get("https://a") == 9
+    assert pipeline.get("https://bb") == 10
+    assert pipeline.get("https://ccc") == 11
+    assert pipeline.get("") == -1
+    pipeline.close()
+
+    assert sorted(uploaded) == ["https://a", "https://bb", "https://ccc"]
+
+
+def test_media_pipeline_upload_error():
+    def upload(photo_url):
+        raise Exception("boom")
+
+    pipeline = media.MediaPipeline(upload, max_workers=1)
+    assert pipeline.get("https://a") == -1
+    pipeline.close()
+
+
+def test_stream_body():
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.get("https://a/photo.jpg", body=io.BytesIO(b"jpeg"), headers={"Content-Length": "4"})
+        requests_mocker.get("https://b/photo.jpg", body=io.BytesIO(b"jpeg"))
+
+        body = media.stream_body(requests.get("https://a/photo.jpg", stream=True))
+        assert isinstance(body, media.StreamedBody)
+        assert len(body) == 4
+        assert body.read(2) == b"jp"
+        assert body.read() == b"eg"
+
+        body = media.stream_body(requests.get("https://b/photo.jpg", stream=True))
+        assert b"".join(body) == b"jpeg"
@@ -0,0 +1,71 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from wordpress_pet_sync import purge
+from wordpress_pet_sync.writes import WriteOutcome
+
+
+class PurgeStandIn(BaseHTTPRequestHandler):
+    # a local purge endpoint that records every request it gets
+    received = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.received.append((self.headers.get("Authorization"), body))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_backend_purges_in_batches():
+    PurgeStandIn.received = []
+    server = HTTPServer(("127.0.0.1", 0), PurgeStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        backend = purge.HttpPurgeBackend(
+            "http://127.0.0.1:{}/purge".format(server.server_port),
+            headers={"Authorization": "Bearer abc"},
+            batch_size=2,
+        )
+        backend.purge(["https://a/1/", "https://a/2/", "https://a/3/"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert PurgeStandIn.received == [
+        ("Bearer abc", {"files": ["https://a/1/", "https://a/2/"]}),
+        ("Bearer abc", {"files": ["https://a/3/"]}),
+    ]
+
+
+def test_affected_urls():
+    outcomes = [
+        WriteOutcome("A", "Fido", ok=True, link="https://a/pet/fido/", listings=["https://a/pet/", "https://a/dog/"]),
+        WriteOutcome("B", "Rex", ok=False, link="https://a/pet/rex/", listings=["https://a/cat/"]),
+        WriteOutcome("C", "Tom", ok=True, listings=["https://a/pet/"]),
+        WriteOutcome("A", "Fido", ok=True, link="https://a/pet/fido/"),
+    ]
+
+    assert purge.affected_urls(outcomes) == ["https://a/pet/fido/", "https://a/pet/", "https://a/dog/"]
+    # nothing written, nothing purged
+    assert purge.affected_urls(outcomes[1:2]) == []
+
+
+def test_listing_urls_follow_the_pets_fields():
+    field_urls = {"species": "https://a/pet/?species={}", "size": "https://a/pet-attributes/{}/"}
+    before = {"id": "A", "species": "Dog", "size": "Large", "age": "Adult"}
+    after = {"id": "A", "species": "Dog", "size": "Extra-Large", "sex": None}
+
+    assert purge.listing_urls("https://a/pet/", field_urls, before, after) == [
+        "https://a/pet/",
+        "https://a/pet/?species=dog",
+        "https://a/pet-attributes/large/",
+        "https://a/pet-attributes/extra-large/",
+    ]
+    # a post from the shadow index has no listed fields
+    assert purge.listing_urls("https://a/pet/", field_urls, {"id": "A"}) == ["https://a/pet/"]
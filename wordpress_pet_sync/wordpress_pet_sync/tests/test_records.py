@@ -0,0 +1,48 @@
+from wordpress_pet_sync.records import Pet, WordpressPost
+
+
+def test_wordpress_post_from_json():
+    post = WordpressPost.from_json(
+        {
+            "id": 5,
+            "title": {"rendered": "Fido &amp; Friends"},
+            "content": {"rendered": "<p>good dog</p>"},
+            "featured_media": 7,
+            "slug": "fido",
+            "acf": {"id": "A"},
+        }
+    )
+
+    assert post == WordpressPost(
+        id=5,
+        title="Fido &amp; Friends",
+        content="<p>good dog</p>",
+        featured_media=7,
+        slug="fido",
+        acf={"id": "A"},
+    )
+    assert post.pet_id == "A"
+
+
+def test_wordpress_post_from_json_prefers_raw_fields():
+    post = WordpressPost.from_json(
+        {
+            "id": 5,
+            "title": {"raw": "Fido & Friends", "rendered": "Fido &amp; Friends"},
+            "content": {"raw": "good dog", "rendered": "<p>good dog</p>"},
+            "acf": [],
+        }
+    )
+
+    assert post.title == "Fido & Friends"
+    assert post.content == "good dog"
+    assert post.acf == {}
+    assert post.pet_id is None
+
+
+def test_pet_fingerprint_tracks_synced_fields():
+    pet = Pet(id="A", name="Fido", photos=["p0"])
+
+    assert pet.fingerprint() == Pet(id="A", name="Fido", photos=["p0"]).fingerprint()
+    assert pet.fingerprint() != Pet(id="A", name="Fido", photos=["p1"]).fingerprint()
+    assert pet.fingerprint() != Pet(id="A", name="Fido", photos=["p0"], breed="Beagle").fingerprint()
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from wordpress_pet_sync import scan
+
+
+class FakeClient:
+    def __init__(self, pages_per_segment, fail_segment=None):
+        self.pages_per_segment = pages_per_segment
+        self.fail_segment = fail_segment
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def scan(self, **params):
+        with self.lock:
+            self.calls.append(params)
+
+        segment = params.get("Segment", 0)
+        if segment == self.fail_segment:
+            raise Exception("boom")
+
+        page = params.get("ExclusiveStartKey", {}).get("page", 0)
+        response = {"Items": [{"segment": segment, "page": page}]}
+        if page + 1 < self.pages_per_segment:
+            response["LastEvaluatedKey"] = {"page": page + 1}
+        return response
+
+
+def test_parallel_scan_reads_every_segment():
+    client = FakeClient(pages_per_segment=3)
+
+    items = list(scan.parallel_scan(client, "Pets", 4, ProjectionExpression="id"))
+
+    assert sorted((item["segment"], item["page"]) for item in items) == [
+        (segment, page) for segment in range(4) for page in range(3)
+    ]
+    assert all(call["TotalSegments"] == 4 and call["ProjectionExpression"] == "id" for call in client.calls)
+
+
+def test_parallel_scan_single_segment_is_a_plain_scan():
+    client = FakeClient(pages_per_segment=2)
+
+    assert len(list(scan.parallel_scan(client, "Pets", 1))) == 2
+    assert client.calls == [{"TableName": "Pets"}, {"TableName": "Pets", "ExclusiveStartKey": {"page": 1}}]
+
+
+def test_parallel_scan_raises_segment_errors():
+    client = FakeClient(pages_per_segment=2, fail_segment=1)
+
+    with pytest.raises(Exception, match="boom"):
+        list(scan.parallel_scan(client, "Pets", 2))
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+
+from wordpress_pet_sync import shadow
+from wordpress_pet_sync.records import IndexEntry, WordpressPost
+from wordpress_pet_sync.writes import WriteOutcome
+
+
+def make_post(post_id, id, fingerprint=None):
+    return WordpressPost(
+        id=post_id, title="Pet {}".format(id), content="", acf={"id": id, "syncFingerprint": fingerprint}
+    )
+
+
+def test_needs_rebuild():
+    assert shadow.ShadowIndex().needs_rebuild(0)
+
+    index = shadow.ShadowIndex()
+    index.rebuild([make_post(1, "A")], 1000)
+    assert not index.needs_rebuild(1000 + shadow.REBUILD_SECONDS)
+    assert index.needs_rebuild(1001 + shadow.REBUILD_SECONDS)
+
+
+def test_modified_after_is_utc_with_a_small_margin():
+    started = datetime(2024, 6, 2, 12, 0, tzinfo=timezone.utc).timestamp()
+    index = shadow.ShadowIndex(synced_at=started, rebuilt_at=started)
+
+    assert index.modified_after() == "2024-06-02T11:55:00Z"
+
+
+def test_merge_apply_and_posts():
+    index = shadow.ShadowIndex()
+    index.rebuild([make_post(2, "A", "fa"), make_post(3, "B", "fb")], 0)
+
+    index.merge([make_post(5, "C", "fc"), make_post(1, "A", "fa")], 10)
+    index.apply(WriteOutcome("B", "Pet B", ok=True, removed_post_id=3))
+    index.apply(WriteOutcome("D", "Pet D", ok=True, entry=IndexEntry(9, "D", "Pet D", 4, "fd")))
+    index.apply(WriteOutcome("E", "Pet E", ok=False, entry=IndexEntry(7, "E")))
+    index.apply(WriteOutcome("F", "Pet F", ok=True, entry=IndexEntry(0, "F")))
+
+    assert index.synced_at == 10
+    assert index.rebuilt_at == 0
+
+    fetched = {5: make_post(5, "C", "fc")}
+    posts = index.posts(fetched)
+    assert [post.id for post in posts] == [1, 2, 5, 9]
+    assert posts[2] is fetched[5]
+    assert posts[3] == WordpressPost(
+        id=9, title="Pet D", content="", featured_media=4, acf={"id": "D", "syncFingerprint": "fd"}
+    )
+
+
+def test_json_round_trip():
+    index = shadow.ShadowIndex()
+    index.rebuild([make_post(1, "A", "fa")], 5)
+
+    loaded = shadow.ShadowIndex.from_json(index.to_json())
+
+    assert loaded.entries == index.entries
+    assert (loaded.synced_at, loaded.rebuilt_at) == (5, 5)
+    assert shadow.ShadowIndex.from_json({"version": 0}).needs_rebuild(5)
+
+
+def test_track_reports_new_posts_and_intake_round_trips():
+    index = shadow.ShadowIndex(synced_at=1000, rebuilt_at=1000)
+
+    assert index.track([make_post(1, "A", "fa")])
+    assert not index.track([make_post(1, "A", "fa")])
+    assert index.track([make_post(1, "A", "fb")])
+
+    index.intake_at = 2000
+    restored = shadow.ShadowIndex.from_json(index.to_json())
+    assert restored.intake_at == 2000
+    assert restored.intake_after() == index.modified_after(2000)
+    assert restored.entries == index.entries
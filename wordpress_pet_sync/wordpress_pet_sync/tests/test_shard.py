@@ -0,0 +1,91 @@
+import io
+import json
+import threading
+
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+from wordpress_pet_sync import aws, deadline, shard
+from wordpress_pet_sync.records import WordpressPost
+
+
+def test_partition_keeps_pets_with_their_posts():
+    pet_ids = [str(id) for id in range(50)]
+    posts = [WordpressPost(id=100 + int(id), title="", content="", acf={"id": id}) for id in pet_ids]
+    posts.append(WordpressPost(id=999, title="", content="", acf={"id": "7"}))
+
+    events = shard.partition(pet_ids, posts, 4)
+
+    assert [event["shard"] for event in events] == [0, 1, 2, 3]
+    assert sorted(id for event in events for id in event["pet_ids"]) == sorted(pet_ids)
+    for event in events:
+        for post_id in event["post_ids"]:
+            pet_id = "7" if post_id == 999 else str(post_id - 100)
+            assert pet_id in event["pet_ids"]
+    # the same id always lands in the same shard
+    assert shard.partition(pet_ids, posts, 4) == events
+
+
+def test_local_executor_merges_shard_results():
+    def worker(event, _):
+        if event["shard"] == 1:
+            raise Exception("worker failed")
+        return {"added": ["added {}".format(event["shard"])], "deleted": ["deleted {}".format(event["shard"])]}
+
+    events = [{"shard": index, "shards": 3} for index in range(3)]
+    results = shard.merge(shard.LocalExecutor(worker).run(events))
+
+    assert results == {"added": ["added 0", "added 2"], "deleted": ["deleted 0", "deleted 2"], "entries": []}
+
+
+def test_lambda_executor_invokes_workers():
+    def payload(data):
+        return StreamingBody(io.BytesIO(data), len(data))
+
+    with Stubber(aws.client("lambda")) as stub:
+        stub.add_response(
+            "invoke",
+            {"StatusCode": 200, "Payload": payload(b'{"added": ["Fido"], "deleted": []}')},
+            {"FunctionName": "sync", "InvocationType": "RequestResponse", "Payload": json.dumps({"shard": 0}).encode()},
+        )
+        stub.add_response(
+            "invoke",
+            {"StatusCode": 200, "FunctionError": "Unhandled", "Payload": payload(b'{"errorMessage": "timeout"}')},
+            {"FunctionName": "sync", "InvocationType": "RequestResponse", "Payload": json.dumps({"shard": 1}).encode()},
+        )
+
+        executor = shard.LambdaExecutor("sync")
+        results = [executor.invoke({"shard": 0}), executor.invoke({"shard": 1})]
+
+        assert results == [{"added": ["Fido"], "deleted": []}, None]
+        stub.assert_no_pending_responses()
+
+
+def test_lambda_executor_records_a_throttled_shard_as_failed():
+    with Stubber(aws.client("lambda")) as stub:
+        stub.add_client_error("invoke", "TooManyRequestsException", http_status_code=429)
+
+        assert shard.LambdaExecutor("sync").invoke({"shard": 0}) is None
+        stub.assert_no_pending_responses()
+
+
+def test_lambda_executor_stops_waiting_at_the_deadline(monkeypatch):
+    release = threading.Event()
+
+    def invoke(event):
+        if event["shard"] == 1:
+            release.wait(5)
+        return {"added": [str(event["shard"])], "deleted": []}
+
+    executor = shard.LambdaExecutor("sync", deadline.Deadline(0.2))
+    monkeypatch.setattr(executor, "invoke", invoke)
+
+    try:
+        assert executor.run([{"shard": 0}, {"shard": 1}]) == [{"added": ["0"], "deleted": []}, None]
+    finally:
+        release.set()
+
+
+def test_executors_run_no_shards():
+    assert shard.LambdaExecutor("sync").run([]) == []
+    assert shard.LocalExecutor(lambda event, _: None).run([]) == []
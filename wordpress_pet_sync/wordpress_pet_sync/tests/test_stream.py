@@ -0,0 +1,21 @@
+from wordpress_pet_sync import stream
+
+
+def make_record(event_name, id):
+    return {
+        "eventSource": "aws:dynamodb",
+        "eventName": event_name,
+        "dynamodb": {"Keys": {"id": {"S": id}}},
+    }
+
+
+def test_is_stream_event():
+    assert stream.is_stream_event({"Records": [make_record("INSERT", "A")]})
+    assert not stream.is_stream_event({"source": "aws.events"})
+    assert not stream.is_stream_event({"Records": [{"eventSource": "aws:s3"}]})
+
+
+def test_changed_ids_dedupes_in_order():
+    records = [make_record("MODIFY", "B"), make_record("INSERT", "A"), make_record("REMOVE", "B")]
+
+    assert stream.changed_ids(records) == ["B", "A"]
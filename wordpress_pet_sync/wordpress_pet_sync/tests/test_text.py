@@ -0,0 +1,23 @@
+from wordpress_pet_sync import text
+
+
+def test_wordpress_content():
+    content = "<p>She’s &amp; “sweet” – really</p>\n<p>Adopt her</p>\n"
+
+    assert text.WORDPRESS_CONTENT(content) == 'She\'s & "sweet" - really\\n\\nAdopt her\n'
+
+
+def test_wordpress_compare_ignores_formatting():
+    rendered = "<p>She’s a good dog &amp; loves walks.</p>\n<p>Adopt her!</p>\n"
+    written = "She's a good dog & loves walks.\\n\\nAdopt her!<br />"
+
+    assert text.WORDPRESS_COMPARE(rendered) == text.WORDPRESS_COMPARE(written) == "ShesagooddogloveswalksAdopther"
+
+
+def test_profiles_are_memoized():
+    text.WORDPRESS_COMPARE.normalize.cache_clear()
+
+    text.WORDPRESS_COMPARE("<p>Fido</p>")
+    text.WORDPRESS_COMPARE("<p>Fido</p>")
+
+    assert text.WORDPRESS_COMPARE.normalize.cache_info().hits == 1
@@ -0,0 +1,6 @@
+from wordpress_pet_sync import tier
+
+
+def test_of_reads_the_scheduled_tier():
+    assert tier.of({"tier": tier.FAST}) == tier.FAST
+    assert tier.of({"Records": []}) is None
@@ -1,12 +1,26 @@
+from botocore.response import StreamingBody
 from botocore.stub import Stubber
+import io
 import json
+import pytest
 import requests_mock
+import time
 
-from wordpress_pet_sync import wordpress_pet_sync
+from wordpress_pet_sync import aws, checkpoint, deadline, diff, media, purge, scan, shadow, shard, wordpress_pet_sync
+from wordpress_pet_sync.records import PET_ATTRIBUTES, IndexEntry, Pet, WordpressPost
+from wordpress_pet_sync.writes import PendingWrite, WriteOutcome, WriteRequest
+
+
+@pytest.fixture
+def wordpress_credentials(monkeypatch):
+    # cached as if prefetched, so tests don't fetch them from secrets manager
+    monkeypatch.setitem(
+        aws._secrets, "wordpress_credentials", (float("inf"), json.dumps({"username": "abc", "password": "def"}))
+    )
 
 
 def test_get_token():
-    with Stubber(wordpress_pet_sync.secrets_client) as stub:
+    with Stubber(aws.client("secretsmanager")) as stub:
         expected_params = {
             "SecretId": "wordpress_credentials",
         }
@@ -38,37 +52,41 @@ def test_get_token():
             assert sync.token == "1234"
 
 
-def test_get_dynamodb_pets():
-    with Stubber(wordpress_pet_sync.dynamodb_client) as stub:
+def test_get_dynamodb_pets(monkeypatch, wordpress_credentials):
+    # one segment keeps the stubbed pages in order
+    monkeypatch.setattr(wordpress_pet_sync, "PETS_SCAN_SEGMENTS", 1)
+
+    with Stubber(aws.client("dynamodb")) as stub:
         first_scan_response = {
             "Items": [
                 {
+                    "id": {"S": "1"},
                     "source": {"S": "shelterluv"},
                     "name": {"S": "Socks"},
                 },
                 {
+                    "id": {"S": "2"},
                     "source": {"S": "airtable"},
                     "name": {"S": "Fido"},
                 },
             ],
-            "LastEvaluatedKey": {
-                "source": {"S": "airtable"},
-                "name": {"S": "Fido"},
-            },
+            "LastEvaluatedKey": {"id": {"S": "2"}},
         }
         first_expected_params = {
             "TableName": "Pets",
-            "IndexName": "SyncIndex",
+            **scan.projection(PET_ATTRIBUTES),
         }
         stub.add_response("scan", first_scan_response, first_expected_params)
 
         second_scan_response = {
             "Items": [
                 {
+                    "id": {"S": "3"},
                     "source": {"S": "airtable"},
                     "name": {"S": "Petey"},
                 },
                 {
+                    "id": {"S": "4"},
                     "source": {"S": "shelterluv"},
                     "name": {"S": "Joey"},
                 },
@@ -76,11 +94,8 @@ def test_get_dynamodb_pets():
         }
         second_expected_params = {
             "TableName": "Pets",
-            "IndexName": "SyncIndex",
-            "ExclusiveStartKey": {
-                "source": {"S": "airtable"},
-                "name": {"S": "Fido"},
-            },
+            **scan.projection(PET_ATTRIBUTES),
+            "ExclusiveStartKey": {"id": {"S": "2"}},
         }
 
         stub.add_response("scan", second_scan_response, second_expected_params)
@@ -90,72 +105,48 @@ def test_get_dynamodb_pets():
 
         stub.assert_no_pending_responses()
         assert sync.dynamodb_pets == [
-            {"source": "shelterluv", "name": "Socks"},
-            {"source": "airtable", "name": "Fido"},
-            {"source": "airtable", "name": "Petey"},
-            {"source": "shelterluv", "name": "Joey"},
+            Pet(id="1", name="Socks", source="shelterluv"),
+            Pet(id="2", name="Fido", source="airtable"),
+            Pet(id="3", name="Petey", source="airtable"),
+            Pet(id="4", name="Joey", source="shelterluv"),
         ]
 
 
-def test_get_wordpress_pets():
+def test_get_wordpress_pets(wordpress_credentials):
     with requests_mock.Mocker() as requests_mocker:
-        requests_mocker.get(
-            "https://dallaspetsalive.org/wp-json/wp/v2/pet?offset=0",
-            text=json.dumps([{"name": "Fido"}]),
-        )
-        requests_mocker.get(
-            "https://dallaspetsalive.org/wp-json/wp/v2/pet?offset=1",
-            text=json.dumps([]),
-        )
+        for page in range(1, 4):
+            requests_mocker.get(
+                "https://dallaspetsalive.org/wp-json/wp/v2/pet?page={}&per_page=100".format(page),
+                text=json.dumps([{"id": page, "title": {"rendered": "Fido"}, "acf": {"id": str(page)}}]),
+                headers={"X-WP-Total": "3", "X-WP-TotalPages": "3"},
+            )
 
         sync = wordpress_pet_sync.WordpressSync()
-        sync.token = "token"
         sync.get_wordpress_pets()
 
-        assert requests_mocker.call_count == 2
+        assert requests_mocker.call_count == 3
+        assert "_fields=id%2Ctitle%2Ccontent%2Cfeatured_media%2Cslug%2Clink%2Cacf" in requests_mocker.last_request.url
 
-        assert sync.wordpress_pets == [{"name": "Fido"}]
+        assert [post.id for post in sync.wordpress_pets] == [1, 2, 3]
+        assert sync.wordpress_pets[0] == WordpressPost(id=1, title="Fido", content="", acf={"id": "1"})
 
 
-def test_delete_pets():
+def test_delete_pets(wordpress_credentials):
     with requests_mock.Mocker() as requests_mocker:
         requests_mocker.delete(
             "https://dallaspetsalive.org/wp-json/wp/v2/pet/abc?force=true",
         )
 
         sync = wordpress_pet_sync.WordpressSync()
-        sync.token = "token"
-        sync.dynamodb_ids = ["Z", "Y", "X", "W"]
-        sync.wordpress_ids = ["Z", "Y", "A", "X"]
-        sync.wordpress_pets = [
-            {
-                "id": "1",
-                "metadata": {
-                    "id": "Z",
-                },
-            },
-            {
-                "id": "2",
-                "metadata": {
-                    "id": "Y",
-                },
-            },
-            {
-                "id": "abc",
-                "metadata": {
-                    "id": "A",
-                },
-            },
-            {
-                "id": "4",
-                "metadata": {
-                    "id": "X",
-                },
-            },
-        ]
+        sync.plan = diff.Plan(
+            deletes=[
+                diff.Delete(WordpressPost(id="abc", title="Fido", content="", acf={"id": "A"})),
+            ],
+        )
         sync.delete_pets()
 
         assert requests_mocker.call_count == 1
+        assert sync.deleted_pets == ["Fido"]
 
 
 def test_thing():
@@ -167,3 +158,544 @@ def test_thing():
     sync.create_pets()
 
     assert 0
+
+
+def test_wordpress_request_refreshes_credentials(monkeypatch):
+    monkeypatch.setitem(
+        aws._secrets, "wordpress_credentials", (float("inf"), json.dumps({"username": "abc", "password": "old"}))
+    )
+
+    with Stubber(aws.client("secretsmanager")) as stub:
+        stub.add_response(
+            "batch_get_secret_value",
+            {
+                "SecretValues": [
+                    {
+                        "Name": "wordpress_credentials",
+                        "SecretString": json.dumps({"username": "abc", "password": "new"}),
+                    }
+                ]
+            },
+            {"SecretIdList": ["wordpress_credentials"]},
+        )
+
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                "https://dallaspetsalive.org/wp-json/wp/v2/pet",
+                [{"status_code": 401}, {"status_code": 200, "text": "[]"}],
+            )
+
+            sync = wordpress_pet_sync.WordpressSync()
+            response = sync.wordpress_request("GET", "https://dallaspetsalive.org/wp-json/wp/v2/pet")
+
+            assert response.status_code == 200
+            assert requests_mocker.call_count == 2
+            assert requests_mocker.last_request.headers["Authorization"] == "Basic YWJjOm5ldw=="
+
+        stub.assert_no_pending_responses()
+
+
+def test_create_pets(wordpress_credentials):
+    with Stubber(aws.table("FeaturedPhotos").meta.client) as stub:
+        stub.add_response(
+            "batch_write_item",
+            {"UnprocessedItems": {}},
+            {
+                "RequestItems": {
+                    "FeaturedPhotos": [{"PutRequest": {"Item": {"id": "A", "photo": "https://a/cover.jpg"}}}]
+                }
+            },
+        )
+
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get("https://a/cover.jpg", content=b"jpg")
+            requests_mocker.post("https://dallaspetsalive.org/wp-json/wp/v2/media", status_code=201, json={"id": 9})
+            requests_mocker.post("https://dallaspetsalive.org/wp-json/wp/v2/pet", status_code=201, json={})
+
+            sync = wordpress_pet_sync.WordpressSync()
+            sync.plan = diff.Plan(
+                creates=[
+                    diff.Create(Pet(id="A", name="Fido", description="", coverPhoto="https://a/cover.jpg")),
+                    diff.Create(Pet(id="B", name="Rex", description="")),
+                ],
+            )
+            sync.create_pets()
+
+            assert sorted(sync.added_pets) == ["Fido", "Rex"]
+            created = [
+                request.json() for request in requests_mocker.request_history if request.path == "/wp-json/wp/v2/pet"
+            ]
+            assert sorted((pet["acf"]["id"], pet["featured_media"]) for pet in created) == [("A", 9), ("B", None)]
+
+        stub.assert_no_pending_responses()
+
+
+def test_failed_featured_photo_leaves_fingerprint_stale(monkeypatch, wordpress_credentials):
+    sync = wordpress_pet_sync.WordpressSync()
+    monkeypatch.setattr(sync.media, "get", lambda url: -1)
+
+    pet = Pet(id="A", name="Fido", description="", coverPhoto="https://a/cover.jpg")
+    post = WordpressPost.from_json({"id": 1, "title": {"rendered": "Rex"}, "featured_media": 5, "acf": {"id": "A"}})
+    update = diff.plan_update(pet, post, "https://a/old.jpg")
+
+    write = sync.update_write(update)
+
+    # the next run sees a changed pet and retries the featured photo
+    assert write.request.body == {"title": "Fido"}
+    assert write.outcome.entry.fingerprint is None
+    assert write.outcome.featured_photo is None
+
+
+def test_purge_page_cache_collects_written_pages(monkeypatch, wordpress_credentials):
+    monkeypatch.setattr(wordpress_pet_sync, "LISTING_URLS", {"species": "https://dallaspetsalive.org/pet/?species={}"})
+    purged = []
+
+    class RecordingBackend(purge.PurgeBackend):
+        def purge(self, urls):
+            purged.append(urls)
+
+    sync = wordpress_pet_sync.WordpressSync(purge_backend=RecordingBackend())
+    post = WordpressPost(
+        id=1, title="Rex", content="", link="https://dallaspetsalive.org/pet/rex/", acf={"id": "B", "species": "Cat"}
+    )
+    create = sync.create_write(diff.Create(Pet(id="A", name="Fido", description="", species="Dog")))
+    # an update only purges the listings its pet is in, not the home page
+    stub = WordpressPost(id=3, title="Tom", content="", link="https://dallaspetsalive.org/pet/tom/", acf={"id": "C"})
+    update = sync.update_write(diff.Update(Pet(id="C", name="Tom", species="Cat"), stub, {"title": "Tom"}))
+
+    sync.record_outcomes(
+        [
+            sync.completed(create, {"id": 2, "link": "https://dallaspetsalive.org/pet/fido/"}),
+            sync.delete_write(post).outcome,
+            update.outcome,
+        ],
+        [],
+    )
+    sync.purge_page_cache()
+
+    assert purged == [
+        [
+            "https://dallaspetsalive.org/pet/fido/",
+            "https://dallaspetsalive.org/pet/rex/",
+            "https://dallaspetsalive.org/pet/tom/",
+            "https://dallaspetsalive.org/",
+            "https://dallaspetsalive.org/pet/",
+            "https://dallaspetsalive.org/pet/?species=dog",
+            "https://dallaspetsalive.org/pet/?species=cat",
+        ]
+    ]
+
+    sync.outcomes = [update.outcome]
+    purged.clear()
+    sync.purge_page_cache()
+
+    assert purged == [
+        [
+            "https://dallaspetsalive.org/pet/tom/",
+            "https://dallaspetsalive.org/pet/",
+            "https://dallaspetsalive.org/pet/?species=cat",
+        ]
+    ]
+
+
+def test_coordinate_fans_out_shards(monkeypatch, wordpress_credentials):
+    posts = [WordpressPost(id=1, title="", content="", acf={"id": "A"})]
+    sync = wordpress_pet_sync.WordpressSync()
+    monkeypatch.setattr(sync, "get_dynamodb_pet_ids", lambda: ["A", "B", "C"])
+    monkeypatch.setattr(sync, "list_wordpress_posts", lambda fields: posts)
+    received = []
+
+    def worker(event, _):
+        received.append(event)
+        added = sorted(set(event["pet_ids"]) - {"A"})
+        entries = [{"post_id": ord(pet_id), "pet_id": pet_id} for pet_id in event["pet_ids"]]
+        return {"added": added, "deleted": [], "entries": entries}
+
+    sync.coordinate(2, shard.LocalExecutor(worker))
+
+    assert sorted(event["shard"] for event in received) == [0, 1]
+    assert sorted(sync.added_pets) == ["B", "C"]
+    assert [event["post_ids"] for event in received if "A" in event["pet_ids"]] == [[1]]
+    # every shard reported, so their entries make a complete index
+    assert sorted(entry.pet_id for entry in sync.shadow_index.entries.values()) == ["A", "B", "C"]
+    assert not sync.shadow_index.needs_rebuild(time.time())
+
+    def failing_worker(event, _):
+        if "A" in event["pet_ids"]:
+            raise Exception("worker failed")
+        return worker(event, _)
+
+    sync.coordinate(2, shard.LocalExecutor(failing_worker))
+    assert sync.shadow_index.needs_rebuild(time.time())
+
+
+def test_shard_index_reflects_the_shards_writes(wordpress_credentials):
+    sync = wordpress_pet_sync.WordpressSync()
+    sync.wordpress_pets = [
+        WordpressPost(id=1, title="Fido", content="", acf={"id": "A"}),
+        WordpressPost(id=2, title="Rex", content="", acf={"id": "B"}),
+    ]
+    sync.outcomes = [
+        WriteOutcome("B", "Rex", ok=True, removed_post_id=2),
+        WriteOutcome("C", "Socks", ok=True, entry=IndexEntry(3, "C", "Socks")),
+    ]
+
+    assert sorted(sync.shard_index().entries) == [1, 3]
+
+
+def test_resume_skips_writes_an_earlier_attempt_finished(monkeypatch, tmp_path, wordpress_credentials):
+    store = checkpoint.LocalCheckpointStore(str(tmp_path))
+    monkeypatch.setattr(wordpress_pet_sync, "CHECKPOINT_STORE", store)
+    monkeypatch.setattr(shadow, "load", lambda client, bucket, key: shadow.ShadowIndex({2: IndexEntry(2, "Z")}))
+
+    ledger_rows = {"A": "pending", "B": "pending", "C": "created"}
+    monkeypatch.setattr(wordpress_pet_sync.ledger, "status", lambda client, pet_id: ledger_rows.get(pet_id))
+    reclaimed = []
+    monkeypatch.setattr(
+        wordpress_pet_sync.ledger, "claim", lambda client, pet_id, now: reclaimed.append(pet_id) or True
+    )
+
+    earlier = checkpoint.Checkpoint(store, "run")
+    earlier.plan = diff.Plan(
+        creates=[diff.Create(Pet(id=pet_id, name=pet_id, description="")) for pet_id in "ABCD"],
+        deletes=[diff.Delete(WordpressPost(id=2, title="Gone", content="", acf={"id": "Z"}))],
+    )
+    earlier.claimed = ["A", "B", "C", "D"]
+    # B was in flight when the attempt died, D failed and released its claim
+    earlier.sent = ["B", "D"]
+    earlier.outcomes = [
+        ("delete", WriteOutcome("Z", "Gone", ok=True, removed_post_id=2)),
+        ("create", WriteOutcome("D", "D", ok=False)),
+    ]
+    earlier.save()
+
+    sync = wordpress_pet_sync.WordpressSync()
+    assert sync.resume("run")
+
+    assert sync.plan.deletes == []
+    # A was never sent, B may have made its post, and C's post was made though the checkpoint missed it
+    assert [create.pet.id for create in sync.plan.creates] == ["A", "D"]
+    assert reclaimed == ["D"]
+    assert sync.claimed == {"A", "B", "C", "D"}
+    assert sync.deleted_pets == ["Gone"]
+    assert sync.shadow_index.entries == {}
+    # nothing to resume for a new run
+    assert not wordpress_pet_sync.WordpressSync().resume("another run")
+
+
+def test_load_intake_loads_only_added_and_removed_pets(monkeypatch, wordpress_credentials):
+    index = shadow.ShadowIndex({1: IndexEntry(1, "A"), 2: IndexEntry(2, "Z")}, synced_at=1000.0, rebuilt_at=1000.0)
+    monkeypatch.setattr(shadow, "load", lambda client, bucket, key: index)
+    monkeypatch.setattr(time, "time", lambda: 2000.0)
+    sync = wordpress_pet_sync.WordpressSync()
+    # another run just created B's post
+    listed = [WordpressPost(id=3, title="", content="", acf={"id": "B"})]
+    listings = []
+
+    def list_wordpress_posts(fields, **filters):
+        listings.append((fields, filters["modified_after"]))
+        return listed
+
+    monkeypatch.setattr(sync, "list_wordpress_posts", list_wordpress_posts)
+    monkeypatch.setattr(sync, "get_dynamodb_pet_ids", lambda: ["A", "B", "C"])
+    loaded = []
+    monkeypatch.setattr(sync, "load_pets", lambda pet_ids, post_ids: loaded.append((pet_ids, post_ids)))
+    saved = []
+    monkeypatch.setattr(sync, "save_shadow_index", lambda: saved.append(sync.shadow_index.intake_at))
+
+    assert sync.load_intake()
+
+    assert loaded == [(["C"], [2])]
+    # no post content, and only what changed since the last full sync
+    assert listings == [(wordpress_pet_sync.WORDPRESS_ENTRY_FIELDS, index.modified_after(1000.0))]
+    # the full sync still diffs the post it didn't write
+    assert index.synced_at == 1000.0
+    assert index.intake_at == 2000.0
+
+    # the next intake lists from where this one left off, and only saves when it finds something
+    monkeypatch.setattr(sync, "get_dynamodb_pet_ids", lambda: ["A", "B", "Z"])
+    assert not sync.load_intake()
+    assert listings[-1][1] == index.modified_after(2000.0)
+    assert saved == []
+
+    listed.append(WordpressPost(id=4, title="", content="", acf={"id": "A"}))
+    assert not sync.load_intake()
+    assert saved == [2000.0]
+
+
+def test_write_stage_stops_at_the_deadline(monkeypatch, wordpress_credentials):
+    monkeypatch.setattr(wordpress_pet_sync, "CHECKPOINT_EVERY", 2)
+    sync = wordpress_pet_sync.WordpressSync()
+    sync.deadline = deadline.Deadline(60)
+    written = []
+
+    def run_writes(build, items):
+        written.extend(items)
+        # the first chunk uses up the run's time
+        sync.deadline = deadline.Deadline(0)
+        return [WriteOutcome(item, item, ok=True) for item in items]
+
+    monkeypatch.setattr(sync, "run_writes", run_writes)
+
+    sync.write_stage("create", None, ["A", "B", "C", "D", "E"], sync.added_pets)
+
+    assert written == ["A", "B"]
+    assert sync.added_pets == ["A", "B"]
+
+    # updates are dropped first, without uploading their photos
+    sync.plan = diff.Plan(updates=[diff.Update(Pet(id="A", name="Fido", description=""), None, {}, "cover", True)])
+    monkeypatch.setattr(sync.media, "prefetch", lambda photo_urls: pytest.fail("prefetched a dropped update"))
+    sync.update_pets()
+    assert written == ["A", "B"]
+
+
+def test_upload_featured_photo_streams_body(wordpress_credentials):
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.get("https://a/cover.jpg", body=io.BytesIO(b"jpeg"), headers={"Content-Length": "4"})
+        requests_mocker.post("https://dallaspetsalive.org/wp-json/wp/v2/media", status_code=201, json={"id": 9})
+
+        sync = wordpress_pet_sync.WordpressSync()
+        assert sync.upload_featured_photo("https://a/cover.jpg") == 9
+
+        upload = requests_mocker.last_request
+        assert isinstance(upload.body, media.StreamedBody)
+        assert upload.headers["Content-Length"] == "4"
+        assert upload.headers["Content-Type"] == "image/jpeg"
+
+
+def test_batch_writes_fall_back_for_rejected_items(monkeypatch, wordpress_credentials):
+    monkeypatch.setattr(wordpress_pet_sync, "WORDPRESS_BATCH_WRITES", True)
+    # one worker sends the batches in order, so each gets the response meant for it
+    monkeypatch.setattr(wordpress_pet_sync, "WRITE_WORKERS", 1)
+
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.options(
+            "https://dallaspetsalive.org/wp-json/batch/v1",
+            json={"endpoints": [{"args": {"requests": {"maxItems": 2}}}]},
+        )
+        requests_mocker.post(
+            "https://dallaspetsalive.org/wp-json/batch/v1",
+            [
+                {"status_code": 207, "json": {"responses": [{"status": 200}, {"status": 500}]}},
+                {"status_code": 207, "json": {"responses": [{"status": 200}]}},
+            ],
+        )
+        requests_mocker.delete("https://dallaspetsalive.org/wp-json/wp/v2/pet/2?force=true")
+
+        sync = wordpress_pet_sync.WordpressSync()
+        sync.plan = diff.Plan(
+            deletes=[
+                diff.Delete(WordpressPost(id=post_id, title=name, content="", acf={"id": name}))
+                for post_id, name in [(1, "Fido"), (2, "Rex"), (3, "Socks")]
+            ],
+        )
+        sync.delete_pets()
+
+        batches = [request.json() for request in requests_mocker.request_history if request.method == "POST"]
+        assert [len(body["requests"]) for body in batches] == [2, 1]
+        assert sorted(sync.deleted_pets) == ["Fido", "Rex", "Socks"]
+        assert requests_mocker.last_request.path == "/wp-json/wp/v2/pet/2"
+
+
+def test_batch_with_unknown_outcome_resends_only_updates(monkeypatch, wordpress_credentials):
+    monkeypatch.setattr(wordpress_pet_sync, "WORDPRESS_BATCH_WRITES", True)
+
+    create = WriteOutcome("A", "Fido", ok=True, entry=IndexEntry(0, "A", "Fido", 0, "f"))
+    update = WriteOutcome("B", "Rex", ok=True, entry=IndexEntry(2, "B", "Rex", 0, "f"))
+    pending = [
+        PendingWrite(WriteRequest("POST", "/wp/v2/pet", {}, expected_status=201), create),
+        PendingWrite(WriteRequest("POST", "/wp/v2/pet/2", {}), update),
+    ]
+
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.options("https://dallaspetsalive.org/wp-json/batch/v1", json={})
+        requests_mocker.post("https://dallaspetsalive.org/wp-json/batch/v1", status_code=504)
+        requests_mocker.post("https://dallaspetsalive.org/wp-json/wp/v2/pet/2", json={})
+
+        sync = wordpress_pet_sync.WordpressSync()
+        outcomes = sync.send_batched(pending)
+
+        # the gateway timed out, so the create may have gone through and isn't sent again
+        assert [outcome.pet_id for outcome in outcomes] == ["B"]
+        posts = [request.path for request in requests_mocker.request_history if request.method == "POST"]
+        assert posts == ["/wp-json/batch/v1", "/wp-json/wp/v2/pet/2"]
+
+
+class LocalDynamoDB:
+    # a stand-in for the dynamodb client that serves batch gets from in-memory tables
+    def __init__(self, tables):
+        self.tables = tables
+
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self.tables.get(table_name, {})
+            responses[table_name] = [table[key["id"]["S"]] for key in request["Keys"] if key["id"]["S"] in table]
+        return {"Responses": responses}
+
+
+def test_handler_applies_stream_records(monkeypatch, wordpress_credentials):
+    monkeypatch.setitem(aws._secrets, "slack_alerts_webhook", (float("inf"), json.dumps({"url": "https://slack/hook"})))
+    # without a saved index the posts are found in a listing
+    monkeypatch.setattr(shadow, "load", lambda client, bucket, key: shadow.ShadowIndex())
+    monkeypatch.setitem(
+        aws._clients,
+        "dynamodb",
+        LocalDynamoDB({"Pets": {"A": {"id": {"S": "A"}, "name": {"S": "Renamed"}}}, "FeaturedPhotos": {}}),
+    )
+
+    event = {
+        "Records": [
+            {"eventSource": "aws:dynamodb", "eventName": "MODIFY", "dynamodb": {"Keys": {"id": {"S": "A"}}}},
+            {"eventSource": "aws:dynamodb", "eventName": "REMOVE", "dynamodb": {"Keys": {"id": {"S": "B"}}}},
+        ]
+    }
+
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.get(
+            "https://dallaspetsalive.org/wp-json/wp/v2/pet?_fields=id%2Cacf.id",
+            json=[{"id": 1, "acf": {"id": "A"}}, {"id": 2, "acf": {"id": "B"}}, {"id": 3, "acf": {"id": "C"}}],
+        )
+        requests_mocker.get(
+            "https://dallaspetsalive.org/wp-json/wp/v2/pet?include=1%2C2",
+            json=[
+                {"id": 1, "title": {"rendered": "Fido"}, "content": {"rendered": ""}, "acf": {"id": "A"}},
+                {"id": 2, "title": {"rendered": "Rex"}, "content": {"rendered": ""}, "acf": {"id": "B"}},
+            ],
+        )
+        requests_mocker.post("https://dallaspetsalive.org/wp-json/wp/v2/pet/1", json={})
+        requests_mocker.delete("https://dallaspetsalive.org/wp-json/wp/v2/pet/2?force=true", json={})
+        requests_mocker.post("https://slack/hook")
+
+        wordpress_pet_sync.handler(event, None)
+
+        writes = [(request.method, request.path) for request in requests_mocker.request_history[2:]]
+        assert writes == [
+            ("DELETE", "/wp-json/wp/v2/pet/2"),
+            ("POST", "/wp-json/wp/v2/pet/1"),
+            ("POST", "/hook"),
+        ]
+        assert requests_mocker.request_history[3].json()["title"] == "Renamed"
+
+
+def test_load_changed_pets_finds_posts_in_the_shadow_index(monkeypatch, wordpress_credentials):
+    index = shadow.ShadowIndex({1: IndexEntry(1, "A"), 2: IndexEntry(2, "B")}, synced_at=1000.0, rebuilt_at=1000.0)
+    monkeypatch.setattr(shadow, "load", lambda client, bucket, key: index)
+    sync = wordpress_pet_sync.WordpressSync()
+    listings = []
+
+    def list_wordpress_posts(fields, **filters):
+        listings.append(filters)
+        # a post written after the index was saved
+        return [WordpressPost(id=3, title="", content="", acf={"id": "C"})]
+
+    monkeypatch.setattr(sync, "list_wordpress_posts", list_wordpress_posts)
+    loaded = []
+    monkeypatch.setattr(sync, "load_pets", lambda pet_ids, post_ids: loaded.append((pet_ids, post_ids)))
+
+    sync.load_changed_pets(["B"])
+    assert loaded == [(["B"], [2])]
+    assert listings == []
+
+    # only a pet the index doesn't know lists the posts written since it was saved
+    sync.load_changed_pets(["A", "C"])
+    assert loaded[-1] == (["A", "C"], [1, 3])
+    assert listings == [{"modified_after": index.intake_after()}]
+
+
+def test_load_wordpress_pets_from_shadow_index(wordpress_credentials):
+    unchanged = Pet(id="A", name="Fido")
+    changed = Pet(id="B", name="Rex")
+    index = shadow.ShadowIndex(synced_at=time.time() - 3600, rebuilt_at=time.time() - 3600)
+    index.entries = {
+        1: IndexEntry(1, "A", "Fido", 0, unchanged.fingerprint()),
+        2: IndexEntry(2, "B", "Rex", 0, "stale"),
+        3: IndexEntry(3, "Z", "Gone", 0, "old"),
+    }
+    body = json.dumps(index.to_json()).encode()
+
+    with Stubber(aws.client("s3")) as stub:
+        stub.add_response(
+            "get_object",
+            {"Body": StreamingBody(io.BytesIO(body), len(body))},
+            {"Bucket": "dpa-wordpress-pet-sync", "Key": "shadow_index.json"},
+        )
+
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                "https://dallaspetsalive.org/wp-json/wp/v2/pet?modified_after={}".format(index.modified_after()),
+                json=[{"id": 4, "title": {"rendered": "Socks"}, "acf": {"id": "C"}}],
+            )
+            requests_mocker.get(
+                "https://dallaspetsalive.org/wp-json/wp/v2/pet?include=2",
+                json=[{"id": 2, "title": {"rendered": "Rex"}, "content": {"rendered": "old"}, "acf": {"id": "B"}}],
+            )
+
+            sync = wordpress_pet_sync.WordpressSync()
+            sync.dynamodb_pets = [unchanged, changed]
+            sync.load_wordpress_pets()
+
+            assert requests_mocker.call_count == 2
+
+        stub.assert_no_pending_responses()
+
+    assert [(post.id, post.pet_id, post.content) for post in sync.wordpress_pets] == [
+        (1, "A", ""),
+        (2, "B", "old"),
+        (3, "Z", ""),
+        (4, "C", ""),
+    ]
+    assert sorted(sync.shadow_index.entries) == [1, 2, 3, 4]
+
+
+def test_claimed_creates_settle_in_the_ledger(monkeypatch, wordpress_credentials):
+    monkeypatch.setattr(time, "time", lambda: 1000)
+    # one writer keeps the two create responses in order
+    monkeypatch.setattr(wordpress_pet_sync, "WRITE_WORKERS", 1)
+
+    with Stubber(aws.client("dynamodb")) as stub:
+        for id in ["A", "B"]:
+            stub.add_response("put_item", {}, ledger_claim(id))
+        stub.add_client_error("put_item", "ConditionalCheckFailedException", expected_params=ledger_claim("C"))
+        stub.add_response(
+            "update_item",
+            {},
+            {
+                "TableName": "WordpressCreates",
+                "Key": {"id": {"S": "A"}},
+                "UpdateExpression": "SET #status = :created, post_id = :post_id",
+                "ExpressionAttributeNames": {"#status": "status"},
+                "ExpressionAttributeValues": {":created": {"S": "created"}, ":post_id": {"N": "7"}},
+            },
+        )
+        stub.add_response("delete_item", {}, {"TableName": "WordpressCreates", "Key": {"id": {"S": "B"}}})
+
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.post(
+                "https://dallaspetsalive.org/wp-json/wp/v2/pet",
+                [{"status_code": 201, "json": {"id": 7}}, {"status_code": 500, "text": "error"}],
+            )
+
+            sync = wordpress_pet_sync.WordpressSync()
+            sync.plan = diff.Plan(creates=[diff.Create(Pet(id=id, name=id)) for id in ["A", "B", "C"]])
+            sync.claim_creates()
+            assert [create.pet.id for create in sync.plan.creates] == ["A", "B"]
+
+            outcomes = sync.run_writes(sync.create_write, sync.plan.creates)
+            sync.settle_claims(outcomes)
+
+        stub.assert_no_pending_responses()
+
+
+def ledger_claim(id):
+    return {
+        "TableName": "WordpressCreates",
+        "Item": {
+            "id": {"S": id},
+            "status": {"S": "pending"},
+            "claimed_at": {"N": "1000"},
+            "expires_at": {"N": str(1000 + 24 * 60 * 60)},
+        },
+        "ConditionExpression": "attribute_not_exists(id) OR claimed_at < :stale",
+        "ExpressionAttributeValues": {":stale": {"N": str(1000 - 15 * 60)}},
+    }
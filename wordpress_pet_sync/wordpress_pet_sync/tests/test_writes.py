@@ -0,0 +1,38 @@
+import threading
+import time
+
+from wordpress_pet_sync import writes
+
+
+def test_execute_keeps_order_and_skips_failures():
+    def write(item):
+        if item == 2:
+            raise Exception("boom")
+        return writes.WriteOutcome(item, "pet {}".format(item), ok=item != 3)
+
+    outcomes = writes.execute(write, [1, 2, 3, 4], max_workers=4)
+
+    assert [(outcome.pet_id, outcome.ok) for outcome in outcomes] == [(1, True), (3, False), (4, True)]
+
+
+def test_execute_bounds_concurrency():
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def write(item):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return writes.WriteOutcome(item, "", ok=True)
+
+    assert len(writes.execute(write, range(12), max_workers=3)) == 12
+    assert peak <= 3
+
+
+def test_execute_nothing():
+    assert writes.execute(lambda item: None, [], max_workers=4) == []
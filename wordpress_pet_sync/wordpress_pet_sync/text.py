@@ -0,0 +1,68 @@
+import html
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+
+# descriptions rarely change between warm invocations, so keep their normalized forms around
+CACHE_SIZE = 2048
+
+
+class Profile:
+    """
+    A named text normalization.
+
+    Replacements run in order as str.replace calls, then any run matching drop is
+    removed in one regex pass. Results are memoized per input, so a description
+    that hasn't changed since the last run costs a dict lookup.
+    """
+
+    def __init__(self, name: str, replacements: Dict[str, str], drop: Optional[str] = None, unescape: bool = False):
+        self.name = name
+        self.unescape = unescape
+        self.replacements = tuple(replacements.items())
+        self.drop = re.compile(drop) if drop is not None else None
+        self.normalize = lru_cache(maxsize=CACHE_SIZE)(self._normalize)
+
+    def _normalize(self, text: str) -> str:
+        if self.unescape:
+            text = html.unescape(text)
+        for old, new in self.replacements:
+            text = text.replace(old, new)
+        if self.drop is not None:
+            text = self.drop.sub("", text)
+        return text
+
+    def __call__(self, text: str) -> str:
+        return self.normalize(text)
+
+
+# wordpress post html back to the plain text the pet was written from
+WORDPRESS_CONTENT = Profile(
+    "wordpress_content",
+    {
+        "”": '"',
+        "“": '"',
+        "’": "'",
+        "</p>\n<p>": "\\n\\n",
+        "<p>": "",
+        "</p>": "",
+        "– ": "- ",
+    },
+    unescape=True,
+)
+
+# only the word characters, so descriptions compare equal however wordpress formatted them.
+# quotes, dashes and paragraph breaks would all be dropped anyway, so only the markup
+# that leaves letters behind (the p of <p>, the n of a literal \n) needs replacing first
+WORDPRESS_COMPARE = Profile(
+    "wordpress_compare",
+    {
+        "<p>": "",
+        "</p>": "",
+        "\\n": "",
+        "\\r": "",
+        "<br": "",
+    },
+    drop=r"\W+",
+    unescape=True,
+)
@@ -0,0 +1,16 @@
+from typing import Any, Dict, Optional
+
+# scheduled runs say which tier they are in their event input. the fast tier runs
+# every few minutes and only adds and removes pets, the full tier reconciles everything
+FAST = "fast"
+FULL = "full"
+
+# how long each tier keeps starting writes, anything left over goes to the next run.
+# a fast run finishes well before the next one starts, a full run is also bound by
+# the time lambda has left
+BUDGET_SECONDS = {FAST: 120, FULL: 480}
+
+
+def of(event: Dict[str, Any]) -> Optional[str]:
+    # stream and shard events aren't scheduled and carry no tier
+    return event.get("tier")
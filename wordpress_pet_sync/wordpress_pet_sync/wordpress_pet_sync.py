@@ -1,60 +1,202 @@
 import base64
-import boto3
 import botocore
-import html
-import json
 import logging
 import mimetypes
-import re
-from typing import Any, Dict, List
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import requests
-from cerealbox.dynamo import from_dynamodb_json
+
+from . import (
+    aws,
+    batch,
+    checkpoint,
+    deadline,
+    decoder,
+    diff,
+    dynamodb,
+    featured,
+    feed,
+    ledger,
+    media,
+    purge,
+    scan,
+    shadow,
+    shard,
+    stream,
+    tier,
+    writes,
+)
+from .records import PET_ATTRIBUTES, PET_SPEC, IndexEntry, Pet, WordpressPost
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
 logging.getLogger("botocore").setLevel(logging.INFO)
 
-secrets_client = boto3.client("secretsmanager")
-dynamodb_client = boto3.client("dynamodb")
-dynamodb_resource = boto3.resource("dynamodb")
-photos_table = dynamodb_resource.Table("FeaturedPhotos")
-
-
-def handler(event: Dict[str, Any], _: Any) -> None:
+WORDPRESS_CREDENTIALS_SECRET = "wordpress_credentials"
+SLACK_WEBHOOK_SECRET = "slack_alerts_webhook"
+# {"url": ..., "headers": {...}} for the page cache's purge endpoint
+PAGE_CACHE_PURGE_SECRET = "page_cache_purge"
+
+# the largest page the wordpress rest api will return
+WORDPRESS_PAGE_SIZE = 100
+# only fetch the post fields the sync compares
+WORDPRESS_FIELDS = ["id", "title", "content", "featured_media", "slug", "link", "acf"]
+# just enough of each post to find the ones for a given pet
+WORDPRESS_INDEX_FIELDS = ["id", "acf.id"]
+# what the shadow index keeps about a post, everything but the content
+WORDPRESS_ENTRY_FIELDS = ["id", "title", "featured_media", "link", "acf.id", "acf." + diff.FINGERPRINT_FIELD]
+# what a run keeps back once its writes stop, to save the shadow index, purge pages and report
+FINISH_RESERVE_SECONDS = 30
+# raw dynamodb items straight to records, reading only the attributes the sync uses
+decode_pet = decoder.compile_decoder(PET_SPEC, Pet)
+# where full syncs keep the shadow index of wordpress posts between runs
+STATE_BUCKET = "dpa-wordpress-pet-sync"
+SHADOW_INDEX_KEY = "shadow_index.json"
+# public bucket the adoptable pets feed is published to after full syncs
+FEED_BUCKET = "dpa-pet-feed"
+# compare against the raw post content instead of the rendered html
+WORDPRESS_RAW_CONTENT = False
+LISTING_WORKERS = 8
+# parallel scan segments for the Pets table
+PETS_SCAN_SEGMENTS = 4
+# how many pets are written to wordpress at once
+WRITE_WORKERS = 8
+# how many cover photos are uploaded at once
+MEDIA_WORKERS = 4
+WORDPRESS_API = "https://dallaspetsalive.org/wp-json"
+# group creates, updates and deletes into /batch/v1 requests instead of one request per pet
+WORDPRESS_BATCH_WRITES = False
+# purge the pages the run changed from the site's page cache
+PURGE_PAGE_CACHE = False
+# the home page shows the newest pets, so it is purged when a run creates or deletes one
+HOME_URL = "https://dallaspetsalive.org/"
+# the pet archive lists every pet and is purged whenever a run changes any
+PET_ARCHIVE_URL = "https://dallaspetsalive.org/pet/"
+# the listings of one species or pet-attributes term, purged only for the values written pets had or have
+LISTING_URLS = {
+    "species": "https://dallaspetsalive.org/pet/?species={}",
+    "age": "https://dallaspetsalive.org/pet-attributes/{}/",
+    "sex": "https://dallaspetsalive.org/pet-attributes/{}/",
+    "size": "https://dallaspetsalive.org/pet-attributes/{}/",
+}
+# full syncs save their progress here, so a retried run only does the writes that are left
+CHECKPOINT_STORE = checkpoint.S3CheckpointStore(STATE_BUCKET)
+# how many writes go out between checkpoints
+CHECKPOINT_EVERY = 50
+
+
+def handler(event: Dict[str, Any], context: Any) -> Optional[Dict[str, List[str]]]:
     logging.info("sync received event: {}".format(event))
 
+    # one batched secrets manager call on a cold start, none when warm
+    aws.prefetch_secrets(
+        [WORDPRESS_CREDENTIALS_SECRET, SLACK_WEBHOOK_SECRET] + ([PAGE_CACHE_PURGE_SECRET] if PURGE_PAGE_CACHE else [])
+    )
+
     wordpress_sync = WordpressSync()
 
-    wordpress_sync.get_dynamodb_pets()
-    wordpress_sync.get_dynamodb_featured_photos()
-    wordpress_sync.get_wordpress_pets()
+    wordpress_sync.tier = tier.of(event)
+    wordpress_sync.deadline = deadline.Deadline.from_context(
+        context, tier.BUDGET_SECONDS.get(wordpress_sync.tier), reserve=FINISH_RESERVE_SECONDS
+    )
+
+    if shard.is_coordinator_event(event):
+        # each shard is reconciled by this same function, invoked as a worker
+        function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "wordpress_pet_sync")
+        wordpress_sync.coordinate(int(event["shards"]), shard.LambdaExecutor(function_name, wordpress_sync.deadline))
+        wordpress_sync.save_shadow_index()
+        wordpress_sync.post_to_slack()
+        return None
+
+    resumed = False
+    if stream.is_stream_event(event):
+        # only the pets in the stream batch, the scheduled full sync remains the safety net
+        wordpress_sync.load_changed_pets(stream.changed_ids(event["Records"]))
+    elif shard.is_shard_event(event):
+        wordpress_sync.load_pets(event["pet_ids"], event["post_ids"])
+    elif wordpress_sync.tier == tier.FAST:
+        if not wordpress_sync.load_intake():
+            return None
+    else:
+        resumed = wordpress_sync.resume(checkpoint.run_id(event, context))
+        if not resumed:
+            wordpress_sync.get_dynamodb_pets()
+            wordpress_sync.load_wordpress_pets()
+    if not resumed:
+        wordpress_sync.plan_changes()
+        wordpress_sync.claim_creates()
+        wordpress_sync.save_checkpoint()
+    wordpress_sync.prefetch_media()
     wordpress_sync.delete_pets()
     wordpress_sync.create_pets()
     wordpress_sync.update_pets()
+    wordpress_sync.purge_page_cache()
+    wordpress_sync.save_shadow_index()
+    wordpress_sync.clear_checkpoint()
+    wordpress_sync.publish_feed()
+    wordpress_sync.media.close()
+
+    if shard.is_shard_event(event):
+        # the coordinator reports every shard in one message and saves one shadow index for all of them
+        return {
+            "added": wordpress_sync.added_pets,
+            "deleted": wordpress_sync.deleted_pets,
+            "entries": [asdict(entry) for entry in wordpress_sync.shard_index().entries.values()],
+        }
+
     wordpress_sync.post_to_slack()
+    return None
 
 
 class WordpressSync:
-    dynamodb_pets: List[Dict[str, any]]
-    wordpress_pets: List[Dict[str, any]]
-    dynamodb_ids: List[str]
-    wordpress_ids: List[str]
-    featured_photos: Dict[str, str]
-    duplicate_wordpress_pets: List[Dict[str, any]]
+    dynamodb_pets: List[Pet]
+    wordpress_pets: List[WordpressPost]
+    featured_photos: featured.FeaturedPhotos
+    plan: diff.Plan
 
     deleted_pets: List[str]
     added_pets: List[str]
 
     wordpress_header: Dict[str, str]
-
-    def __init__(self):
+    batch_size: Optional[int]
+    # only loaded by full syncs, stream runs leave it to the next full sync
+    shadow_index: Optional[shadow.ShadowIndex]
+    # pets this run holds a creation claim for in the ledger
+    claimed: Set[str]
+    # every write this run made, for purging the pages they changed
+    outcomes: List[writes.WriteOutcome]
+    purge_backend: purge.PurgeBackend
+    # only full syncs checkpoint, stream and shard runs are small enough to redo
+    checkpoint: Optional[checkpoint.Checkpoint]
+    # the schedule tier, unscheduled runs have none
+    tier: Optional[str]
+    # when the run stops starting writes, only set inside lambda
+    deadline: Optional[deadline.Deadline]
+
+    def __init__(self, purge_backend: Optional[purge.PurgeBackend] = None):
+        self.dynamodb_pets = []
         self.deleted_pets = []
         self.added_pets = []
-        self.featured_photos = {}
-        self.duplicate_wordpress_pets = []
-
-        credentials = json.loads(secrets_client.get_secret_value(SecretId="wordpress_credentials")["SecretString"])
+        self.checkpoint = None
+        self.tier = None
+        self.deadline = None
+        self.outcomes = []
+        self.purge_backend = purge_backend or self.load_purge_backend()
+        self.featured_photos = featured.FeaturedPhotos()
+        self.batch_size = None
+        self.shadow_index = None
+        self.claimed = set()
+        self.media = media.MediaPipeline(self.upload_featured_photo, MEDIA_WORKERS)
+
+        self.load_wordpress_header()
+
+    def load_wordpress_header(self) -> None:
+        credentials = aws.get_secret_json(WORDPRESS_CREDENTIALS_SECRET)
         username = credentials["username"]
         password = credentials["password"]
 
@@ -62,37 +204,42 @@ class WordpressSync:
         token = base64.b64encode(wordpress_credentials.encode())
         self.wordpress_header = {"Authorization": "Basic " + token.decode("utf-8")}
 
-    def get_dynamodb_pets(self) -> None:
-        pets = []
-        self.dynamodb_ids = []
+    @staticmethod
+    def load_purge_backend() -> purge.PurgeBackend:
+        if not PURGE_PAGE_CACHE:
+            return purge.PurgeBackend()
+        return purge.HttpPurgeBackend(**aws.get_secret_json(PAGE_CACHE_PURGE_SECRET))
 
-        try:
-            response = dynamodb_client.scan(
-                TableName="Pets",
-            )
+    def call_timeout(self) -> float:
+        return self.deadline.timeout() if self.deadline is not None else deadline.MAX_CALL_SECONDS
 
-            if "Items" not in response:
-                logger.error("No pets found")
-                return None
+    def wordpress_request(self, method: str, url: str, headers: Dict[str, str] = None, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.call_timeout())
+        response = requests.request(method, url, headers={**(headers or {}), **self.wordpress_header}, **kwargs)
 
-            pets = response["Items"]
+        if response.status_code == 401:
+            # the password may have been rotated since we cached it
+            logger.warning("wordpress rejected credentials, refreshing")
+            aws.invalidate_secret(WORDPRESS_CREDENTIALS_SECRET)
+            self.load_wordpress_header()
 
-            while lastKey := response.get("LastEvaluatedKey"):
-                response = dynamodb_client.scan(
-                    TableName="Pets",
-                    ExclusiveStartKey=lastKey,
-                )
-                pets.extend(response["Items"])
+            # a streamed body has already been sent, so only buffered requests can be replayed
+            if isinstance(kwargs.get("data"), (bytes, str, dict, type(None))):
+                response = requests.request(method, url, headers={**(headers or {}), **self.wordpress_header}, **kwargs)
+
+        return response
+
+    def get_dynamodb_pets(self) -> None:
+        try:
+            # only read the attributes the sync compares
+            items = scan.parallel_scan(
+                aws.client("dynamodb"), "Pets", PETS_SCAN_SEGMENTS, **scan.projection(PET_ATTRIBUTES)
+            )
+            formatted_pets = [decode_pet(item) for item in items]
         except botocore.exceptions.ClientError:
             logger.exception("client error")
             raise
 
-        formatted_pets = []
-        for pet in pets:
-            pet_formatted = from_dynamodb_json(pet)
-            formatted_pets.append(pet_formatted)
-            self.dynamodb_ids.append(pet_formatted["id"])
-
         if not formatted_pets:
             raise Exception("No pets found")
 
@@ -100,348 +247,699 @@ class WordpressSync:
 
         self.dynamodb_pets = formatted_pets
 
-    def get_dynamodb_featured_photos(self) -> None:
-        photos = []
-        try:
-            response = dynamodb_client.scan(
-                TableName="FeaturedPhotos",
-            )
+    def resume(self, run_id: Optional[str]) -> bool:
+        if run_id is None:
+            return False
+
+        self.checkpoint = checkpoint.Checkpoint(CHECKPOINT_STORE, run_id)
+        if not self.checkpoint.load():
+            return False
+
+        # pick up the saved plan without the writes an earlier attempt finished or may have
+        self.plan = self.checkpoint.remaining()
+        self.claimed = set(self.checkpoint.claimed) - self.checkpoint.failed_creates()
+        self.reclaim_creates()
+        self.media.seed(self.checkpoint.media)
+
+        # the earlier attempt never saved the index, so replay its writes onto the last saved one
+        self.shadow_index = shadow.load(aws.client("s3"), STATE_BUCKET, SHADOW_INDEX_KEY)
+        for stage, outcome in self.checkpoint.outcomes:
+            self.shadow_index.apply(outcome)
+            self.outcomes.append(outcome)
+            if outcome.ok and stage == "delete":
+                self.deleted_pets.append(outcome.name)
+            elif outcome.ok and stage == "create":
+                self.added_pets.append(outcome.name)
+
+        return True
+
+    def save_checkpoint(self) -> None:
+        if self.checkpoint is None:
+            return
+        self.checkpoint.plan = self.plan
+        self.checkpoint.claimed = sorted(self.claimed)
+        self.checkpoint.save()
 
-            if "Items" not in response:
-                logger.error("No featured photos found")
-                return None
+    def clear_checkpoint(self) -> None:
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
 
-            photos = response["Items"]
+    def get_dynamodb_pet_ids(self) -> List[str]:
+        items = scan.parallel_scan(aws.client("dynamodb"), "Pets", PETS_SCAN_SEGMENTS, **scan.projection(["id"]))
+        ids = [item["id"]["S"] for item in items]
 
-            while lastKey := response.get("LastEvaluatedKey"):
-                response = dynamodb_client.scan(
-                    TableName="FeaturedPhotos",
-                    ExclusiveStartKey=lastKey,
-                )
-                photos.extend(response["Items"])
-        except botocore.exceptions.ClientError:
-            logger.exception("client error")
-            raise
+        if not ids:
+            raise Exception("No pets found")
 
-        for photo in photos:
-            photo_formatted = from_dynamodb_json(photo)
-            self.featured_photos[photo_formatted["id"]] = photo_formatted["photo"]
+        return ids
 
-    def get_wordpress_pets(self):
-        pets = []
-        self.wordpress_ids = []
-
-        offset = 0
-        while response := requests.get(
-            "https://dallaspetsalive.org/wp-json/wp/v2/pet?offset={}&order=asc".format(offset),
-            headers=self.wordpress_header,
-        ).json():
-            if "status" in response and response["status"] == "error":
-                raise Exception(
-                    "Error fetching pets from Wordpress: {}".format(response.get("error_description", "Unknown error"))
-                )
-            pets.extend(response)
-            offset += len(response)
+    def load_changed_pets(self, ids: List[str]) -> None:
+        # find the changed pets' posts in the saved index, then fetch just those in full
+        changed = set(ids)
+        index = shadow.load(aws.client("s3"), STATE_BUCKET, SHADOW_INDEX_KEY)
 
-        for pet in pets:
-            id = pet.get("acf", {}).get("id")
-            if id in self.wordpress_ids:
-                self.duplicate_wordpress_pets.append(pet)
-            self.wordpress_ids.append(id)
-
-        logger.info("got {} pets from wordpress".format(len(pets)))
+        if index.synced_at is None:
+            logger.info("no shadow index yet, listing every post")
+            posts = self.list_wordpress_posts(WORDPRESS_INDEX_FIELDS)
+            self.load_pets(ids, [post.id for post in posts if str(post.pet_id) in changed])
+            return
 
-        self.wordpress_pets = pets
+        # a pet the index doesn't know is new, or its post came after the index was saved,
+        # so only the posts written since then are listed
+        indexed = {str(entry.pet_id) for entry in index.entries.values()}
+        if not changed <= indexed:
+            index.track(self.list_wordpress_posts(WORDPRESS_ENTRY_FIELDS, modified_after=index.intake_after()))
 
-    def delete_pets(self):
-        # delete any wordpress pets that are no longer in dynamodb
-        deleted_pets = [pet for pet in self.wordpress_ids if pet not in self.dynamodb_ids]
+        post_ids = [entry.post_id for entry in index.entries.values() if str(entry.pet_id) in changed]
+        self.load_pets(ids, sorted(post_ids))
 
-        # delete any duplicate pets
-        for pet in self.duplicate_wordpress_pets:
-            logger.info("deleting duplicate pet {}".format(pet.get("slug")))
+    def load_pets(self, pet_ids: List[str], post_ids: List[int]) -> None:
+        # pets missing from the table were removed and their posts get planned as deletes
+        items = dynamodb.batch_get(aws.client("dynamodb"), "Pets", pet_ids, **scan.projection(PET_ATTRIBUTES))
+        self.dynamodb_pets = [decode_pet(item) for item in items]
+        self.wordpress_pets = self.get_wordpress_posts(post_ids)
 
-            response = requests.delete(
-                "https://dallaspetsalive.org/wp-json/wp/v2/pet/{}?force=true".format(pet["id"]),
-                headers=self.wordpress_header,
+        logger.info(
+            "{} pets to sync, {} in dynamodb and {} in wordpress".format(
+                len(pet_ids), len(self.dynamodb_pets), len(self.wordpress_pets)
             )
-            if response.status_code != 200:
-                logger.error("could not delete pet post {}: {}".format(pet["id"], response.text))
-                continue
-            self.deleted_pets.append(pet["title"]["rendered"])
+        )
 
-        if not deleted_pets:
-            logger.info("no pets to delete")
+    def load_intake(self) -> bool:
+        # the fast tier only adds pets missing from the index and removes posts whose pet
+        # left the table, edits wait for the next full sync
+        index = shadow.load(aws.client("s3"), STATE_BUCKET, SHADOW_INDEX_KEY)
+        if index.synced_at is None:
+            logger.info("no shadow index yet, leaving intake to the full sync")
+            return False
+
+        # posts other runs wrote since the last sync or intake saw them, so their pets aren't created again
+        started = time.time()
+        tracked = index.track(self.list_wordpress_posts(WORDPRESS_ENTRY_FIELDS, modified_after=index.intake_after()))
+        if tracked:
+            index.intake_at = started
+        self.shadow_index = index
+
+        pet_ids = set(self.get_dynamodb_pet_ids())
+        listed = {str(entry.pet_id) for entry in index.entries.values()}
+        new_ids = sorted(pet_ids - listed)
+        removed = sorted(entry.post_id for entry in index.entries.values() if str(entry.pet_id) not in pet_ids)
+
+        if not new_ids and not removed:
+            logger.info("no pets added or removed")
+            # keep what the listing found, so the next intake lists from here
+            if tracked:
+                self.save_shadow_index()
+            return False
+
+        self.load_pets(new_ids, removed)
+        return True
+
+    def coordinate(self, shards: int, executor: Any) -> None:
+        # split the pets and their posts by a hash of the pet id and reconcile each
+        # shard in its own worker, so a backfill isn't bound by one invocation's timeout
+        started = time.time()
+        events = shard.partition(self.get_dynamodb_pet_ids(), self.list_wordpress_posts(WORDPRESS_INDEX_FIELDS), shards)
+        logger.info("reconciling {} shards".format(shards))
+
+        results = executor.run(events)
+        merged = shard.merge(results)
+        self.added_pets = merged["added"]
+        self.deleted_pets = merged["deleted"]
+
+        # the shards together saw every post, so their entries are a fresh index. with a shard
+        # missing the index is incomplete, and the next full sync rebuilds it
+        complete = all(result is not None for result in results)
+        entries = [IndexEntry(**entry) for entry in merged["entries"]]
+        self.shadow_index = shadow.ShadowIndex(
+            {entry.post_id: entry for entry in entries}, started, started if complete else None
+        )
+
+    def shard_index(self) -> shadow.ShadowIndex:
+        # the shard's posts as they stand after its writes
+        index = shadow.ShadowIndex()
+        index.rebuild(self.wordpress_pets, time.time())
+        for outcome in self.outcomes:
+            index.apply(outcome)
+        return index
+
+    def load_wordpress_pets(self) -> None:
+        started = time.time()
+        index = self.shadow_index = shadow.load(aws.client("s3"), STATE_BUCKET, SHADOW_INDEX_KEY)
+
+        if index.needs_rebuild(started):
+            self.get_wordpress_pets()
+            index.rebuild(self.wordpress_pets, started)
             return
 
-        logger.info("deleting {} pets".format(len(deleted_pets)))
-        for pet in self.wordpress_pets:
-            if pet.get("acf", {}).get("id") in deleted_pets:
-                logger.debug("deleting {}".format(pet.get("acf", {}).get("id")))
+        # catch up on posts changed since the last sync, by us or by hand
+        changed = self.list_wordpress_posts(WORDPRESS_FIELDS, modified_after=index.modified_after())
+        index.merge(changed, started)
+        fetched = {post.id: post for post in changed}
+
+        # the detailed diff needs the full post, but only for pets that changed since it was written
+        fingerprints = {pet.id: pet.fingerprint() for pet in self.dynamodb_pets}
+        stale = [
+            entry.post_id
+            for entry in index.entries.values()
+            if entry.post_id not in fetched
+            and entry.pet_id in fingerprints
+            and entry.fingerprint != fingerprints[entry.pet_id]
+        ]
+        fetched.update((post.id, post) for post in self.get_wordpress_posts(stale))
+
+        for post_id in stale:
+            if post_id not in fetched:
+                # deleted in wordpress since the last rebuild, so the pet gets created again
+                index.remove(post_id)
+
+        self.wordpress_pets = index.posts(fetched)
+
+        logger.info(
+            "planning {} wordpress pets from the shadow index, {} listed as changed and {} fetched".format(
+                len(self.wordpress_pets), len(changed), len(stale)
+            )
+        )
 
-                response = requests.delete(
-                    "https://dallaspetsalive.org/wp-json/wp/v2/pet/{}?force=true".format(pet["id"]),
-                    headers=self.wordpress_header,
-                )
-                if response.status_code != 200:
-                    logger.error("could not delete pet post {}: {}".format(pet["id"], response.text))
-                    continue
-                self.deleted_pets.append(pet["title"]["rendered"])
+    def save_shadow_index(self) -> None:
+        if self.shadow_index is not None:
+            shadow.save(aws.client("s3"), STATE_BUCKET, SHADOW_INDEX_KEY, self.shadow_index)
 
-    def create_pets(self):
-        # create pets in wordpress that are in dynamodb but not wordpress
-        pets_to_add = [pet for pet in self.dynamodb_ids if pet not in self.wordpress_ids]
-
-        logger.info("creating {} pets".format(len(pets_to_add)))
-
-        with photos_table.batch_writer() as batch:
-            for pet in self.dynamodb_pets:
-                if pet["id"] in pets_to_add:
-                    logger.debug("creating {}".format(pet["id"]))
-
-                    # get the cover photo
-                    cover_photo_id = None
-                    if coverPhoto := pet.get("coverPhoto"):
-                        cover_photo_id = self.upload_featured_photo(coverPhoto)
-                        if cover_photo_id == -1:
-                            continue
-                        batch.put_item(
-                            Item={
-                                "id": pet["id"],
-                                "photo": coverPhoto,
-                            }
-                        )
+    def publish_feed(self) -> None:
+        # stream and fast runs only load the pets they change, so only full syncs have the
+        # whole catalog, and a resumed run skipped loading it
+        if self.shadow_index is None or self.tier == tier.FAST or not self.dynamodb_pets:
+            return
 
-                    attributes = []
+        try:
+            feed.publish(aws.client("s3"), FEED_BUCKET, self.dynamodb_pets)
+        except botocore.exceptions.ClientError:
+            # readers keep the previous feed, the next full sync publishes again
+            logger.exception("could not publish feed")
 
-                    age_attributes = {
-                        "Baby": 264,
-                        "Young": 267,
-                        "Adult": 260,
-                        "Senior": 261,
-                    }
+    def purge_page_cache(self) -> None:
+        urls = purge.affected_urls(self.outcomes)
+        if not urls:
+            return
 
-                    if pet.get("age") and pet.get("age") in age_attributes:
-                        attributes.append(age_attributes[pet.get("age")])
+        try:
+            self.purge_backend.purge(urls)
+        except requests.RequestException:
+            # stale pages still expire on their own, don't fail the sync over them
+            logger.exception("could not purge page cache")
 
-                    sex_attributes = {
-                        "Female": 262,
-                        "Male": 265,
-                    }
+    def get_wordpress_pets(self):
+        self.wordpress_pets = self.list_wordpress_posts(WORDPRESS_FIELDS)
 
-                    if pet.get("sex") and pet.get("sex") in sex_attributes:
-                        attributes.append(sex_attributes[pet.get("sex")])
+    def list_wordpress_posts(self, fields: List[str], **filters: Any) -> List[WordpressPost]:
+        # the first page tells us how many pages there are, fetch the rest concurrently
+        first_page, total, total_pages = self.get_wordpress_page(1, fields, **filters)
+        pets = first_page
 
-                    size_attributes = {
-                        "Small": 268,
-                        "Medium": 266,
-                        "Large": 263,
-                        "Extra-Large": 269,
-                    }
+        if total_pages > 1:
+            with ThreadPoolExecutor(max_workers=LISTING_WORKERS) as executor:
+                pages = executor.map(
+                    partial(self.get_wordpress_page, fields=fields, **filters), range(2, total_pages + 1)
+                )
+                for page, _, _ in pages:
+                    pets.extend(page)
+
+        if len(pets) != total:
+            # posts were added or removed while we were paging
+            logger.warning("wordpress reported {} pets but listed {}".format(total, len(pets)))
+
+        logger.info("got {} pets from wordpress in {} pages".format(len(pets), total_pages))
+
+        return pets
+
+    def get_wordpress_posts(self, post_ids: List[int]) -> List[WordpressPost]:
+        posts = []
+        for start in range(0, len(post_ids), WORDPRESS_PAGE_SIZE):
+            include = ",".join(str(post_id) for post_id in post_ids[start : start + WORDPRESS_PAGE_SIZE])
+            page, _, _ = self.get_wordpress_page(1, WORDPRESS_FIELDS, include=include)
+            posts.extend(page)
+        return posts
+
+    def get_wordpress_page(
+        self, page: int, fields: List[str] = WORDPRESS_FIELDS, **filters: Any
+    ) -> Tuple[List[WordpressPost], int, int]:
+        params = {
+            "page": page,
+            "per_page": WORDPRESS_PAGE_SIZE,
+            "orderby": "id",
+            "order": "asc",
+            "_fields": ",".join(fields),
+            **filters,
+        }
+        if WORDPRESS_RAW_CONTENT:
+            params["context"] = "edit"
 
-                    if pet.get("size") and pet.get("size") in size_attributes:
-                        attributes.append(size_attributes[pet.get("size")])
-
-                    pet_data = {
-                        "status": "publish",
-                        "title": pet["name"],
-                        "content": pet["description"],
-                        "featured_media": cover_photo_id,
-                        "acf": {
-                            "id": pet.get("id"),
-                            "age": pet.get("age"),
-                            "breed": pet.get("breed"),
-                            "color": pet.get("color"),
-                            "adoptLink": pet.get("adoptLink"),
-                            "internalId": pet.get("internalId"),
-                            "name": pet.get("name"),
-                            "sex": pet.get("sex"),
-                            "size": pet.get("size"),
-                            "species": pet.get("species"),
-                            "source": pet.get("source"),
-                            "status": pet.get("status"),
-                            "video": pet.get("video"),
-                        },
-                        "pet-attributes": attributes,
-                    }
+        response = self.wordpress_request(
+            "GET",
+            "https://dallaspetsalive.org/wp-json/wp/v2/pet",
+            params=params,
+        )
+        response_json = response.json()
 
-                    for photo_num, photo in enumerate(pet.get("photos", [])):
-                        pet_data["acf"]["photos_{}".format(photo_num)] = photo
+        if response.status_code != 200 or ("status" in response_json and response_json["status"] == "error"):
+            raise Exception(
+                "Error fetching pets from Wordpress: {}".format(
+                    response_json.get("error_description", response_json.get("message", "Unknown error"))
+                )
+            )
 
-                    response = requests.post(
-                        "https://dallaspetsalive.org/wp-json/wp/v2/pet",
-                        headers=self.wordpress_header,
-                        json=pet_data,
-                    )
+        return (
+            [WordpressPost.from_json(post) for post in response_json],
+            int(response.headers.get("X-WP-Total", len(response_json))),
+            int(response.headers.get("X-WP-TotalPages", 1)),
+        )
 
-                    if response.status_code != 201:
-                        logger.error("could not create pet {}: {}".format(pet_data, response.text))
-                        continue
-                    self.added_pets.append(pet["name"])
+    def plan_changes(self):
+        self.plan = diff.plan_changes(self.dynamodb_pets, self.wordpress_pets, self.featured_photos.lookup)
 
-    def update_pets(self):
-        pets_to_maybe_update = [pet for pet in self.wordpress_ids if pet in self.dynamodb_ids]
+    def delete_pets(self):
+        # delete any duplicate pets and any wordpress pets that are no longer in dynamodb
+        posts = [duplicate.post for duplicate in self.plan.duplicates] + [delete.post for delete in self.plan.deletes]
 
-        with photos_table.batch_writer() as batch:
-            for dynamodb_pet in self.dynamodb_pets:
-                if dynamodb_pet["id"] not in pets_to_maybe_update:
+        if not posts:
+            logger.info("no pets to delete")
+            return
+
+        logger.info("deleting {} pets and {} duplicates".format(len(self.plan.deletes), len(self.plan.duplicates)))
+        self.write_stage("delete", self.delete_write, posts, self.deleted_pets)
+
+    def delete_post(self, post: WordpressPost) -> writes.WriteOutcome:
+        return self.send_write(self.delete_write(post))
+
+    def delete_write(self, post: WordpressPost) -> writes.PendingWrite:
+        logger.debug("deleting {} ({})".format(post.pet_id, post.slug))
+
+        return writes.PendingWrite(
+            writes.WriteRequest("DELETE", "/wp/v2/pet/{}?force=true".format(post.id)),
+            writes.WriteOutcome(
+                post.pet_id,
+                post.title,
+                ok=True,
+                removed_post_id=post.id,
+                link=post.link or None,
+                listings=[HOME_URL] + self.listing_urls(post.acf),
+            ),
+        )
+
+    def claim_creates(self):
+        # claim each create before its photo is uploaded, so a retried or overlapping
+        # run skips pets another run is already creating instead of duplicating them
+        client = aws.client("dynamodb")
+        now = time.time()
+        creates = []
+
+        for create in self.plan.creates:
+            pet_id = str(create.pet.id)
+            if ledger.claim(client, pet_id, now):
+                self.claimed.add(pet_id)
+                creates.append(create)
+            else:
+                logger.info("another run is creating {}, skipping".format(pet_id))
+
+        self.plan.creates = creates
+
+    def reclaim_creates(self):
+        # the creates left after a resume were never sent. the earlier attempt still holds
+        # their claims unless a create failed and released it, then it is claimed again
+        client = aws.client("dynamodb")
+        now = time.time()
+        creates = []
+
+        for create in self.plan.creates:
+            pet_id = str(create.pet.id)
+            if pet_id in self.claimed:
+                # the checkpoint missed the outcome of a create that went through
+                if ledger.status(client, pet_id) == "created":
+                    logger.info("{} was already created, skipping".format(pet_id))
                     continue
+            elif ledger.claim(client, pet_id, now):
+                self.claimed.add(pet_id)
+            else:
+                logger.info("another run is creating {}, skipping".format(pet_id))
+                continue
+            creates.append(create)
 
-                new_pet_data = {}
+        self.plan.creates = creates
 
-                for wordpress_pet in self.wordpress_pets:
-                    if wordpress_pet.get("acf", {}).get("id") != dynamodb_pet["id"]:
-                        continue
+    def create_pets(self):
+        # create pets in wordpress that are in dynamodb but not wordpress
+        logger.info("creating {} pets".format(len(self.plan.creates)))
 
-                    wordpress_title = self.convert_wordpress_content(wordpress_pet.get("title", {}).get("rendered"))
+        self.write_stage("create", self.create_write, self.plan.creates, self.added_pets, settle_claims=True)
 
-                    if wordpress_title != dynamodb_pet["name"].strip():
-                        logger.debug("renaming from {}".format(wordpress_title))
-                        new_pet_data["title"] = dynamodb_pet["name"].strip()
+    def settle_claims(self, outcomes: List[writes.WriteOutcome]) -> None:
+        # a create that raised has no outcome and keeps its claim until the lease
+        # runs out, since the post may have been created before the error
+        client = aws.client("dynamodb")
+        for outcome in outcomes:
+            pet_id = str(outcome.pet_id)
+            if pet_id not in self.claimed:
+                continue
+            if outcome.ok:
+                ledger.complete(client, pet_id, outcome.entry.post_id if outcome.entry else None)
+            else:
+                ledger.release(client, pet_id)
+
+    def create_pet(self, create: diff.Create) -> writes.WriteOutcome:
+        return self.send_write(self.create_write(create))
+
+    def create_write(self, create: diff.Create) -> writes.PendingWrite:
+        pet = create.pet
+        logger.debug("creating {}".format(pet.id))
+
+        # the cover photo has to exist before the post that features it
+        cover_photo_id = None
+        if coverPhoto := pet.coverPhoto:
+            cover_photo_id = self.media.get(coverPhoto)
+            if cover_photo_id == -1:
+                return writes.PendingWrite(None, writes.WriteOutcome(pet.id, pet.name, ok=False))
+
+        pet_data = self.build_post(pet)
+        pet_data["featured_media"] = cover_photo_id
+
+        return writes.PendingWrite(
+            writes.WriteRequest("POST", "/wp/v2/pet", pet_data, expected_status=201),
+            writes.WriteOutcome(
+                pet.id,
+                pet.name,
+                ok=True,
+                featured_photo=coverPhoto,
+                # the post id comes back in the response
+                entry=IndexEntry(0, pet.id, pet.name, cover_photo_id or 0, pet_data["acf"][diff.FINGERPRINT_FIELD]),
+                listings=[HOME_URL] + self.listing_urls(asdict(pet)),
+            ),
+        )
 
-                    wordpress_description = self.strip_description(
-                        self.convert_wordpress_content(wordpress_pet.get("content", {}).get("rendered"))
-                    )
+    def write_stage(
+        self,
+        stage: str,
+        build: Callable[[Any], writes.PendingWrite],
+        items: List[Any],
+        names: List[str],
+        settle_claims: bool = False,
+    ) -> None:
+        # with a checkpoint, write in chunks and save after each, so a retry skips the chunks that finished.
+        # creates are marked sent before their chunk goes out, and a retry leaves any create that was in
+        # flight to its claim rather than risk a second post. with a deadline, chunks also let the run stop
+        # once its time is up
+        chunked = self.checkpoint is not None or self.deadline is not None
+        size = CHECKPOINT_EVERY if chunked else max(len(items), 1)
+        written = 0
+        for chunk in batch.chunked(items, size):
+            if self.deadline is not None and self.deadline.expired():
+                logger.warning("out of time, leaving {} {} writes to the next run".format(len(items) - written, stage))
+                return
+            written += len(chunk)
+            if settle_claims and self.checkpoint is not None:
+                self.checkpoint.sent.extend(str(create.pet.id) for create in chunk)
+                self.checkpoint.save()
+            outcomes = self.run_writes(build, chunk)
+            if settle_claims:
+                self.settle_claims(outcomes)
+            self.record_outcomes(outcomes, names, stage)
+
+    def run_writes(self, build: Callable[[Any], writes.PendingWrite], items: List[Any]) -> List[writes.WriteOutcome]:
+        if WORDPRESS_BATCH_WRITES:
+            return self.send_batched([build(item) for item in items])
+        return writes.execute(lambda item: self.send_write(build(item)), items, WRITE_WORKERS)
+
+    def send_write(self, write: writes.PendingWrite) -> writes.WriteOutcome:
+        if write.request is None:
+            return write.outcome
+
+        request = write.request
+        response = self.wordpress_request(request.method, WORDPRESS_API + request.path, json=request.body)
+
+        if response.status_code != request.expected_status:
+            logger.error("could not {} {}: {}".format(request.method, request.path, response.text))
+            return replace(write.outcome, ok=False)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return self.completed(write, body)
 
-                    if dynamodb_pet["description"] and wordpress_description != self.strip_description(
-                        dynamodb_pet["description"].strip()
-                    ):
-                        logger.debug(
-                            "updating description from {}".format(wordpress_pet.get("content", {}).get("rendered"))
-                        )
-                        new_pet_data["content"] = dynamodb_pet["description"].strip()
-
-                    last_index = 0
-                    for index, photo in enumerate(dynamodb_pet.get("photos", [])):
-                        last_index += 1
-                        if index > 19:
-                            break
-                        if f"photos_{index}" not in wordpress_pet.get("acf", {}):
-                            logger.debug("adding photo {}".format(photo))
-                            if "acf" not in new_pet_data:
-                                new_pet_data["acf"] = {}
-                            new_pet_data["acf"][f"photos_{index}"] = photo
-                        elif wordpress_pet.get("acf", {}).get(f"photos_{index}") != photo:
-                            logger.debug("updating photo {}".format(photo))
-                            if "acf" not in new_pet_data:
-                                new_pet_data["acf"] = {}
-                            new_pet_data["acf"][f"photos_{index}"] = photo
-
-                    current_featured_photo = self.featured_photos.get(dynamodb_pet["id"])
-                    incoming_current_photo = dynamodb_pet.get("coverPhoto")
-                    if current_featured_photo != incoming_current_photo:
-                        logger.debug("updating featured photo for id {}".format(dynamodb_pet["id"]))
-
-                        photo_id = self.upload_featured_photo(incoming_current_photo)
-                        if photo_id != -1:
-                            new_pet_data["featured_media"] = photo_id
-                            batch.put_item(
-                                Item={
-                                    "id": dynamodb_pet["id"],
-                                    "photo": incoming_current_photo,
-                                }
-                            )
-
-                    while wordpress_pet.get("acf", {}).get(f"photos_{last_index + 1}"):
-                        logger.debug(
-                            "removing photo {}".format(wordpress_pet.get("acf", {}).get(f"photos_{last_index + 1}"))
+    @staticmethod
+    def is_create(write: writes.PendingWrite) -> bool:
+        # a create's post has no id until wordpress answers
+        return write.outcome.entry is not None and not write.outcome.entry.post_id
+
+    @classmethod
+    def completed(cls, write: writes.PendingWrite, body: Any) -> writes.WriteOutcome:
+        outcome = write.outcome
+        # a create only learns its post id and url from the response
+        if cls.is_create(write) and isinstance(body, dict) and body.get("id"):
+            link = body.get("link") or ""
+            outcome = replace(outcome, entry=replace(outcome.entry, post_id=body["id"], link=link), link=link or None)
+        return outcome
+
+    def send_batched(self, pending: List[writes.PendingWrite]) -> List[writes.WriteOutcome]:
+        outcomes = [write.outcome for write in pending if write.request is None]
+        sendable = [write for write in pending if write.request is not None]
+        if not sendable:
+            return outcomes
+
+        chunks = list(batch.chunked(sendable, self.get_batch_size()))
+        rejected = []
+
+        with ThreadPoolExecutor(max_workers=min(WRITE_WORKERS, len(chunks))) as executor:
+            for chunk, items in zip(chunks, executor.map(self.post_batch, chunks)):
+                if items is None:
+                    # the batch may have been applied. updates and deletes are safe to send again,
+                    # a create sent again could duplicate its post, so it has no outcome and keeps
+                    # its claim for a later run to reconcile
+                    for write in chunk:
+                        if self.is_create(write):
+                            logger.warning("batch outcome unknown, leaving create of {}".format(write.outcome.pet_id))
+                        else:
+                            rejected.append(write)
+                    continue
+                for write, item in zip(chunk, items):
+                    if item is not None and item.get("status") == write.request.expected_status:
+                        outcomes.append(self.completed(write, item.get("body")))
+                    else:
+                        logger.warning(
+                            "batch rejected {} {}: {}".format(write.request.method, write.request.path, item)
                         )
-                        if "acf" not in new_pet_data:
-                            new_pet_data["acf"] = {}
-                        new_pet_data["acf"][f"photos_{last_index + 1}"] = ""
-                        last_index += 1
-
-                    if dynamodb_pet.get("coverPhoto") and not wordpress_pet.get("featured_media"):
-                        logger.debug("updating featured photo {}".format(dynamodb_pet.get("coverPhoto")))
-
-                        photo_id = self.upload_featured_photo(dynamodb_pet.get("coverPhoto"))
-                        if photo_id != -1:
-                            new_pet_data["featured_media"] = photo_id
-
-                    for attribute in wordpress_pet.get("acf", {}):
-                        if "photo" in attribute or attribute in [
-                            "description",
-                            "coverPhoto",
-                        ]:
-                            continue
-
-                        wordpress_attribute = wordpress_pet["acf"].get(attribute)
-                        dynamodb_attribute = dynamodb_pet.get(attribute)
-
-                        if not wordpress_attribute and not dynamodb_attribute:
-                            continue
-
-                        if wordpress_attribute != dynamodb_attribute:
-                            logger.debug(
-                                "updating attribute {} for {}".format(
-                                    attribute,
-                                    wordpress_pet.get("title", {}).get("rendered"),
-                                )
-                            )
-                            if "acf" not in new_pet_data:
-                                new_pet_data["acf"] = {}
-                            new_pet_data["acf"][attribute] = dynamodb_pet.get(attribute)
-
-                    break
-
-                if new_pet_data:
-                    logger.info("updating ID {} data {}".format(dynamodb_pet["id"], new_pet_data))
-
-                    response = requests.post(
-                        "https://dallaspetsalive.org/wp-json/wp/v2/pet/{}".format(wordpress_pet["id"]),
-                        headers=self.wordpress_header,
-                        json=new_pet_data,
+                        rejected.append(write)
+
+        logger.info("sent {} writes in {} batches".format(len(sendable), len(chunks)))
+
+        if rejected:
+            # retry anything the batch refused on its own, where it gets the usual error handling
+            outcomes.extend(writes.execute(self.send_write, rejected, WRITE_WORKERS))
+
+        return outcomes
+
+    def post_batch(self, chunk: List[writes.PendingWrite]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        # None when the batch may or may not have been applied, e.g. it timed out or the server failed
+        try:
+            response = self.wordpress_request(
+                "POST",
+                WORDPRESS_API + "/batch/v1",
+                json=batch.payload([write.request for write in chunk]),
+            )
+        except requests.RequestException:
+            logger.exception("batch request failed")
+            return None
+
+        if response.status_code >= 500:
+            logger.error("batch failed on the server: {}".format(response.text))
+            return None
+
+        if response.status_code not in (200, 207):
+            logger.error("could not send batch: {}".format(response.text))
+            return [None] * len(chunk)
+
+        return batch.unpack(response.json(), len(chunk))
+
+    def get_batch_size(self) -> int:
+        if self.batch_size is None:
+            response = self.wordpress_request("OPTIONS", WORDPRESS_API + "/batch/v1")
+            self.batch_size = batch.max_batch_size(response.json() if response.status_code == 200 else {})
+        return self.batch_size
+
+    def record_outcomes(
+        self, outcomes: List[writes.WriteOutcome], names: List[str], stage: Optional[str] = None
+    ) -> None:
+        # the FeaturedPhotos batch writer isn't thread safe, so record photos once the writes are done
+        self.outcomes.extend(outcomes)
+        with aws.table("FeaturedPhotos").batch_writer() as batch:
+            for outcome in outcomes:
+                if self.shadow_index is not None:
+                    self.shadow_index.apply(outcome)
+                if not outcome.ok:
+                    continue
+                if outcome.featured_photo:
+                    batch.put_item(
+                        Item={
+                            "id": outcome.pet_id,
+                            "photo": outcome.featured_photo,
+                        }
                     )
+                names.append(outcome.name)
 
-                    if response.status_code != 200:
-                        logger.error("could not update pet {}: {}".format(new_pet_data, response.text))
-                        continue
+        if self.checkpoint is not None and stage is not None:
+            self.checkpoint.outcomes.extend((stage, outcome) for outcome in outcomes)
+            self.checkpoint.media = self.media.uploaded()
+            self.checkpoint.save()
 
     @staticmethod
-    def convert_wordpress_content(content: str) -> str:
-        content = html.unescape(content)
-        content = content.replace("”", '"')
-        content = content.replace("“", '"')
-        content = content.replace("’", "'")
-        content = content.replace("</p>\n<p>", "\\n\\n")
-        content = content.replace("<p>", "")
-        content = content.replace("</p>", "")
-        content = content.replace("– ", "- ")
-        return content
+    def listing_urls(*pets: Dict[str, Any]) -> List[str]:
+        return purge.listing_urls(PET_ARCHIVE_URL, LISTING_URLS, *pets)
 
     @staticmethod
-    def strip_description(description: str) -> str:
-        description = description.replace("\\n", "")
-        description = description.replace("\\r", "")
-        description = description.replace("<br", "")
-        description = re.sub(r"\W+", "", description)
-        return description
+    def build_post(pet: Pet) -> Dict[str, Any]:
+        attributes = []
+
+        age_attributes = {
+            "Baby": 264,
+            "Young": 267,
+            "Adult": 260,
+            "Senior": 261,
+        }
 
-    def upload_featured_photo(self, photoUrl: str) -> int:
-        if not photoUrl:
-            return -1
+        if pet.age and pet.age in age_attributes:
+            attributes.append(age_attributes[pet.age])
 
-        response = requests.get(photoUrl, stream=True)
-        if response.status_code != 200:
-            logger.error("could not get cover photo {}: {}".format(photoUrl, response.text))
-            return -1
+        sex_attributes = {
+            "Female": 262,
+            "Male": 265,
+        }
 
-        cover_photo = response.raw.read()
+        if pet.sex and pet.sex in sex_attributes:
+            attributes.append(sex_attributes[pet.sex])
 
-        filename = photoUrl.split("/")[-1]
-        content_type = mimetypes.guess_type(filename)
+        size_attributes = {
+            "Small": 268,
+            "Medium": 266,
+            "Large": 263,
+            "Extra-Large": 269,
+        }
 
-        # create the media for the cover photo
-        response = requests.post(
-            "https://dallaspetsalive.org/wp-json/wp/v2/media",
-            headers={
-                "Content-Disposition": "attachment; filename={}".format(filename),
-                "Content-Type": content_type[0],
-                **self.wordpress_header,
+        if pet.size and pet.size in size_attributes:
+            attributes.append(size_attributes[pet.size])
+
+        pet_data = {
+            "status": "publish",
+            "title": pet.name,
+            "content": pet.description,
+            "acf": {
+                "id": pet.id,
+                "age": pet.age,
+                "breed": pet.breed,
+                "color": pet.color,
+                "adoptLink": pet.adoptLink,
+                "internalId": pet.internalId,
+                "name": pet.name,
+                "sex": pet.sex,
+                "size": pet.size,
+                "species": pet.species,
+                "source": pet.source,
+                "status": pet.status,
+                "video": pet.video,
+                diff.FINGERPRINT_FIELD: pet.fingerprint(),
             },
-            data=cover_photo,
+            "pet-attributes": attributes,
+        }
+
+        for photo_num, photo in enumerate(pet.photos):
+            pet_data["acf"]["photos_{}".format(photo_num)] = photo
+
+        return pet_data
+
+    def update_pets(self):
+        # last, so deletes and creates are done before descriptions and photos are refreshed.
+        # updates left over keep a stale fingerprint in the index and are planned again next run
+        if self.deadline is not None and self.deadline.expired():
+            logger.warning("out of time, leaving {} updates to the next run".format(len(self.plan.updates)))
+            return
+        self.media.prefetch(update.featured_photo for update in self.plan.updates)
+        self.write_stage("update", self.update_write, self.plan.updates, [])
+
+    def update_pet(self, update: diff.Update) -> writes.WriteOutcome:
+        return self.send_write(self.update_write(update))
+
+    def update_write(self, update: diff.Update) -> writes.PendingWrite:
+        new_pet_data = dict(update.patch)
+        featured_photo = None
+
+        if update.featured_photo:
+            photo_id = self.media.get(update.featured_photo)
+            if photo_id != -1:
+                new_pet_data["featured_media"] = photo_id
+                if update.record_featured_photo:
+                    featured_photo = update.featured_photo
+            elif diff.FINGERPRINT_FIELD in new_pet_data.get("acf", {}):
+                # leave the fingerprint stale so the next run looks up the featured photo again
+                acf = {key: value for key, value in new_pet_data["acf"].items() if key != diff.FINGERPRINT_FIELD}
+                if acf:
+                    new_pet_data["acf"] = acf
+                else:
+                    del new_pet_data["acf"]
+
+        if not new_pet_data:
+            return writes.PendingWrite(None, writes.WriteOutcome(update.pet.id, update.pet.name, ok=False))
+
+        logger.info("updating ID {} data {}".format(update.pet.id, new_pet_data))
+
+        return writes.PendingWrite(
+            writes.WriteRequest("POST", "/wp/v2/pet/{}".format(update.post.id), new_pet_data),
+            writes.WriteOutcome(
+                update.pet.id,
+                update.pet.name,
+                ok=True,
+                featured_photo=featured_photo,
+                link=update.post.link or None,
+                # posts from the shadow index have no listed fields, only the new listings are known then
+                listings=self.listing_urls(update.post.acf, asdict(update.pet)),
+                entry=IndexEntry(
+                    update.post.id,
+                    update.pet.id,
+                    new_pet_data.get("title", update.post.title),
+                    new_pet_data.get("featured_media", update.post.featured_media),
+                    new_pet_data.get("acf", {}).get(
+                        diff.FINGERPRINT_FIELD, update.post.acf.get(diff.FINGERPRINT_FIELD)
+                    ),
+                    update.post.link,
+                ),
+            ),
         )
 
+    def prefetch_media(self):
+        # start uploading the new pets' cover photos before the writes that use them. updates
+        # are the first work dropped when time runs short, so their photos wait for update_pets
+        self.media.prefetch(create.pet.coverPhoto for create in self.plan.creates)
+
+    def upload_featured_photo(self, photoUrl: str) -> int:
+        if not photoUrl:
+            return -1
+
+        # a slow photo host only costs this photo, not the run
+        with requests.get(photoUrl, stream=True, timeout=self.call_timeout()) as source:
+            if source.status_code != 200:
+                logger.error("could not get cover photo {}: {}".format(photoUrl, source.text))
+                return -1
+
+            filename = photoUrl.split("/")[-1]
+            content_type = mimetypes.guess_type(filename)[0] or source.headers.get("Content-Type")
+
+            # create the media for the cover photo, streaming it straight from the source
+            response = self.wordpress_request(
+                "POST",
+                "https://dallaspetsalive.org/wp-json/wp/v2/media",
+                headers={
+                    "Content-Disposition": "attachment; filename={}".format(filename),
+                    "Content-Type": content_type,
+                },
+                data=media.stream_body(source),
+            )
+
         if response.status_code != 201:
             logger.error("could not upload cover photo {}: {}".format(photoUrl, response.text))
             return -1
@@ -494,10 +992,21 @@ class WordpressSync:
                 }
             )
 
-        webhook = json.loads(secrets_client.get_secret_value(SecretId="slack_alerts_webhook")["SecretString"])
-        url = webhook.get("url")
-
-        requests.post(
-            url,
+        response = requests.post(
+            aws.get_secret_json(SLACK_WEBHOOK_SECRET).get("url"),
             json=message,
+            timeout=10,
         )
+
+        if response.status_code in (403, 404, 410):
+            # the webhook may have been rotated since we cached it
+            logger.warning("slack rejected webhook, refreshing")
+            aws.invalidate_secret(SLACK_WEBHOOK_SECRET)
+            response = requests.post(
+                aws.get_secret_json(SLACK_WEBHOOK_SECRET).get("url"),
+                json=message,
+                timeout=10,
+            )
+
+        if response.status_code != 200:
+            logger.error("could not post to slack: {}".format(response.text))
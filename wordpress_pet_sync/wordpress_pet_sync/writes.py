@@ -0,0 +1,61 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from .records import IndexEntry
+
+logger = logging.getLogger()
+
+T = TypeVar("T")
+
+
+@dataclass
+class WriteOutcome:
+    pet_id: Any
+    name: str
+    ok: bool
+    # cover photo that is now the post's featured media, for the FeaturedPhotos table
+    featured_photo: Optional[str] = None
+    # the post as it stands after a create or update, for the shadow index
+    entry: Optional[IndexEntry] = None
+    # the post a delete removed
+    removed_post_id: Optional[int] = None
+    # the post's public url, so its cached page can be purged
+    link: Optional[str] = None
+    # the listing pages that showed the post before or after the write, purged along with it
+    listings: List[str] = field(default_factory=list)
+
+
+@dataclass
+class WriteRequest:
+    method: str
+    # path under /wp-json, the same for single and batched requests
+    path: str
+    body: Optional[Dict[str, Any]] = None
+    expected_status: int = 200
+
+
+@dataclass
+class PendingWrite:
+    # None when there is nothing to send, e.g. the cover photo upload failed
+    request: Optional[WriteRequest]
+    # what to record if the request succeeds
+    outcome: WriteOutcome
+
+
+def execute(write: Callable[[T], WriteOutcome], items: Iterable[T], max_workers: int) -> List[WriteOutcome]:
+    # each item's steps run in order on one worker, items run alongside each other
+    items = list(items)
+    if not items:
+        return []
+
+    def run(item: T) -> Optional[WriteOutcome]:
+        try:
+            return write(item)
+        except Exception:
+            logger.exception("write failed for {}".format(item))
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return [outcome for outcome in executor.map(run, items) if outcome is not None]